@@ -0,0 +1,285 @@
+"""
+Контроль допуску запитів і скидання навантаження
+
+AdmissionMiddleware стоїть перед маршрутизацією і до виконання обробника
+вирішує, чи приймати запит:
+
+1. Відра токенів на користувача (за перевіреним JWT) і на IP-адресу:
+   перевищення швидкості - 429 з Retry-After до появи токена.
+2. Обмеження одночасних запитів на префікс маршруту (найдовший збіг із
+   limits, заданих у app/main.py). Запит, що не вміщається, чекає в черзі
+   префікса; якщо очікуваний час у черзі (черга x середній час обробки /
+   ліміт) більший за max_wait_ms або черга заповнена - одразу 503 з
+   Retry-After, а не після марного очікування. Запит, що простояв у черзі
+   довше за max_wait_ms, теж отримує 503.
+
+Повільні маршрути (вхід з bcrypt, широкі списки, експорт) отримують свій
+ліміт, тож сплеск на них не займає цикл подій для решти маршрутів. Стан
+зберігається в пам'яті процесу: при кількох процесах ліміти діють на
+кожен процес окремо.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from jose import JWTError, jwt
+
+from app.auth import ALGORITHM, SECRET_KEY
+from app.metrics import register_collector
+
+USER_RATE = float(os.getenv("RATE_LIMIT_USER_RPS", "20"))
+USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "40"))
+IP_RATE = float(os.getenv("RATE_LIMIT_IP_RPS", "100"))
+IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "200"))
+
+# Кеш перевірених токенів (токен -> користувач) і розмір таблиць відер
+TOKEN_CACHE_SIZE = 10_000
+BUCKETS_PRUNE_SIZE = 50_000
+# Згладжування середнього часу обробки префікса
+SERVICE_TIME_ALPHA = 0.1
+
+
+@dataclass
+class RouteLimit:
+    """Ліміт префікса маршруту; concurrency=None - без обмеження"""
+    concurrency: Optional[int]
+    max_queue: int = 100
+    max_wait_ms: float = 1000
+
+
+class _Gate:
+    """Лічильник одночасних запитів префікса з чергою очікування"""
+
+    def __init__(self, prefix: str, limit: RouteLimit):
+        self.prefix = prefix
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters = deque()
+        self.service_time = None
+        self.admitted = 0
+        self.wait_total = 0.0
+
+    def expected_wait(self) -> float:
+        return (len(self.waiters) + 1) * (self.service_time or 0) / self.limit.concurrency
+
+    async def acquire(self) -> Optional[str]:
+        """None - допущено, інакше причина відмови"""
+        if self.in_flight < self.limit.concurrency and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        if len(self.waiters) >= self.limit.max_queue:
+            return "queue_full"
+        if self.expected_wait() * 1000 > self.limit.max_wait_ms:
+            return "queue_time"
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.limit.max_wait_ms / 1000)
+        except asyncio.TimeoutError:
+            self._discard(future)
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # Клієнт пішов: слот, уже переданий цьому запиту, - наступному
+            if future.done() and not future.cancelled():
+                self._hand_off()
+            else:
+                self._discard(future)
+            raise
+        # Слот передано звільненням (in_flight не змінювався)
+        self.admitted += 1
+        self.wait_total += time.perf_counter() - started
+        return None
+
+    def release(self, elapsed: float):
+        if self.service_time is None:
+            self.service_time = elapsed
+        else:
+            self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+        self._hand_off()
+
+    def _hand_off(self):
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _discard(self, future):
+        try:
+            self.waiters.remove(future)
+        except ValueError:
+            pass
+
+
+class _TokenBuckets:
+    """Відра токенів за ключем (користувач або IP)"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def take(self, key: str, now: float) -> float:
+        """0 - токен узято, інакше секунди до появи токена"""
+        tokens, updated = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self.buckets[key] = (tokens - 1, now)
+        if len(self.buckets) > BUCKETS_PRUNE_SIZE:
+            self.prune(now)
+        return 0
+
+    def prune(self, now: float):
+        """Видалення повних відер (їх стан збігається з відсутнім)"""
+        refill = self.burst / self.rate
+        self.buckets = {
+            key: value for key, value in self.buckets.items() if now - value[1] < refill
+        }
+
+
+# Токен -> (користувач, exp): кеш не повинен продовжувати життя токена
+_token_subjects = {}
+
+
+def token_subject(authorization: str) -> Optional[str]:
+    """Користувач перевіреного токена Bearer (None - токена немає, він недійсний чи прострочений)"""
+    if not authorization.lower().startswith("bearer "):
+        return None
+    token = authorization[7:]
+    cached = _token_subjects.get(token)
+    if cached is not None:
+        subject, expires = cached
+        if expires is None or expires > time.time():
+            return subject
+        del _token_subjects[token]
+        return None
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        subject, expires = claims.get("sub"), claims.get("exp")
+    except JWTError:
+        subject, expires = None, None
+    if len(_token_subjects) >= TOKEN_CACHE_SIZE:
+        _token_subjects.clear()
+    _token_subjects[token] = (subject, expires)
+    return subject
+
+
+class AdmissionMiddleware:
+    """Відра токенів і ліміти одночасних запитів за префіксами маршрутів"""
+
+    def __init__(self, app, limits: dict = None, user_rate: float = USER_RATE, user_burst: float = USER_BURST,
+                 ip_rate: float = IP_RATE, ip_burst: float = IP_BURST):
+        self.app = app
+        # Найдовші префікси перевіряються першими
+        self.gates = [
+            _Gate(prefix, limit)
+            for prefix, limit in sorted((limits or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        ]
+        self.user_buckets = _TokenBuckets(user_rate, user_burst) if user_rate > 0 else None
+        self.ip_buckets = _TokenBuckets(ip_rate, ip_burst) if ip_rate > 0 else None
+        self.rejected = {}
+        _middlewares.append(self)
+
+    def _gate(self, path: str) -> Optional[_Gate]:
+        for gate in self.gates:
+            if path.startswith(gate.prefix):
+                return gate if gate.limit.concurrency else None
+        return None
+
+    def _rate_limited(self, scope) -> Optional[tuple]:
+        """(причина, секунди до повтору) або None"""
+        now = time.monotonic()
+        if self.user_buckets is not None:
+            authorization = ""
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    authorization = value.decode("latin-1")
+                    break
+            subject = token_subject(authorization) if authorization else None
+            if subject is not None:
+                wait = self.user_buckets.take(subject, now)
+                if wait:
+                    return "rate_user", wait
+        if self.ip_buckets is not None and scope.get("client"):
+            wait = self.ip_buckets.take(scope["client"][0], now)
+            if wait:
+                return "rate_ip", wait
+        return None
+
+    async def _reject(self, send, prefix: str, reason: str, retry_after: float):
+        self.rejected[(prefix, reason)] = self.rejected.get((prefix, reason), 0) + 1
+        if reason.startswith("rate_"):
+            status, detail = 429, "Забагато запитів, спробуйте пізніше"
+        else:
+            status, detail = 503, "Сервер перевантажений, спробуйте пізніше"
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        gate = self._gate(scope["path"])
+        prefix = gate.prefix if gate else "*"
+        limited = self._rate_limited(scope)
+        if limited:
+            await self._reject(send, prefix, *limited)
+            return
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await gate.acquire()
+        if reason:
+            await self._reject(send, prefix, reason, gate.expected_wait())
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(time.perf_counter() - started)
+
+
+_middlewares = []
+
+
+def collect_metrics():
+    in_flight, queued, rejected, waits = [], [], [], []
+    for middleware in _middlewares:
+        for gate in middleware.gates:
+            labels = {"prefix": gate.prefix}
+            in_flight.append((labels, gate.in_flight))
+            queued.append((labels, len(gate.waiters)))
+            waits.append((labels, gate.wait_total))
+        for (prefix, reason), count in middleware.rejected.items():
+            rejected.append(({"prefix": prefix, "reason": reason}, count))
+    return [
+        ("admission_in_flight", "gauge", "Одночасні запити префікса маршруту", in_flight),
+        ("admission_queued", "gauge", "Запити в черзі допуску префікса", queued),
+        ("admission_queue_wait_seconds_total", "counter", "Сумарний час очікування в черзі допуску", waits),
+        ("admission_rejected_total", "counter",
+         "Відхилені запити: rate_user/rate_ip - 429, queue_full/queue_time/queue_timeout - 503", rejected),
+    ]
+
+
+register_collector(collect_metrics)
@@ -0,0 +1,321 @@
+"""
+Аналітика завантаженості відділень і лікарів (GET /api/analytics/*)
+
+Звіти за відділеннями, лікарями, місяцями і днями читають денні підсумки
+(app/daily_stats.py): рядок на день, лікаря, відділення і статус замість
+кожного запису періоду.
+
+Теплова карта зайнятості потребує часу кожного прийому: записи за період
+читаються одним запитом на частину (гаряча таблиця, архів) по покривному
+індексу ix_appointments_slots, без звернень до рядків таблиці. Щоб не
+створювати Python-об'єкт на кожне значення, кожен рядок кодується рядком
+фіксованої ширини (дата і час - текстом, тривалість - символом char()),
+group_concat склеює їх в один рядок, який NumPy розбирає в матрицю кодів
+символів; зайнятість за хвилинами тижня - різницевим масивом.
+
+Доступний час: capacity відділення (одночасних прийомів) x робочі години
+ANALYTICS_DAY_START_HOUR-ANALYTICS_DAY_END_HOUR x робочі дні
+ANALYTICS_WEEKMASK (пн-нд). Скасовані записи не займають часу; неявки
+займають (слот був заброньований).
+"""
+import functools
+import os
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import archive
+from app.models import AppointmentDailyStats, Department, MedicalRecordDailyStats, User
+from app.daily_stats import DEFAULT_DURATION, MAX_DURATION
+
+DAY_START_HOUR = int(os.getenv("ANALYTICS_DAY_START_HOUR", "8"))
+DAY_END_HOUR = int(os.getenv("ANALYTICS_DAY_END_HOUR", "18"))
+WEEKMASK = os.getenv("ANALYTICS_WEEKMASK", "1111100")
+# Найдовший період одного звіту
+MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "731"))
+WORKDAY_MINUTES = (DAY_END_HOUR - DAY_START_HOUR) * 60
+
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Нд"]
+
+# Розмітка закодованого рядка (символи): дата YYYY-MM-DD, час HH:MM,
+# тривалість (символ з кодом тривалість+1: char(0) обриває рядок)
+_TEXT = 15
+_DURATION = 15
+_WIDTH = 16
+
+# Числа з цифр текстової частини: рік, місяць, день, година, хвилина
+# (одне матричне множення замість циклів)
+_FIELDS = [(0, 4), (5, 7), (8, 10), (10, 12), (13, 15)]
+_PLACES = np.zeros((_TEXT, len(_FIELDS)), dtype=np.float32)
+for _field, (_start, _end) in enumerate(_FIELDS):
+    _PLACES[_start:_end, _field] = 10 ** np.arange(_end - _start - 1, -1, -1)
+# Перші дні місяців 1900-2199 у днях від 1970-01-01
+_FIRST_YEAR = 1900
+_MONTH_STARTS = np.arange("1900-01", "2200-01", dtype="datetime64[M]").astype("datetime64[D]").astype(np.int64)
+
+
+@dataclass
+class Slots:
+    """Стовпці записів на прийом за період (масиви NumPy однакової довжини)"""
+    day: np.ndarray        # день від 1970-01-01
+    minute: np.ndarray     # хвилина доби початку
+    duration: np.ndarray   # хвилин
+
+    def __len__(self):
+        return len(self.day)
+
+
+def _encoded_row(model):
+    """Вираз SQL: рядок запису фіксованої ширини _WIDTH символів"""
+    duration = func.min(func.coalesce(model.duration_minutes, DEFAULT_DURATION), MAX_DURATION)
+    parts = [model.appointment_date, func.substr(model.appointment_time, 1, 5), func.char(duration + 1)]
+    return functools.reduce(lambda left, right: left.op("||")(right), parts)
+
+
+def _decode(text: str) -> Slots:
+    codes = np.frombuffer(text.encode("utf-16-le"), dtype=np.uint16).reshape(-1, _WIDTH)
+    # Роздільники "-", ":" мають нульову вагу в _PLACES
+    fields = ((codes[:, :_TEXT].astype(np.float32) - 48) @ _PLACES).astype(np.int64)
+    month_index = np.clip((fields[:, 0] - _FIRST_YEAR) * 12 + fields[:, 1] - 1, 0, len(_MONTH_STARTS) - 1)
+    return Slots(
+        day=_MONTH_STARTS[month_index] + fields[:, 2] - 1,
+        minute=fields[:, 3] * 60 + fields[:, 4],
+        duration=codes[:, _DURATION].astype(np.int64) - 1,
+    )
+
+
+def load_slots(db: Session, date_from: date, date_to: date,
+               department_id: Optional[int] = None, doctor_id: Optional[int] = None) -> Slots:
+    """
+    Нескасовані записи на прийом з датою в [date_from, date_to]
+
+    Читаються з гарячої таблиці й архіву по покривному індексу.
+    """
+    texts = []
+    for model in archive.partitions(db, date_from):
+        query = select(func.group_concat(_encoded_row(model), "")).where(
+            model.appointment_date >= date_from, model.appointment_date <= date_to,
+            func.coalesce(model.status, "") != "cancelled",
+        )
+        if department_id is not None:
+            query = query.where(model.department_id == department_id)
+        if doctor_id is not None:
+            query = query.where(model.doctor_id == doctor_id)
+        texts.append(db.execute(query).scalar() or "")
+    return _decode("".join(texts))
+
+
+def working_days(date_from: date, date_to: date) -> int:
+    return int(np.busday_count(date_from, date_to + timedelta(days=1), weekmask=WEEKMASK))
+
+
+def _ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def _empty_totals() -> dict:
+    return dict.fromkeys(
+        ("appointments", "booked_minutes", "completed", "no_show", "cancelled", "lead_minutes", "lead_count"), 0
+    )
+
+
+def _stats_totals(db: Session, date_from: date, date_to: date, group,
+                  department_id: Optional[int] = None, doctor_id: Optional[int] = None) -> dict:
+    """Суми денних підсумків за групою (значення group) з розбивкою статусів"""
+    stats = AppointmentDailyStats
+    query = (
+        select(group, stats.status, func.sum(stats.appointments), func.sum(stats.booked_minutes),
+               func.sum(stats.lead_minutes), func.sum(stats.lead_count))
+        .where(stats.day >= date_from, stats.day <= date_to)
+        .group_by(group, stats.status)
+    )
+    if department_id is not None:
+        query = query.where(stats.department_id == department_id)
+    if doctor_id is not None:
+        query = query.where(stats.doctor_id == doctor_id)
+
+    totals = {}
+    for key, status, appointments, booked, lead_minutes, lead_count in db.execute(query):
+        row = totals.setdefault(key, _empty_totals())
+        row["appointments"] += appointments
+        row["lead_minutes"] += lead_minutes
+        row["lead_count"] += lead_count
+        # Скасовані записи не займають часу
+        if status == "cancelled":
+            row["cancelled"] += appointments
+        else:
+            row["booked_minutes"] += booked
+        if status in ("completed", "no_show"):
+            row[status] += appointments
+    return totals
+
+
+def _rows(totals: dict, available_minutes: Optional[float]) -> dict:
+    booked = totals["booked_minutes"]
+    return {
+        "appointments": totals["appointments"],
+        "booked_hours": round(booked / 60, 1),
+        "available_hours": round(available_minutes / 60, 1) if available_minutes else None,
+        "utilization": _ratio(booked, available_minutes),
+        "no_show_rate": _ratio(totals["no_show"], totals["completed"] + totals["no_show"]),
+        "cancellation_rate": _ratio(totals["cancelled"], totals["appointments"]),
+        "avg_lead_days": _ratio(totals["lead_minutes"], totals["lead_count"] * 1440),
+    }
+
+
+def department_utilization(db: Session, date_from: date, date_to: date) -> dict:
+    """Завантаженість відділень за період і разом по закладу"""
+    totals = _stats_totals(db, date_from, date_to, AppointmentDailyStats.department_id)
+    days = working_days(date_from, date_to)
+    departments = db.query(Department.id, Department.name, Department.capacity).order_by(Department.id).all()
+
+    rows = []
+    capacity_total = 0
+    for department in departments:
+        capacity = department.capacity or 0
+        capacity_total += capacity
+        rows.append({
+            "department_id": department.id,
+            "name": department.name,
+            "capacity": department.capacity,
+            **_rows(totals.get(department.id, _empty_totals()), capacity * WORKDAY_MINUTES * days),
+        })
+    # Заклад - усі записи, також без відділення
+    total = _empty_totals()
+    for row in totals.values():
+        for name, value in row.items():
+            total[name] += value
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "working_days": days,
+        "departments": rows,
+        "total": {"capacity": capacity_total, **_rows(total, capacity_total * WORKDAY_MINUTES * days)},
+    }
+
+
+def _medical_records(db: Session, date_from: date, date_to: date, group, doctor_ids=None) -> dict:
+    """Кількість медичних записів за групою з денних підсумків"""
+    stats = MedicalRecordDailyStats
+    query = (
+        select(group, func.sum(stats.records))
+        .where(stats.day >= date_from, stats.day <= date_to)
+        .group_by(group)
+    )
+    if doctor_ids is not None:
+        query = query.where(stats.doctor_id.in_(doctor_ids))
+    return dict(db.execute(query).all())
+
+
+def doctor_workload(db: Session, date_from: date, date_to: date, department_id: Optional[int] = None) -> list:
+    """Навантаження лікарів: заброньовані години відносно робочого часу"""
+    totals = _stats_totals(db, date_from, date_to, AppointmentDailyStats.doctor_id, department_id=department_id)
+    available = WORKDAY_MINUTES * working_days(date_from, date_to)
+    names = dict(db.query(User.id, User.full_name).filter(User.id.in_(list(totals))).all())
+    records = _medical_records(db, date_from, date_to, MedicalRecordDailyStats.doctor_id, list(totals))
+    rows = [
+        {"doctor_id": doctor_id, "name": names.get(doctor_id), "medical_records": records.get(doctor_id, 0),
+         **_rows(row, available)}
+        for doctor_id, row in totals.items()
+    ]
+    rows.sort(key=lambda row: row["booked_hours"], reverse=True)
+    return rows
+
+
+def _capacity(db: Session, department_id: Optional[int]) -> int:
+    """Capacity відділення або сумарна по закладу"""
+    capacity = db.query(func.sum(Department.capacity))
+    if department_id is not None:
+        capacity = capacity.filter(Department.id == department_id)
+    return capacity.scalar() or 0
+
+
+def monthly_load(db: Session, date_from: date, date_to: date, department_id: Optional[int] = None) -> list:
+    """Показники за календарними місяцями періоду"""
+    totals = _stats_totals(db, date_from, date_to, func.strftime("%Y-%m", AppointmentDailyStats.day),
+                           department_id=department_id)
+    capacity = _capacity(db, department_id)
+
+    rows = []
+    for month in np.arange(np.datetime64(date_from, "M"), np.datetime64(date_to, "M") + 1):
+        month_start = max(month.astype("datetime64[D]").item(), date_from)
+        month_end = min((month + 1).astype("datetime64[D]").item() - timedelta(days=1), date_to)
+        available = capacity * WORKDAY_MINUTES * working_days(month_start, month_end)
+        rows.append({"month": str(month), **_rows(totals.get(str(month), _empty_totals()), available)})
+    return rows
+
+
+def daily_load(db: Session, date_from: date, date_to: date,
+               department_id: Optional[int] = None, doctor_id: Optional[int] = None) -> list:
+    """Показники за днями періоду (лише дні з записами) і кількість медичних записів"""
+    stats = AppointmentDailyStats
+    totals = _stats_totals(db, date_from, date_to, stats.day, department_id=department_id, doctor_id=doctor_id)
+    if doctor_id is not None:
+        doctor_ids = [doctor_id]
+    elif department_id is not None:
+        doctor_ids = select(User.id).where(User.department_id == department_id)
+    else:
+        doctor_ids = None
+    records = _medical_records(db, date_from, date_to, MedicalRecordDailyStats.day, doctor_ids)
+    capacity = 1 if doctor_id is not None else _capacity(db, department_id)
+    weekmask = [flag == "1" for flag in WEEKMASK]
+
+    rows = []
+    for day in sorted(set(totals) | set(records)):
+        available = capacity * WORKDAY_MINUTES if weekmask[day.weekday()] else None
+        rows.append({
+            "date": day,
+            "medical_records": records.get(day, 0),
+            **_rows(totals.get(day, _empty_totals()), available),
+        })
+    return rows
+
+
+def occupancy_heatmap(db: Session, date_from: date, date_to: date,
+                      department_id: Optional[int] = None, doctor_id: Optional[int] = None) -> dict:
+    """
+    Середня зайнятість за днем тижня і годиною (7 x 24)
+
+    Кількість одночасних прийомів на кожну хвилину тижня - різницевим
+    масивом (+1 на початку, -1 в кінці, cumsum), усереднена за годиною і
+    кількістю таких днів тижня в періоді. Для відділення - частка capacity,
+    для лікаря - частка часу, інакше - середня кількість одночасних прийомів.
+    """
+    slots = load_slots(db, date_from, date_to, department_id=department_id, doctor_id=doctor_id)
+    week = 7 * 1440
+    # 1970-01-01 - четвер: понеділок = 0
+    start = ((slots.day + 3) % 7) * 1440 + slots.minute
+    end = start + slots.duration
+    wrapped = end > week
+    # Прийоми, що переходять через кінець неділі, продовжуються з понеділка
+    delta = np.bincount(start, minlength=week + 1) - np.bincount(np.minimum(end, week), minlength=week + 1)
+    delta[0] += int(wrapped.sum())
+    delta -= np.bincount(end[wrapped] - week, minlength=week + 1)
+    concurrent = np.cumsum(delta[:week]).reshape(7, 24, 60).mean(axis=2)
+
+    weekday_counts = np.array([
+        np.busday_count(date_from, date_to + timedelta(days=1), weekmask="".join("1" if i == day else "0" for i in range(7)))
+        for day in range(7)
+    ], dtype=float)
+    occupancy = concurrent / np.maximum(weekday_counts, 1)[:, None]
+    capacity = None
+    if doctor_id is not None:
+        capacity = 1
+    elif department_id is not None:
+        capacity = db.query(Department.capacity).filter(Department.id == department_id).scalar()
+    if capacity:
+        occupancy = occupancy / capacity
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "department_id": department_id,
+        "doctor_id": doctor_id,
+        "capacity": capacity,
+        "weekdays": WEEKDAYS,
+        "hours": list(range(24)),
+        "occupancy": np.round(occupancy, 4).tolist(),
+    }
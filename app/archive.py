@@ -0,0 +1,177 @@
+"""
+Архів історичних записів на прийом (гаряча і холодна частини)
+
+Таблиця appointments тримає поточний розклад. Закриті записи (completed,
+cancelled, no_show), старші за ARCHIVE_RETENTION_DAYS, переносяться в
+appointments_archive з тими самими id. Межа архіву зберігається в
+schema_meta: в архіві лише записи з датою до межі, тому запити за датою
+від межі (сьогоднішній розклад) читають тільки гарячу таблицю, а
+історичні запити - обидві частини одним UNION ALL. Відкриті записи
+лишаються в гарячій таблиці незалежно від дати.
+
+Перенесення не блокує застосунок:
+
+1. межа піднімається окремою транзакцією з темою TOPIC_ARCHIVE шини
+   інвалідації, і процес чекає два інтервали опитування шини, щоб інші
+   процеси застосунку вже маршрутизували запити за новою межею;
+2. рядки переносяться пакетами: INSERT ... SELECT і DELETE в одній
+   короткій транзакції з паузою між пакетами. Запит читає обидві частини
+   однією інструкцією, тож бачить кожен рядок рівно один раз.
+
+Перенесення виконується Core-інструкціями і не потрапляє в журнал змін
+та потік подій: логічно записи не змінюються.
+
+    python -m app.archive --retention-days 365 --batch-size 500 --pause-ms 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import create_engine, delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.invalidation import bus, POLL_INTERVAL_SECONDS, TOPIC_ARCHIVE
+from app.metrics import register_collector
+from app.models import Appointment, ArchivedAppointment, SchemaMeta
+
+RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "365"))
+CLOSED_STATUSES = ("completed", "cancelled", "no_show")
+
+# Ключ межі архіву в schema_meta (date.toordinal())
+WATERMARK_KEY = "appointments_archived_before"
+
+# Колонки запису на прийом у спільному порядку для UNION ALL
+APPOINTMENT_COLUMNS = [column.name for column in Appointment.__table__.columns]
+
+_UNKNOWN = object()
+_watermark = _UNKNOWN
+_routed = {"hot": 0, "hot+archive": 0}
+
+
+def _reset_watermark():
+    global _watermark
+    _watermark = _UNKNOWN
+
+
+bus.subscribe(TOPIC_ARCHIVE, _reset_watermark)
+
+
+def archived_before(db: Session) -> Optional[date]:
+    """Межа архіву: в архіві лише записи з датою до неї (None - архів порожній)"""
+    global _watermark
+    if _watermark is _UNKNOWN:
+        value = db.query(SchemaMeta.value).filter(SchemaMeta.key == WATERMARK_KEY).scalar()
+        _watermark = date.fromordinal(value) if value else None
+    return _watermark
+
+
+def partitions(db: Session, date_from: Optional[date] = None) -> tuple:
+    """Моделі частин, які можуть містити записи з датою від date_from"""
+    watermark = archived_before(db)
+    if watermark is None or (date_from is not None and date_from >= watermark):
+        _routed["hot"] += 1
+        return (Appointment,)
+    _routed["hot+archive"] += 1
+    return (Appointment, ArchivedAppointment)
+
+
+def columns(model) -> list:
+    """Колонки запису на прийом моделі в порядку APPOINTMENT_COLUMNS"""
+    return [model.__table__.c[name] for name in APPOINTMENT_COLUMNS]
+
+
+def find_appointment(db: Session, appointment_id: int):
+    """Запис на прийом за id: з гарячої таблиці, інакше з архіву"""
+    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    if appointment is None and archived_before(db) is not None:
+        appointment = db.get(ArchivedAppointment, appointment_id)
+    return appointment
+
+
+def _set_watermark(engine, horizon: date) -> Optional[date]:
+    """Підняття межі архіву (ніколи не опускається); повертає попередню"""
+    with Session(engine) as db:
+        value = db.query(SchemaMeta.value).filter(SchemaMeta.key == WATERMARK_KEY).scalar()
+        previous = date.fromordinal(value) if value else None
+        if previous is None or horizon > previous:
+            db.merge(SchemaMeta(key=WATERMARK_KEY, value=horizon.toordinal()))
+            bus.bump(db, TOPIC_ARCHIVE)
+            db.commit()
+        return previous
+
+
+def archive_appointments(engine, retention_days: int = RETENTION_DAYS,
+                         batch_size: int = 500, pause: float = 0.02) -> dict:
+    """
+    Перенесення закритих записів, старших за горизонт, до архіву
+
+    Переривання безпечне: кожен пакет переноситься атомарно, а межа вже
+    піднята, тож повторний запуск продовжує з того самого місця.
+    """
+    horizon = date.today() - timedelta(days=retention_days)
+    previous = _set_watermark(engine, horizon)
+    if previous is None or horizon > previous:
+        time.sleep(2 * POLL_INTERVAL_SECONDS)
+
+    stats = {"watermark": max(horizon, previous) if previous else horizon, "archived": 0, "batches": 0}
+    candidates = (
+        select(Appointment.id)
+        .where(Appointment.appointment_date < horizon, Appointment.status.in_(CLOSED_STATUSES))
+        .order_by(Appointment.id)
+        .limit(batch_size)
+    )
+    while True:
+        with engine.begin() as connection:
+            ids = connection.execute(candidates).scalars().all()
+            if ids:
+                connection.execute(
+                    insert(ArchivedAppointment).from_select(
+                        APPOINTMENT_COLUMNS + ["archived_at"],
+                        select(*columns(Appointment), literal(datetime.utcnow()))
+                        .where(Appointment.id.in_(ids)),
+                    )
+                )
+                connection.execute(delete(Appointment).where(Appointment.id.in_(ids)))
+                stats["archived"] += len(ids)
+                stats["batches"] += 1
+        if len(ids) < batch_size:
+            return stats
+        time.sleep(pause)
+
+
+def collect_metrics():
+    return [(
+        "appointment_partition_queries_total", "counter",
+        "Запити записів на прийом за набором частин (гаряча / гаряча+архів)",
+        [({"partitions": name}, count) for name, count in _routed.items()],
+    )]
+
+
+register_collector(collect_metrics)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Архівування історичних записів на прийом")
+    parser.add_argument("--db-url", default=os.getenv("DATABASE_URL", "sqlite:///./hospital_management.db"))
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause-ms", type=float, default=20)
+    args = parser.parse_args(argv)
+
+    from app import archive
+
+    engine = create_engine(args.db_url, connect_args={"check_same_thread": False})
+    started = time.perf_counter()
+    stats = archive.archive_appointments(engine, args.retention_days, args.batch_size, args.pause_ms / 1000)
+    print(f"✓ До архіву перенесено {stats['archived']} записів на прийом ({stats['batches']} пакетів) "
+          f"за {time.perf_counter() - started:.1f} с")
+    print(f"  Межа архіву: {stats['watermark'].isoformat()}")
+    print("  Місце у файлі БД звільняється після VACUUM")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
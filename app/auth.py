@@ -1,13 +1,18 @@
+import asyncio
+import os
+import threading
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from app.database import get_db
-from app.models import User
+from app.models import User, Role
 from app.schemas import TokenData
 
 # Налаштування безпеки
@@ -18,6 +23,18 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 годин
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Окремий виконавець для bcrypt: хешування займає ~0.25 с CPU і не повинно
+# блокувати цикл подій
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+password_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+# Лічильник змінюють потоки виконавця одночасно
+_password_ops_running = 0
+_password_ops_lock = threading.Lock()
+
+# Стратегія завантаження поточного користувача: ролі та їх дозволи
+# підвантажуються двома запитами, щоб has_permission/has_role не ходили в БД
+CURRENT_USER_LOAD_OPTIONS = (selectinload(User.roles).selectinload(Role.permissions),)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Перевірка пароля"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -26,6 +43,32 @@ def get_password_hash(password: str) -> str:
     """Хешування пароля"""
     return pwd_context.hash(password)
 
+def _run_password_op(func, *args):
+    global _password_ops_running
+    with _password_ops_lock:
+        _password_ops_running += 1
+    try:
+        return func(*args)
+    finally:
+        with _password_ops_lock:
+            _password_ops_running -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Перевірка пароля у виконавці bcrypt"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, _run_password_op, verify_password, plain_password, hashed_password
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    """Хешування пароля у виконавці bcrypt"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, _run_password_op, get_password_hash, password)
+
+def password_executor_stats():
+    """(операцій у черзі, операцій виконується) для метрик"""
+    return password_executor._work_queue.qsize(), _password_ops_running
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Створення JWT токена"""
     to_encode = data.copy()
@@ -37,18 +80,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Користувач пакетного запиту (POST /api/batch): вкладені запити несуть
+# той самий токен, тож користувач не перевантажується для кожного
+batch_user = ContextVar("batch_user", default=None)
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
     """Отримання поточного користувача з JWT токена"""
+    user = batch_user.get()
+    if user is not None:
+        return user
+    return user_from_token(credentials.credentials, db)
+
+def user_from_token(token: str, db: Session) -> User:
+    """Активний користувач за JWT токеном (з ролями та дозволами)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не вдалося перевірити облікові дані",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
@@ -57,7 +110,12 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = (
+        db.query(User)
+        .options(*CURRENT_USER_LOAD_OPTIONS)
+        .filter(User.username == token_data.username)
+        .first()
+    )
     if user is None:
         raise credentials_exception
     if not user.is_active:
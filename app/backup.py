@@ -0,0 +1,439 @@
+"""
+Онлайн-резервне копіювання бази даних
+
+Копія знімається через SQLite online backup API невеликими кроками по
+BACKUP_PAGES_PER_STEP сторінок: блокування читання тримається лише на час
+кроку, між кроками - пауза BACKUP_STEP_PAUSE_MS, тож записи застосунку не
+чекають на копіювання. Запис іншим з'єднанням між кроками перезапускає
+копіювання з початку, тож при постійних записах покрокова копія не
+просувається; після BACKUP_MAX_STALLS кроків без прогресу копія знімається
+одним кроком (записи чекають на один прохід по файлу - мілісекунди на
+десятки МБ).
+
+Готова копія перевіряється (PRAGMA integrity_check), стискається gzip і
+отримує файл контрольної суми <копія>.sha256 (формат sha256sum). Зберігаються
+BACKUP_RETENTION останніх копій. Одночасно виконується не більше одного
+копіювання (файлове блокування в BACKUP_DIR), стан і прогрес - у
+status.json, тож його бачить кожен процес застосунку.
+
+Розклад: BACKUP_INTERVAL_HOURS > 0 - фонове копіювання в lifespan (при
+кількох процесах копіює той, хто першим взяв блокування).
+
+    python -m app.backup run
+    python -m app.backup list
+    python -m app.backup verify backups/hospital_management-20260115-020000.db.gz
+    python -m app.backup restore backups/hospital_management-20260115-020000.db.gz
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from app.database import engine
+from app.metrics import register_collector
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger("app.backup")
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", "./backups")
+PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+STEP_PAUSE_SECONDS = float(os.getenv("BACKUP_STEP_PAUSE_MS", "10")) / 1000
+MAX_STALLS = int(os.getenv("BACKUP_MAX_STALLS", "3"))
+RETENTION = int(os.getenv("BACKUP_RETENTION", "7"))
+INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "0"))
+
+SUFFIX = ".db.gz"
+STATUS_FILE = "status.json"
+LOCK_FILE = ".backup.lock"
+# Як часто прогрес записується в status.json
+STATUS_WRITE_SECONDS = 0.5
+# Як часто планувальник перевіряє, чи настав час копіювання
+SCHEDULER_CHECK_SECONDS = 60
+
+_runs = {"ok": 0, "failed": 0}
+_pages_copied = 0
+
+
+class BackupInProgress(Exception):
+    """Інше копіювання вже виконується"""
+
+
+class BackupVerificationError(Exception):
+    """Копія пошкоджена або не відповідає контрольній сумі"""
+
+
+class _Stalled(Exception):
+    pass
+
+
+@contextmanager
+def _try_lock(path: str):
+    """Неблокувальне ексклюзивне блокування файлу: yield True, якщо взято"""
+    with open(path, "a+") as f:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def database_path() -> str:
+    database = engine.url.database
+    if engine.url.get_backend_name() != "sqlite" or not database or database == ":memory:":
+        raise RuntimeError("Резервне копіювання підтримується лише для файлової бази SQLite")
+    return os.path.abspath(database)
+
+
+def _write_status(backup_dir: str, status: dict):
+    path = os.path.join(backup_dir, STATUS_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_status(backup_dir: str = BACKUP_DIR) -> dict:
+    """Стан останнього копіювання (порожній словник - копіювань ще не було)"""
+    try:
+        with open(os.path.join(backup_dir, STATUS_FILE), encoding="utf-8") as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if status.get("state") == "running" and not is_running(backup_dir):
+        # Процес, що копіював, завершився аварійно
+        status["state"] = "failed"
+        status["error"] = status.get("error") or "Копіювання перервано"
+    return status
+
+
+def is_running(backup_dir: str = BACKUP_DIR) -> bool:
+    if not os.path.isdir(backup_dir):
+        return False
+    with _try_lock(os.path.join(backup_dir, LOCK_FILE)) as acquired:
+        return not acquired
+
+
+def list_backups(backup_dir: str = BACKUP_DIR) -> list:
+    """Копії від новіших до старіших"""
+    if not os.path.isdir(backup_dir):
+        return []
+    backups = []
+    for name in os.listdir(backup_dir):
+        if not name.endswith(SUFFIX):
+            continue
+        path = os.path.join(backup_dir, name)
+        stat = os.stat(path)
+        backups.append({
+            "name": name,
+            "size": stat.st_size,
+            "created_at": datetime.utcfromtimestamp(stat.st_mtime),
+            "sha256": _read_checksum(path),
+        })
+    backups.sort(key=lambda backup: backup["name"], reverse=True)
+    return backups
+
+
+def _read_checksum(path: str):
+    try:
+        with open(f"{path}.sha256", encoding="utf-8") as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def _copy_database(source_path: str, target_path: str, status: dict, on_progress, pages: int, pause: float):
+    """Покрокова копія; після MAX_STALLS кроків без прогресу - один крок"""
+    global _pages_copied
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    last = {"remaining": None}
+
+    def progress(result, remaining, total):
+        global _pages_copied
+        # Крок без прогресу: перезапуск після запису іншим з'єднанням або
+        # зайнята БД (SQLITE_BUSY)
+        if last["remaining"] is not None and remaining >= last["remaining"]:
+            status["stalls"] += 1
+            if status["stalls"] > MAX_STALLS:
+                raise _Stalled()
+        elif result == sqlite3.SQLITE_OK or remaining == 0:
+            _pages_copied += (total if last["remaining"] is None else last["remaining"]) - remaining
+        last["remaining"] = remaining
+        status["pages_total"] = total
+        status["pages_done"] = total - remaining
+        on_progress()
+        if remaining:
+            time.sleep(pause)
+
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=pause)
+        except _Stalled:
+            status["single_pass"] = True
+            source.backup(target, pages=-1)
+            _pages_copied += status["pages_total"] or 0
+            status["pages_done"] = status["pages_total"]
+        result = target.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise BackupVerificationError(f"Перевірка цілісності копії: {result}")
+    finally:
+        target.close()
+        source.close()
+
+
+def _compress(source_path: str, target_path: str) -> str:
+    """gzip-стиснення з підрахунком sha256 стисненого файлу"""
+    digest = hashlib.sha256()
+
+    class _HashingWriter:
+        def __init__(self, f):
+            self.f = f
+
+        def write(self, data):
+            digest.update(data)
+            return self.f.write(data)
+
+        def flush(self):
+            self.f.flush()
+
+    with open(source_path, "rb") as src, open(target_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=_HashingWriter(raw), mode="wb", mtime=0) as gz:
+            shutil.copyfileobj(src, gz, 1024 * 1024)
+        raw.flush()
+        os.fsync(raw.fileno())
+    return digest.hexdigest()
+
+
+def _rotate(backup_dir: str, retention: int) -> list:
+    removed = []
+    for backup in list_backups(backup_dir)[retention:]:
+        path = os.path.join(backup_dir, backup["name"])
+        for stale in (path, f"{path}.sha256"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        removed.append(backup["name"])
+    return removed
+
+
+def run_backup(backup_dir: str = BACKUP_DIR, source_path: str = None, pages: int = PAGES_PER_STEP,
+               pause: float = STEP_PAUSE_SECONDS, retention: int = RETENTION) -> dict:
+    """
+    Одна резервна копія (синхронно; у застосунку - в окремому потоці)
+
+    Повертає підсумковий стан; BackupInProgress - якщо інше копіювання вже
+    виконується.
+    """
+    source_path = source_path or database_path()
+    os.makedirs(backup_dir, exist_ok=True)
+    with _try_lock(os.path.join(backup_dir, LOCK_FILE)) as acquired:
+        if not acquired:
+            raise BackupInProgress("Резервне копіювання вже виконується")
+
+        started = time.time()
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        name = f"{stem}-{time.strftime('%Y%m%d-%H%M%S', time.gmtime(started))}"
+        tmp_db = os.path.join(backup_dir, f".{name}.db.tmp")
+        tmp_gz = os.path.join(backup_dir, f".{name}{SUFFIX}.tmp")
+        status = {
+            "state": "running", "file": name + SUFFIX, "pid": os.getpid(),
+            "started_at": datetime.utcfromtimestamp(started).isoformat(), "finished_at": None,
+            "pages_total": None, "pages_done": 0, "stalls": 0, "single_pass": False,
+            "size": None, "sha256": None, "error": None,
+        }
+        _write_status(backup_dir, status)
+        written = {"at": time.monotonic()}
+
+        def on_progress():
+            if time.monotonic() - written["at"] >= STATUS_WRITE_SECONDS:
+                _write_status(backup_dir, status)
+                written["at"] = time.monotonic()
+
+        try:
+            _copy_database(source_path, tmp_db, status, on_progress, pages, pause)
+            sha256 = _compress(tmp_db, tmp_gz)
+            path = os.path.join(backup_dir, name + SUFFIX)
+            os.replace(tmp_gz, path)
+            with open(f"{path}.sha256", "w", encoding="utf-8") as f:
+                f.write(f"{sha256}  {name}{SUFFIX}\n")
+            status.update(state="done", size=os.path.getsize(path), sha256=sha256)
+            status["removed"] = _rotate(backup_dir, retention)
+            _runs["ok"] += 1
+            return status
+        except Exception as exc:
+            status.update(state="failed", error=str(exc) or exc.__class__.__name__)
+            _runs["failed"] += 1
+            raise
+        finally:
+            status["finished_at"] = datetime.utcnow().isoformat()
+            status["duration_seconds"] = round(time.time() - started, 2)
+            for stale in (tmp_db, tmp_gz):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            _write_status(backup_dir, status)
+
+
+def verify(path: str, extract_to: str = None) -> dict:
+    """
+    Перевірка копії: контрольна сума, розпакування, integrity_check
+
+    extract_to - куди розпакувати (інакше тимчасовий файл видаляється).
+    """
+    expected = _read_checksum(path)
+    if expected is None:
+        raise BackupVerificationError(f"Немає файлу контрольної суми {path}.sha256")
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    if digest.hexdigest() != expected:
+        raise BackupVerificationError("Контрольна сума не збігається: копія пошкоджена")
+
+    target = extract_to or f"{path}.verify.tmp"
+    try:
+        with gzip.open(path, "rb") as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        connection = sqlite3.connect(target)
+        try:
+            result = connection.execute("PRAGMA integrity_check").fetchone()[0]
+            if result != "ok":
+                raise BackupVerificationError(f"Перевірка цілісності: {result}")
+            versions = dict(connection.execute("SELECT key, value FROM schema_meta"))
+        except sqlite3.DatabaseError as exc:
+            raise BackupVerificationError(f"Файл не є базою застосунку: {exc}") from exc
+        finally:
+            connection.close()
+    except BaseException:
+        if os.path.exists(target):
+            os.remove(target)
+        raise
+    if extract_to is None:
+        os.remove(target)
+    return {"sha256": expected, "schema_version": versions.get("schema_version")}
+
+
+def restore(path: str, target_path: str) -> dict:
+    """
+    Відновлення бази з перевіреної копії (сервер має бути зупинений)
+
+    Поточний файл зберігається поруч як <файл>.before-restore-<час>.
+    """
+    tmp_path = f"{target_path}.restore.tmp"
+    info = verify(path, extract_to=tmp_path)
+    if os.path.exists(target_path):
+        info["previous"] = f"{target_path}.before-restore-{time.strftime('%Y%m%d-%H%M%S')}"
+        os.replace(target_path, info["previous"])
+    os.replace(tmp_path, target_path)
+    for suffix in ("-journal", "-wal", "-shm"):
+        if os.path.exists(target_path + suffix):
+            os.remove(target_path + suffix)
+    return info
+
+
+def _seconds_until_due(backup_dir: str) -> float:
+    backups = list_backups(backup_dir)
+    if not backups:
+        return 0
+    age = time.time() - os.path.getmtime(os.path.join(backup_dir, backups[0]["name"]))
+    return INTERVAL_HOURS * 3600 - age
+
+
+async def run_scheduler(backup_dir: str = BACKUP_DIR):
+    """Фонове копіювання раз на BACKUP_INTERVAL_HOURS (lifespan)"""
+    while True:
+        wait = _seconds_until_due(backup_dir)
+        if wait <= 0:
+            try:
+                status = await asyncio.to_thread(run_backup, backup_dir)
+                logger.info("Резервна копія %s (%s байт)", status["file"], status["size"])
+            except BackupInProgress:
+                pass
+            except Exception:
+                logger.exception("Помилка планового резервного копіювання")
+            wait = SCHEDULER_CHECK_SECONDS
+        await asyncio.sleep(min(max(wait, 1), SCHEDULER_CHECK_SECONDS))
+
+
+def collect_metrics():
+    return [
+        ("backup_runs_total", "counter", "Резервні копіювання за результатом",
+         [({"result": result}, count) for result, count in _runs.items()]),
+        ("backup_pages_copied_total", "counter", "Скопійовані сторінки БД (з урахуванням перезапусків)",
+         [({}, _pages_copied)]),
+    ]
+
+
+register_collector(collect_metrics)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Резервне копіювання бази даних")
+    parser.add_argument("command", choices=["run", "list", "verify", "restore"])
+    parser.add_argument("path", nargs="?", help="Файл копії (verify, restore)")
+    parser.add_argument("--backup-dir", default=BACKUP_DIR)
+    parser.add_argument("--target", default=None, help="Файл БД для відновлення (за замовчуванням - DATABASE_URL)")
+    args = parser.parse_args(argv)
+
+    # При запуску через -m цей модуль - __main__; класи винятків - з app.backup
+    from app import backup
+
+    if args.command == "run":
+        try:
+            status = backup.run_backup(args.backup_dir)
+        except backup.BackupInProgress as exc:
+            print(f"⚠️  {exc}")
+            return 1
+        print(f"✓ Резервна копія {status['file']}: {status['size'] / 1e6:.1f} МБ за {status['duration_seconds']} с "
+              f"({status['pages_total']} сторінок{', одним кроком' if status['single_pass'] else ''})")
+        for name in status["removed"]:
+            print(f"  Видалено стару копію {name}")
+    elif args.command == "list":
+        for item in backup.list_backups(args.backup_dir):
+            print(f"{item['name']}  {item['size'] / 1e6:8.1f} МБ  {item['created_at']:%Y-%m-%d %H:%M:%S}")
+    else:
+        if not args.path:
+            parser.error("вкажіть файл копії")
+        try:
+            if args.command == "verify":
+                info = backup.verify(args.path)
+                print(f"✓ Копія цілісна: sha256 {info['sha256'][:16]}..., версія схеми {info['schema_version']}")
+            else:
+                target = os.path.abspath(args.target) if args.target else backup.database_path()
+                print("⚠️  Сервер має бути зупинений під час відновлення")
+                info = backup.restore(args.path, target)
+                print(f"✓ Базу {target} відновлено з {args.path} (версія схеми {info['schema_version']})")
+                if info.get("previous"):
+                    print(f"  Попередній файл збережено як {info['previous']}")
+        except backup.BackupVerificationError as exc:
+            print(f"⚠️  {exc}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
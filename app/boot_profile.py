@@ -0,0 +1,132 @@
+"""
+Профілювання запуску процесу
+
+Час запуску (від старту процесу до готовності lifespan) і час до першого
+обслуженого запиту завжди доступні в /api/metrics. Кроки lifespan
+позначаються через step() - це лише два виклики perf_counter.
+
+BOOT_PROFILE=1 додатково вмикає облік імпорту кожного модуля (власний час
+без вкладених імпортів) і друкує звіт після готовності: найдорожчі
+модулі, кроки запуску та час до першого запиту.
+
+Модуль імпортується першим у app.main і не залежить від інших модулів
+застосунку, щоб облік охоплював увесь граф імпорту.
+"""
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ENABLED = os.getenv("BOOT_PROFILE") == "1"
+REPORT_TOP_MODULES = 15
+
+_t0 = time.perf_counter()
+_steps = []
+_imports = {}  # module -> [cumulative, self]
+_ready_at = None
+_first_request_at = None
+
+
+def _process_age() -> float:
+    """Вік процесу в секундах (Linux), інакше - час від імпорту модуля"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.perf_counter() - _t0
+
+
+# Вік процесу на момент імпорту цього модуля: база для відліку часу запуску
+_age_at_import = _process_age()
+
+
+def _since_start() -> float:
+    return _age_at_import + (time.perf_counter() - _t0)
+
+
+def _install_import_timer():
+    original_import = builtins.__import__
+    stack = []
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        # Вимірюються лише перші (справжні) імпорти абсолютних модулів
+        if level != 0 or name in sys.modules:
+            return original_import(name, globals, locals, fromlist, level)
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            entry = _imports.setdefault(name, [0.0, 0.0])
+            entry[0] += elapsed
+            entry[1] += elapsed - children
+
+    builtins.__import__ = timed_import
+
+
+@contextmanager
+def step(name: str):
+    """Позначка кроку запуску"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _steps.append((name, time.perf_counter() - started))
+
+
+def mark_ready():
+    """Lifespan завершив запуск: процес готовий приймати запити"""
+    global _ready_at
+    _ready_at = _since_start()
+    if ENABLED:
+        print(report())
+
+
+def mark_first_request():
+    """Перший обслужений запит (викликається один раз з MetricsMiddleware)"""
+    global _first_request_at
+    if _first_request_at is None:
+        _first_request_at = _since_start()
+        if ENABLED:
+            print(f"⏱  Перший запит обслуговано через {_first_request_at:.3f} с після старту процесу")
+
+
+def report() -> str:
+    lines = ["⏱  Профіль запуску:"]
+    if _imports:
+        lines.append(f"  Імпорт модулів (топ {REPORT_TOP_MODULES} за власним часом):")
+        ranked = sorted(_imports.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (cumulative, own) in ranked[:REPORT_TOP_MODULES]:
+            lines.append(f"    {name:<40} власний {own * 1000:8.1f} мс   разом {cumulative * 1000:8.1f} мс")
+    lines.append("  Кроки запуску:")
+    for name, seconds in _steps:
+        lines.append(f"    {name:<40} {seconds * 1000:8.1f} мс")
+    if _ready_at is not None:
+        lines.append(f"  Готовність через {_ready_at:.3f} с після старту процесу")
+    return "\n".join(lines)
+
+
+def collect_metrics():
+    values = []
+    if _ready_at is not None:
+        values.append(({"phase": "ready"}, _ready_at))
+    if _first_request_at is not None:
+        values.append(({"phase": "first_request"}, _first_request_at))
+    return [(
+        "process_boot_seconds", "gauge", "Час від старту процесу до фази запуску", values
+    ), (
+        "process_boot_step_seconds", "gauge", "Тривалість кроків запуску",
+        [({"step": name}, seconds) for name, seconds in _steps],
+    )]
+
+
+if ENABLED:
+    _install_import_timer()
@@ -0,0 +1,71 @@
+"""
+Журнал змін для інкрементальної синхронізації
+
+Після кожного INSERT/UPDATE/DELETE відстежуваних моделей через ORM у тій
+самій транзакції додається рядок change_log (сутність, id, операція).
+Номер зміни (seq, AUTOINCREMENT) монотонний, на відміну від updated_at із
+секундною точністю, тому слугує токеном відновлення для GET /api/changes.
+
+Масові вставки в обхід ORM (generate_load_data.py) потрапляють до журналу
+через backfill після завантаження.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, literal, select
+from sqlalchemy.orm import object_session
+
+from app.models import ChangeLog, Patient, Appointment, MedicalRecord, User
+
+# Назва сутності в журналі -> модель
+TRACKED_MODELS = {
+    "patient": Patient,
+    "appointment": Appointment,
+    "medical_record": MedicalRecord,
+    "user": User,
+}
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+
+def _record(entity: str, op: str):
+    def listener(mapper, connection, target):
+        if op == OP_UPSERT:
+            session = object_session(target)
+            # after_update викликається і для об'єктів без фактичних змін
+            if session is not None and not session.is_modified(target):
+                return
+        connection.execute(
+            ChangeLog.__table__.insert().values(
+                entity=entity, entity_id=target.id, op=op, changed_at=datetime.utcnow()
+            )
+        )
+    return listener
+
+
+for _entity, _model in TRACKED_MODELS.items():
+    event.listen(_model, "after_insert", _record(_entity, OP_UPSERT))
+    event.listen(_model, "after_update", _record(_entity, OP_UPSERT))
+    event.listen(_model, "after_delete", _record(_entity, OP_DELETE))
+
+
+def backfill(connection):
+    """
+    Поточні рядки без записів у журналі - як upsert, щоб синхронізація з
+    нуля бачила все
+
+    Окремо для кожної сутності: користувачі, створені через ORM, не
+    означають, що в журналі є пацієнти чи записи, вставлені в обхід ORM.
+    """
+    log = ChangeLog.__table__
+    for entity, model in TRACKED_MODELS.items():
+        table = model.__table__
+        logged = select(log.c.entity_id).where(log.c.entity == entity)
+        connection.execute(
+            log.insert().from_select(
+                ["entity", "entity_id", "op", "changed_at"],
+                table.select().with_only_columns(
+                    literal(entity), table.c.id, literal(OP_UPSERT), literal(datetime.utcnow())
+                ).where(table.c.id.not_in(logged)).order_by(table.c.id),
+            )
+        )
@@ -0,0 +1,127 @@
+"""
+Об'єднання однакових одночасних GET-запитів (single-flight)
+
+Декоратор coalesce(response_model) для обробників читання: одночасні
+запити з однаковим ключем чекають на одне обчислення і отримують ті самі
+серіалізовані байти відповіді. Ключ - обробник, нормалізовані параметри
+(значення після розбору FastAPI, тож ?limit=100 і запит без limit
+збігаються) і область доступу користувача: набір ролей і дозволів, а для
+scope="user" - ще й id користувача (результат залежить від особи, напр.
+конфіденційні записи автора). Користувачі з різними правами ніколи не
+отримують спільної відповіді.
+
+Обчислення виконується в потоці (asyncio.to_thread) з власною сесією БД,
+тож цикл подій вільний і запити, що надходять під час обчислення,
+приєднуються до нього. Тому обробник не повинен нічого очікувати (await) -
+як і всі обробники з синхронною сесією БД. Результат не кешується: після
+завершення обчислення наступний запит обчислює заново.
+
+Автентифікація (залежність current_user) виконується для кожного запиту,
+після неї сесія запиту закривається: очікувачі не тримають з'єднань пулу
+(крім спільної сесії пакетного запиту, див. app/routers/batch.py).
+"""
+import asyncio
+import functools
+from typing import Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, batch_session
+from app.metrics import register_collector
+from app.models import User
+
+_in_flight = {}
+_stats = {}
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def access_scope(user: User, per_user: bool = False) -> tuple:
+    """Область доступу: ролі й дозволи (і id користувача для per_user)"""
+    roles = tuple(sorted(role.name for role in user.roles))
+    permissions = tuple(sorted({
+        permission.name for role in user.roles for permission in role.permissions
+    }))
+    return (roles, permissions, user.id if per_user else None)
+
+
+def _run_to_completion(coroutine):
+    """Виконання корутини-обробника без циклу подій (вона не має очікувати)"""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("Обробник з coalesce не повинен очікувати (await)")
+
+
+def coalesce(response_model, scope: str = "permissions"):
+    """Декоратор обробника GET: спільне обчислення однакових запитів"""
+    adapter = TypeAdapter(response_model)
+
+    def decorator(func):
+        name = func.__qualname__
+
+        def compute(kwargs) -> bytes:
+            # Власна сесія: сесію першого запиту закриє FastAPI, якщо його
+            # клієнт відключиться раніше за інших
+            with SessionLocal() as db:
+                kwargs = {key: db if isinstance(value, Session) else value for key, value in kwargs.items()}
+                result = _run_to_completion(func(**kwargs))
+                return adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            user: Optional[User] = None
+            request_db: Optional[Session] = None
+            params = []
+            for key, value in sorted(kwargs.items()):
+                if isinstance(value, User):
+                    user = value
+                elif isinstance(value, Session):
+                    request_db = value
+                else:
+                    params.append((key, _freeze(value)))
+            if user is None:
+                raise RuntimeError("coalesce потребує залежності поточного користувача")
+            key = (name, tuple(params), access_scope(user, per_user=scope == "user"))
+            # Сесія запиту потрібна була лише для автентифікації: з'єднання
+            # повертається до пулу, а не тримається на час очікування
+            if request_db is not None and request_db is not batch_session.get():
+                request_db.close()
+
+            stats = _stats.setdefault(name, {"leader": 0, "follower": 0})
+            task = _in_flight.get(key)
+            if task is None:
+                stats["leader"] += 1
+                task = asyncio.ensure_future(asyncio.to_thread(compute, kwargs))
+                _in_flight[key] = task
+                task.add_done_callback(lambda _: _in_flight.pop(key, None))
+                headers = None
+            else:
+                stats["follower"] += 1
+                headers = {"X-Coalesced": "1"}
+            # shield: відключення одного клієнта не скасовує спільне обчислення
+            body = await asyncio.shield(task)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        return wrapper
+    return decorator
+
+
+def collect_metrics():
+    return [(
+        "coalesced_requests_total", "counter",
+        "Запити з об'єднанням: leader - обчислював, follower - отримав спільну відповідь",
+        [({"handler": name, "role": role}, count)
+         for name, counts in _stats.items() for role, count in counts.items()],
+    )]
+
+
+register_collector(collect_metrics)
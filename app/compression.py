@@ -0,0 +1,185 @@
+"""
+Прозоре стиснення великих текстових колонок
+
+CompressedText зберігається в колонці TEXT: короткі значення - звичайним
+рядком, довші за TEXT_COMPRESSION_MIN_BYTES - як BLOB з байтом-маркером
+формату і стисненими даними (SQLite дозволяє BLOB у колонці будь-якого
+типу, тому міграція схеми не потрібна). Читання розпізнає формат за типом
+значення і маркером, тож старі рядки, нові рядки та рядки після зміни
+алгоритму співіснують.
+
+Запис стисненого формату вмикається явно: TEXT_COMPRESSION=zlib або zstd
+(потрібен пакет zstandard; без нього - zlib). Наявні рядки перекодовуються
+фоновою міграцією:
+
+    python -m app.compression --batch-size 500 --pause-ms 20
+
+Стиснені колонки не підходять для LIKE/пошуку в SQL.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import zlib
+
+from sqlalchemy import create_engine
+from sqlalchemy.types import Text, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("app.compression")
+
+# Байти-маркери формату BLOB
+MARKER_ZLIB = 0x01
+MARKER_ZSTD = 0x02
+
+ALGORITHMS = ("off", "zlib", "zstd")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+MIN_BYTES = int(os.getenv("TEXT_COMPRESSION_MIN_BYTES", "512"))
+
+
+def _configured_algorithm() -> str:
+    algorithm = os.getenv("TEXT_COMPRESSION", "off").lower()
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Невідомий TEXT_COMPRESSION: {algorithm} (очікується {', '.join(ALGORITHMS)})")
+    if algorithm == "zstd" and zstandard is None:
+        logger.warning("TEXT_COMPRESSION=zstd, але пакет zstandard не встановлено - використовується zlib")
+        return "zlib"
+    return algorithm
+
+
+ALGORITHM = _configured_algorithm()
+
+if zstandard is not None:
+    _zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+
+
+def encode(text, algorithm: str = None):
+    """Значення для збереження: рядок або BLOB (маркер + стиснені дані)"""
+    algorithm = algorithm or ALGORITHM
+    if text is None or algorithm == "off":
+        return text
+    raw = text.encode("utf-8")
+    if len(raw) < MIN_BYTES:
+        return text
+    if algorithm == "zstd":
+        packed = bytes([MARKER_ZSTD]) + _zstd_compressor.compress(raw)
+    else:
+        packed = bytes([MARKER_ZLIB]) + zlib.compress(raw, ZLIB_LEVEL)
+    # Дані, що не стискаються, лишаються текстом
+    return packed if len(packed) < len(raw) else text
+
+
+def decode(value):
+    """Значення з БД -> рядок (будь-який підтримуваний формат)"""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    marker, payload = value[0], value[1:]
+    if marker == MARKER_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if marker == MARKER_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Запис стиснено zstd: встановіть пакет zstandard")
+        return _zstd_decompressor.decompress(payload).decode("utf-8")
+    raise ValueError(f"Невідомий маркер формату стиснення: {marker:#04x}")
+
+
+class CompressedText(TypeDecorator):
+    """Text із прозорим стисненням великих значень"""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encode(value)
+
+    def process_result_value(self, value, dialect):
+        return decode(value)
+
+
+def compressed_columns(table):
+    return [column.name for column in table.columns if isinstance(column.type, CompressedText)]
+
+
+def reencode(engine, table, algorithm: str = None, batch_size: int = 500, pause: float = 0.02) -> dict:
+    """
+    Перекодування наявних рядків у поточний формат (фонова міграція)
+
+    Пакетами за id, кожен пакет - окрема коротка транзакція, з паузою між
+    ними, щоб не блокувати записи застосунку. Рядки, що вже в потрібному
+    форматі, не змінюються, тому міграцію можна переривати й повторювати.
+    updated_at і журнал змін не зачіпаються: логічно дані не змінюються.
+    """
+    algorithm = algorithm or ALGORITHM
+    columns = compressed_columns(table)
+    select_sql = (
+        f"SELECT id, {', '.join(columns)} FROM {table.name} WHERE id > ? ORDER BY id LIMIT ?"
+    )
+    update_sql = f"UPDATE {table.name} SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?"
+    stats = {"rows": 0, "updated": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.exec_driver_sql(select_sql, (last_id, batch_size)).fetchall()
+            updates = []
+            for row in rows:
+                stored = row[1:]
+                encoded = tuple(encode(decode(value), algorithm) for value in stored)
+                stats["rows"] += 1
+                stats["bytes_before"] += sum(_stored_size(value) for value in stored)
+                stats["bytes_after"] += sum(_stored_size(value) for value in encoded)
+                if encoded != tuple(stored):
+                    updates.append(encoded + (row[0],))
+            if updates:
+                connection.exec_driver_sql(update_sql, updates)
+                stats["updated"] += len(updates)
+        if len(rows) < batch_size:
+            return stats
+        last_id = rows[-1][0]
+        time.sleep(pause)
+
+
+def _stored_size(value) -> int:
+    if value is None:
+        return 0
+    return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перекодування стиснених текстових колонок медичних записів")
+    parser.add_argument("--db-url", default=os.getenv("DATABASE_URL", "sqlite:///./hospital_management.db"))
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default=None,
+                        help="Цільовий формат (за замовчуванням - TEXT_COMPRESSION)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause-ms", type=float, default=20)
+    args = parser.parse_args(argv)
+
+    # При запуску через -m цей модуль - __main__; типи колонок моделей
+    # належать app.compression
+    from app import compression
+    from app.models import MedicalRecord
+
+    algorithm = args.algorithm or compression.ALGORITHM
+    if algorithm == "zstd" and zstandard is None:
+        parser.error("для zstd потрібен пакет zstandard")
+    engine = create_engine(args.db_url, connect_args={"check_same_thread": False})
+    started = time.perf_counter()
+    stats = compression.reencode(
+        engine, MedicalRecord.__table__, algorithm, args.batch_size, args.pause_ms / 1000
+    )
+    print(f"✓ Перекодовано {stats['updated']} з {stats['rows']} медичних записів у формат {algorithm} "
+          f"за {time.perf_counter() - started:.1f} с")
+    print(f"  Текстові колонки: {stats['bytes_before'] / 1e6:.1f} МБ -> {stats['bytes_after'] / 1e6:.1f} МБ")
+    print("  Місце у файлі БД звільняється після VACUUM")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
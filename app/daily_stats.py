@@ -0,0 +1,184 @@
+"""
+Денні підсумки записів на прийом і медичних записів
+
+appointment_daily_stats (день x лікар x відділення x статус: кількість,
+заброньовані хвилини, час від створення до прийому) і
+medical_record_daily_stats (день візиту x лікар) підтримуються
+інкрементально: після INSERT/UPDATE/DELETE через ORM у тій самій
+транзакції внесок старих значень рядка віднімається, нових - додається
+(INSERT ... ON CONFLICT DO UPDATE). Звіти (app/analytics.py) читають
+підсумки замість повного перегляду фактів.
+
+Архівування переносить записи Core-інструкціями без зміни підсумків:
+архівні записи лишаються в статистиці. Масові вставки в обхід ORM
+(generate_load_data.py) і ручні зміни в БД підсумки не оновлюють - для
+них і для виправлення розбіжностей є повна перебудова:
+
+    python -m app.daily_stats --db-url sqlite:///./hospital_management.db
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import Integer, cast, create_engine, delete, event, func, inspect, literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert
+
+from app.models import (
+    Appointment, ArchivedAppointment, MedicalRecord, AppointmentDailyStats, MedicalRecordDailyStats
+)
+
+DEFAULT_DURATION = 30
+# Довші прийоми - помилки введення; обмеження не дає їм спотворити звіти
+MAX_DURATION = 1440
+DEFAULT_STATUS = "scheduled"
+# department_id підсумків для записів без відділення
+NO_DEPARTMENT = 0
+
+APPOINTMENT_FIELDS = (
+    "appointment_date", "appointment_time", "duration_minutes", "status",
+    "department_id", "doctor_id", "created_at",
+)
+MEDICAL_RECORD_FIELDS = ("visit_date", "doctor_id", "is_confidential")
+
+
+def _minute(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+def _appointment_contribution(values: dict):
+    """(ключ, показники) рядка підсумків для значень запису на прийом"""
+    lead = None
+    if values["created_at"] is not None:
+        start = _minute(datetime.combine(values["appointment_date"], values["appointment_time"]))
+        lead = max(int((start - _minute(values["created_at"])).total_seconds()) // 60, 0)
+    key = {
+        "day": values["appointment_date"],
+        "doctor_id": values["doctor_id"],
+        "department_id": values["department_id"] or NO_DEPARTMENT,
+        "status": values["status"] or DEFAULT_STATUS,
+    }
+    measures = {
+        "appointments": 1,
+        "booked_minutes": min(values["duration_minutes"] or DEFAULT_DURATION, MAX_DURATION),
+        "lead_minutes": lead or 0,
+        "lead_count": int(lead is not None),
+    }
+    return key, measures
+
+
+def _medical_record_contribution(values: dict):
+    if values["visit_date"] is None:
+        return None
+    key = {"day": values["visit_date"].date(), "doctor_id": values["doctor_id"]}
+    return key, {"records": 1, "confidential": int(bool(values["is_confidential"]))}
+
+
+def _values(target, fields, previous: bool = False) -> dict:
+    """Поточні значення полів або значення до змін у цьому flush"""
+    state = inspect(target)
+    values = {}
+    for name in fields:
+        history = state.attrs[name].history
+        values[name] = history.deleted[0] if previous and history.deleted else getattr(target, name)
+    return values
+
+
+def _apply(connection, table, contribution, sign: int):
+    if contribution is None:
+        return
+    key, measures = contribution
+    statement = insert(table).values(**key, **{name: sign * value for name, value in measures.items()})
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: table.c[name] + statement.excluded[name] for name in measures},
+    ))
+
+
+def _track(model, stats_model, fields, contribution):
+    table = stats_model.__table__
+
+    def after_insert(mapper, connection, target):
+        _apply(connection, table, contribution(_values(target, fields)), 1)
+
+    def after_update(mapper, connection, target):
+        old, new = _values(target, fields, previous=True), _values(target, fields)
+        if old != new:
+            _apply(connection, table, contribution(old), -1)
+            _apply(connection, table, contribution(new), 1)
+
+    def after_delete(mapper, connection, target):
+        _apply(connection, table, contribution(_values(target, fields, previous=True)), -1)
+
+    event.listen(model, "after_insert", after_insert)
+    event.listen(model, "after_update", after_update)
+    event.listen(model, "after_delete", after_delete)
+
+
+_track(Appointment, AppointmentDailyStats, APPOINTMENT_FIELDS, _appointment_contribution)
+_track(MedicalRecord, MedicalRecordDailyStats, MEDICAL_RECORD_FIELDS, _medical_record_contribution)
+
+
+def _appointment_facts(model):
+    """Записи на прийом частини з ключем і показниками підсумків (для rebuild)"""
+    start = func.strftime("%s", model.appointment_date.op("||")(" ").op("||")(func.substr(model.appointment_time, 1, 5)))
+    created = func.strftime("%s", func.substr(model.created_at, 1, 16))
+    return select(
+        model.appointment_date.label("day"),
+        model.doctor_id.label("doctor_id"),
+        func.coalesce(model.department_id, NO_DEPARTMENT).label("department_id"),
+        func.coalesce(model.status, DEFAULT_STATUS).label("status"),
+        func.min(func.coalesce(model.duration_minutes, DEFAULT_DURATION), MAX_DURATION).label("booked_minutes"),
+        func.max((cast(start, Integer) - cast(created, Integer)) // 60, 0).label("lead_minutes"),
+    )
+
+
+def rebuild(connection) -> dict:
+    """Повна перебудова підсумків з фактів (гаряча таблиця, архів, медичні записи)"""
+    facts = union_all(_appointment_facts(Appointment), _appointment_facts(ArchivedAppointment)).subquery()
+    keys = [facts.c.day, facts.c.doctor_id, facts.c.department_id, facts.c.status]
+    connection.execute(delete(AppointmentDailyStats))
+    connection.execute(insert(AppointmentDailyStats).from_select(
+        ["day", "doctor_id", "department_id", "status",
+         "appointments", "booked_minutes", "lead_minutes", "lead_count"],
+        select(
+            *keys, func.count(), func.sum(facts.c.booked_minutes),
+            func.coalesce(func.sum(facts.c.lead_minutes), 0), func.count(facts.c.lead_minutes),
+        ).group_by(*keys),
+    ))
+
+    day = func.date(MedicalRecord.visit_date)
+    connection.execute(delete(MedicalRecordDailyStats))
+    connection.execute(insert(MedicalRecordDailyStats).from_select(
+        ["day", "doctor_id", "records", "confidential"],
+        select(
+            day, MedicalRecord.doctor_id, func.count(),
+            func.sum(func.coalesce(cast(MedicalRecord.is_confidential, Integer), literal(0))),
+        ).where(MedicalRecord.visit_date.is_not(None)).group_by(day, MedicalRecord.doctor_id),
+    ))
+    return {
+        "appointment_rows": connection.execute(select(func.count()).select_from(AppointmentDailyStats)).scalar(),
+        "medical_record_rows": connection.execute(select(func.count()).select_from(MedicalRecordDailyStats)).scalar(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Повна перебудова денних підсумків записів")
+    parser.add_argument("--db-url", default=os.getenv("DATABASE_URL", "sqlite:///./hospital_management.db"))
+    args = parser.parse_args(argv)
+
+    from app import daily_stats
+
+    engine = create_engine(args.db_url, connect_args={"check_same_thread": False})
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        stats = daily_stats.rebuild(connection)
+    print(f"✓ Денні підсумки перебудовано за {time.perf_counter() - started:.1f} с: "
+          f"{stats['appointment_rows']} рядків записів на прийом, "
+          f"{stats['medical_record_rows']} рядків медичних записів")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
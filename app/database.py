@@ -1,22 +1,34 @@
+import os
+from contextvars import ContextVar
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# Налаштування бази даних SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///./hospital_management.db"
+# Налаштування бази даних SQLite (DATABASE_URL - для тестових і згенерованих баз)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./hospital_management.db")
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
     connect_args={"check_same_thread": False},
-    echo=True  # Логування SQL запитів для дослідження
+    # Повне логування SQL лише на вимогу (SQL_ECHO=1); для пошуку гарячих
+    # запитів у продакшені див. app.sql_monitor
+    echo=os.getenv("SQL_ECHO") == "1"
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Сесія пакетного запиту (POST /api/batch): вкладені запити пакета
+# використовують одну сесію замість власних
+batch_session = ContextVar("batch_session", default=None)
+
 def get_db():
     """Dependency для отримання сесії БД"""
+    shared = batch_session.get()
+    if shared is not None:
+        yield shared
+        return
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,275 @@
+"""
+Потік змін записів на прийом (Server-Sent Events)
+
+Створення, оновлення та скасування запису додають подію до таблиці
+appointment_events у тій самій транзакції (publish) і позначають тему
+TOPIC_APPOINTMENTS шини інвалідації. Після коміту (у своєму процесі одразу,
+в інших - за опитуванням шини) хаб кожного процесу читає нові події одним
+запитом і розсилає їх підписникам.
+
+Підписник - це обмежена черга і фільтр за відділеннями та лікарями; хаб
+тримає індекси підписників за відділенням і лікарем, тому розсилка події
+не перебирає всі з'єднання. Повідомлення SSE форматується один раз на
+подію. Неактивне з'єднання коштує одну корутину, що чекає на черзі, і
+коментар keepalive раз на SSE_HEARTBEAT_SECONDS. Підписник, що не встигає
+(черга переповнена), отримує подію resync замість пропущених подій і
+перезавантажує список сам.
+
+Клієнт, що перепідключається з Last-Event-ID, отримує пропущені події з
+журналу (до SSE_REPLAY_LIMIT), інакше - resync.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict, deque
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.database import engine, SessionLocal
+from app.invalidation import bus, TOPIC_APPOINTMENTS, TOPIC_RBAC, TOPIC_USERS
+from app.metrics import register_collector
+from app.models import AppointmentEvent, Role, User
+from app.schemas import AppointmentResponse
+
+QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+REPLAY_LIMIT = int(os.getenv("SSE_REPLAY_LIMIT", "1000"))
+# Скільки останніх подій зберігається в журналі
+RETENTION_EVENTS = int(os.getenv("APPOINTMENT_EVENTS_RETENTION", "10000"))
+PRUNE_EVERY = 500
+
+READ_PERMISSION = "appointments.read"
+RETRY_MESSAGE = b"retry: 3000\n\n"
+KEEPALIVE_MESSAGE = b": keepalive\n\n"
+CLOSE_MESSAGE = b"event: close\ndata: {}\n\n"
+
+
+def publish(db: Session, action: str, appointment):
+    """Подія зміни запису в поточній транзакції сесії (запис має мати id)"""
+    payload = {
+        "action": action,
+        "appointment": AppointmentResponse.model_validate(appointment).model_dump(mode="json"),
+    }
+    event = AppointmentEvent(
+        appointment_id=appointment.id,
+        action=action,
+        doctor_id=appointment.doctor_id,
+        department_id=appointment.department_id,
+        payload=json.dumps(payload, ensure_ascii=False),
+    )
+    db.add(event)
+    db.flush()
+    if event.seq % PRUNE_EVERY == 0:
+        db.execute(delete(AppointmentEvent).where(AppointmentEvent.seq <= event.seq - RETENTION_EVENTS))
+    bus.bump(db, TOPIC_APPOINTMENTS)
+
+
+def _message(seq: int, payload: str) -> bytes:
+    return f"id: {seq}\nevent: appointment\ndata: {payload}\n\n".encode()
+
+
+def _resync_message(seq: int) -> bytes:
+    return f"id: {seq}\nevent: resync\ndata: {{}}\n\n".encode()
+
+
+class Subscriber:
+    """Одне SSE-з'єднання"""
+
+    def __init__(self, user_id: int, departments, doctors):
+        self.user_id = user_id
+        self.departments = frozenset(departments or ())
+        self.doctors = frozenset(doctors or ())
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.backlog = deque()
+        self.last_seq = 0
+        self.lagging = False
+        self.needs_check = False
+
+    def matches(self, department_id, doctor_id) -> bool:
+        if not self.departments and not self.doctors:
+            return True
+        return department_id in self.departments or doctor_id in self.doctors
+
+
+class AppointmentHub:
+    """Розсилка подій підписникам процесу"""
+
+    def __init__(self):
+        self._all = set()
+        self._by_department = defaultdict(set)
+        self._by_doctor = defaultdict(set)
+        self._subscribers = set()
+        self._last_seq = None
+        self._loop = None
+        self._loop_thread = None
+        self.delivered = 0
+        self.resyncs = 0
+
+    @staticmethod
+    def _max_seq() -> int:
+        with engine.connect() as connection:
+            return connection.execute(select(func.max(AppointmentEvent.seq))).scalar() or 0
+
+    def connect(self, user_id: int, departments=None, doctors=None, last_event_id: int = None) -> Subscriber:
+        """Реєстрація підписника (викликається в циклі подій)"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        if self._last_seq is None:
+            self._last_seq = self._max_seq()
+
+        subscriber = Subscriber(user_id, departments, doctors)
+        subscriber.last_seq = self._last_seq
+        if last_event_id is not None and last_event_id < self._last_seq:
+            self._replay(subscriber, last_event_id)
+
+        self._subscribers.add(subscriber)
+        if not subscriber.departments and not subscriber.doctors:
+            self._all.add(subscriber)
+        for department_id in subscriber.departments:
+            self._by_department[department_id].add(subscriber)
+        for doctor_id in subscriber.doctors:
+            self._by_doctor[doctor_id].add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        self._all.discard(subscriber)
+        for index, keys in ((self._by_department, subscriber.departments), (self._by_doctor, subscriber.doctors)):
+            for key in keys:
+                index[key].discard(subscriber)
+                if not index[key]:
+                    del index[key]
+
+    def _replay(self, subscriber: Subscriber, last_event_id: int):
+        """Пропущені події з журналу для перепідключення з Last-Event-ID"""
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(AppointmentEvent.seq, AppointmentEvent.department_id,
+                       AppointmentEvent.doctor_id, AppointmentEvent.payload)
+                .where(AppointmentEvent.seq > last_event_id, AppointmentEvent.seq <= self._last_seq)
+                .order_by(AppointmentEvent.seq)
+                .limit(REPLAY_LIMIT + 1)
+            ).all()
+        # Частину подій видалено з журналу або їх забагато - повне перезавантаження
+        if len(rows) > REPLAY_LIMIT or not rows or rows[0].seq != last_event_id + 1:
+            self.resyncs += 1
+            subscriber.backlog.append(_resync_message(self._last_seq))
+            return
+        for row in rows:
+            if subscriber.matches(row.department_id, row.doctor_id):
+                subscriber.backlog.append(_message(row.seq, row.payload))
+
+    def dispatch(self):
+        """Читання нових подій і розсилка (підписка на TOPIC_APPOINTMENTS)"""
+        if self._loop is not None and threading.get_ident() != self._loop_thread:
+            # Коміт з іншого потоку (скрипт, синхронний обробник)
+            self._loop.call_soon_threadsafe(self.dispatch)
+            return
+        if not self._subscribers:
+            # Без підписників журнал не читається; позиція береться при підключенні
+            self._last_seq = None
+            return
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(AppointmentEvent.seq, AppointmentEvent.department_id,
+                       AppointmentEvent.doctor_id, AppointmentEvent.payload)
+                .where(AppointmentEvent.seq > self._last_seq)
+                .order_by(AppointmentEvent.seq)
+            ).all()
+        for row in rows:
+            self._last_seq = row.seq
+            self._fan_out(row.seq, row.department_id, row.doctor_id, _message(row.seq, row.payload))
+
+    def _fan_out(self, seq: int, department_id, doctor_id, message: bytes):
+        targets = self._all.union(self._by_department.get(department_id, ()), self._by_doctor.get(doctor_id, ()))
+        for subscriber in targets:
+            if subscriber.lagging:
+                continue
+            try:
+                subscriber.queue.put_nowait((seq, message))
+                self.delivered += 1
+            except asyncio.QueueFull:
+                subscriber.lagging = True
+                self.resyncs += 1
+
+    def revalidate(self):
+        """Зміна ролей чи користувачів: кожен підписник перевіряє доступ заново"""
+        if self._loop is not None and threading.get_ident() != self._loop_thread:
+            self._loop.call_soon_threadsafe(self.revalidate)
+            return
+        for subscriber in self._subscribers:
+            subscriber.needs_check = True
+            try:
+                subscriber.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    def current_seq(self) -> int:
+        return self._last_seq or 0
+
+    def collect_metrics(self):
+        return [(
+            "sse_subscribers", "gauge", "Відкриті SSE-з'єднання потоку записів",
+            [({}, len(self._subscribers))],
+        ), (
+            "sse_events_delivered_total", "counter", "Події, поставлені в черги підписників",
+            [({}, self.delivered)],
+        ), (
+            "sse_resyncs_total", "counter", "Підписники, яким надіслано resync замість подій",
+            [({}, self.resyncs)],
+        )]
+
+
+def _still_allowed(user_id: int) -> bool:
+    with SessionLocal() as db:
+        user = (
+            db.query(User)
+            .options(selectinload(User.roles).selectinload(Role.permissions))
+            .filter(User.id == user_id)
+            .first()
+        )
+        return user is not None and user.is_active and user.has_permission(READ_PERMISSION)
+
+
+async def stream(user_id: int, departments=None, doctors=None, last_event_id: int = None):
+    """Тіло відповіді text/event-stream для одного підписника"""
+    subscriber = hub.connect(user_id, departments, doctors, last_event_id)
+    try:
+        yield RETRY_MESSAGE
+        while subscriber.backlog:
+            yield subscriber.backlog.popleft()
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE_MESSAGE
+                continue
+            if subscriber.needs_check:
+                subscriber.needs_check = False
+                if not _still_allowed(subscriber.user_id):
+                    yield CLOSE_MESSAGE
+                    return
+            if subscriber.lagging:
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.lagging = False
+                subscriber.last_seq = hub.current_seq()
+                yield _resync_message(subscriber.last_seq)
+                continue
+            if item is None:
+                continue
+            seq, message = item
+            if seq > subscriber.last_seq:
+                subscriber.last_seq = seq
+                yield message
+    finally:
+        hub.disconnect(subscriber)
+
+
+hub = AppointmentHub()
+bus.subscribe(TOPIC_APPOINTMENTS, hub.dispatch)
+bus.subscribe(TOPIC_RBAC, hub.revalidate)
+bus.subscribe(TOPIC_USERS, hub.revalidate)
+register_collector(hub.collect_metrics)
@@ -0,0 +1,465 @@
+"""
+Шифрування клінічних полів конфіденційних медичних записів
+
+Конвертне шифрування AES-GCM. Кожен конфіденційний запис має власний
+ключ даних (DEK), обгорнутий активним майстер-ключем з локального файлу
+ключів (MASTER_KEY_FILE); у рядку зберігаються обгорнутий DEK і
+ідентифікатор майстер-ключа. Усі клінічні поля запису шифруються разом
+однією операцією: колонка encrypted_payload містить маркер 0x10, nonce і
+шифротекст, а самі колонки полів - NULL (diagnosis - порожній рядок).
+
+Шифрування і розшифрування прозорі для коду застосунку: події маперу
+MedicalRecord шифрують перед INSERT/UPDATE і розшифровують при
+завантаженні. Розгорнуті DEK кешуються (LRU, розмір
+FIELD_CRYPTO_DEK_CACHE_SIZE), тож список записів коштує одне розшифрування
+AES-GCM на конфіденційний запис без звернень до майстер-ключа.
+
+Файл майстер-ключів створюється лише явно (init): без нього застосунок
+не зміг би розшифрувати наявні записи, тож новий ключ замість втраченого
+не створюється. Під час запуску check_master_key перевіряє, що файл є і
+розгортає ключі даних наявних записів, інакше запуск переривається.
+
+Ротація майстер-ключа не перешифровує дані - лише переобгортає DEK
+фоновою пакетною задачею:
+
+    python -m app.field_crypto init        # створити файл майстер-ключів (один раз)
+    python -m app.field_crypto rotate      # новий активний майстер-ключ + переобгортання
+    python -m app.field_crypto migrate     # зашифрувати наявні конфіденційні записи
+    python -m app.field_crypto reencrypt   # нові DEK і перешифрування даних
+    python -m app.field_crypto status
+"""
+import argparse
+import base64
+import json
+import os
+import secrets
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import attributes
+
+from app import compression
+from app.metrics import register_cache
+from app.models import MedicalRecord
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Типово - у корені проекту, а не в поточному каталозі процесу
+MASTER_KEY_FILE = os.path.abspath(os.getenv("MASTER_KEY_FILE", os.path.join(ROOT_DIR, "master.key")))
+DEK_CACHE_SIZE = int(os.getenv("FIELD_CRYPTO_DEK_CACHE_SIZE", "10000"))
+
+# Маркер формату encrypted_payload (0x01/0x02 зайняті стисненням)
+MARKER_AES_GCM = 0x10
+NONCE_BYTES = 12
+# Внутрішній формат відкритого тексту: 0x00 - як є, 0x01 - zlib. Поля
+# пакуються заголовком довжин (у символах, -1 - NULL) і одним UTF-8 тілом:
+# розбір - один decode і зрізи, утричі швидше за JSON
+_INNER_PLAIN = 0x00
+_INNER_ZLIB = 0x01
+
+# Поля, що шифруються, і значення колонки в зашифрованому рядку
+ENCRYPTED_FIELDS = ("diagnosis", "symptoms", "treatment", "prescriptions", "lab_results", "notes")
+PLACEHOLDERS = {"diagnosis": ""}
+
+_FIELDS_HEADER = struct.Struct(f"<B{len(ENCRYPTED_FIELDS)}i")
+
+_DEK_AAD = b"medical_records.dek"
+_PAYLOAD_AAD = b"medical_records.payload"
+
+dek_cache_stats = register_cache("medical_record_dek")
+
+
+class MasterKeyError(RuntimeError):
+    pass
+
+
+class Keyring:
+    """Майстер-ключі з файлу: {"active": id, "keys": {id: base64}}"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self.active = None
+        self.keys = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            raise MasterKeyError(
+                f"Файл майстер-ключів не знайдено: {self.path} (створення - python -m app.field_crypto init)"
+            )
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self.keys = {key_id: AESGCM(base64.b64decode(key)) for key_id, key in data["keys"].items()}
+        self.active = data["active"]
+        return self
+
+    def refresh(self):
+        """Перечитування після ротації в іншому процесі"""
+        try:
+            if os.stat(self.path).st_mtime_ns != self._mtime:
+                self.load()
+        except FileNotFoundError:
+            pass
+
+    def rotate(self) -> str:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        key_id = f"k{max(int(k[1:]) for k in data['keys']) + 1}"
+        data["keys"][key_id] = _new_key()
+        data["active"] = key_id
+        self._write(data)
+        self.load()
+        return key_id
+
+    def retire(self, key_ids):
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        for key_id in key_ids:
+            if key_id != data["active"]:
+                data["keys"].pop(key_id, None)
+        self._write(data)
+        self.load()
+
+    def _write_tmp(self, data: dict) -> str:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        return tmp_path
+
+    def _write(self, data: dict):
+        os.replace(self._write_tmp(data), self.path)
+
+    def create(self):
+        """Новий файл з ключем k1; наявний файл не перезаписується"""
+        tmp_path = self._write_tmp({"active": "k1", "keys": {"k1": _new_key()}})
+        try:
+            os.link(tmp_path, self.path)
+        except FileExistsError:
+            raise MasterKeyError(f"Файл майстер-ключів уже існує: {self.path}")
+        finally:
+            os.remove(tmp_path)
+        return self.load()
+
+    def master(self, key_id: str) -> AESGCM:
+        if key_id not in self.keys:
+            self.refresh()
+        try:
+            return self.keys[key_id]
+        except KeyError:
+            raise MasterKeyError(f"Майстер-ключ {key_id} відсутній у {self.path}")
+
+
+def _new_key() -> str:
+    return base64.b64encode(AESGCM.generate_key(bit_length=256)).decode()
+
+
+_keyring = None
+
+
+def keyring() -> Keyring:
+    global _keyring
+    if _keyring is None:
+        _keyring = Keyring(MASTER_KEY_FILE).load()
+    return _keyring
+
+
+def check_master_key(engine):
+    """
+    Перевірка при запуску застосунку: ключі даних наявних записів розгортаються
+
+    MasterKeyError, якщо файлу немає, а база містить зашифровані записи, або
+    якщо ключ з файлу не підходить (файл замінено новим). Без файлу і без
+    зашифрованих записів - лише попередження: конфіденційні записи не
+    зберігатимуться до init.
+    """
+    with engine.connect() as connection:
+        # По одному DEK на майстер-ключ: помилку файлу видно без повного проходу
+        samples = connection.exec_driver_sql(
+            "SELECT key_id, min(encrypted_dek) FROM medical_records "
+            "WHERE encrypted_payload IS NOT NULL GROUP BY key_id"
+        ).all()
+    if not os.path.exists(MASTER_KEY_FILE) and not samples:
+        print(f"⚠️  Файл майстер-ключів {MASTER_KEY_FILE} не знайдено: конфіденційні медичні записи "
+              f"не зберігатимуться (створення - python -m app.field_crypto init)")
+        return
+    ring = keyring()
+    for key_id, wrapped in samples:
+        try:
+            ring.master(key_id).decrypt(wrapped[:NONCE_BYTES], wrapped[NONCE_BYTES:], _DEK_AAD)
+        except InvalidTag:
+            raise MasterKeyError(f"Майстер-ключ {key_id} у {MASTER_KEY_FILE} не розшифровує ключі даних записів")
+
+
+# ===== Ключі даних =====
+# Кеш використовують цикл подій, потоки to_thread, записувач групового коміту
+# і фонові завдання: get/move_to_end і popitem - під блокуванням
+_dek_cache = OrderedDict()
+_dek_lock = threading.Lock()
+
+
+def _wrap(dek: bytes, key_id: str) -> bytes:
+    nonce = secrets.token_bytes(NONCE_BYTES)
+    return nonce + keyring().master(key_id).encrypt(nonce, dek, _DEK_AAD)
+
+
+def _unwrap(wrapped: bytes, key_id: str) -> AESGCM:
+    """AESGCM розгорнутого DEK (з кешу)"""
+    cache_key = (key_id, wrapped)
+    with _dek_lock:
+        cipher = _dek_cache.get(cache_key)
+        if cipher is not None:
+            _dek_cache.move_to_end(cache_key)
+            dek_cache_stats.hits += 1
+            return cipher
+        dek_cache_stats.misses += 1
+    dek = keyring().master(key_id).decrypt(wrapped[:NONCE_BYTES], wrapped[NONCE_BYTES:], _DEK_AAD)
+    return _cache_dek(cache_key, AESGCM(dek))
+
+
+def _cache_dek(cache_key, cipher: AESGCM) -> AESGCM:
+    with _dek_lock:
+        _dek_cache[cache_key] = cipher
+        if len(_dek_cache) > DEK_CACHE_SIZE:
+            _dek_cache.popitem(last=False)
+    return cipher
+
+
+def new_dek():
+    """Новий DEK: (AESGCM, обгорнутий DEK, id майстер-ключа)"""
+    ring = keyring()
+    ring.refresh()
+    dek = AESGCM.generate_key(bit_length=256)
+    wrapped = _wrap(dek, ring.active)
+    return _cache_dek((ring.active, wrapped), AESGCM(dek)), wrapped, ring.active
+
+
+def rewrap(wrapped: bytes, key_id: str):
+    """Той самий DEK під активним майстер-ключем"""
+    ring = keyring()
+    dek = ring.master(key_id).decrypt(wrapped[:NONCE_BYTES], wrapped[NONCE_BYTES:], _DEK_AAD)
+    return _wrap(dek, ring.active), ring.active
+
+
+# ===== Дані =====
+def _pack_fields(fields: dict) -> bytes:
+    values = [fields.get(name) for name in ENCRYPTED_FIELDS]
+    lengths = (-1 if value is None else len(value) for value in values)
+    body = "".join(value for value in values if value is not None)
+    return _FIELDS_HEADER.pack(len(values), *lengths) + body.encode("utf-8")
+
+
+def _unpack_fields(data: bytes) -> dict:
+    count, *lengths = _FIELDS_HEADER.unpack_from(data)
+    body = data[_FIELDS_HEADER.size:].decode("utf-8")
+    fields = {}
+    position = 0
+    for name, length in zip(ENCRYPTED_FIELDS, lengths):
+        if length < 0:
+            fields[name] = None
+        else:
+            fields[name] = body[position:position + length]
+            position += length
+    return fields
+
+
+def encrypt_fields(fields: dict, cipher: AESGCM) -> bytes:
+    inner = _pack_fields(fields)
+    if len(inner) >= compression.MIN_BYTES:
+        inner = bytes([_INNER_ZLIB]) + zlib.compress(inner, compression.ZLIB_LEVEL)
+    else:
+        inner = bytes([_INNER_PLAIN]) + inner
+    nonce = secrets.token_bytes(NONCE_BYTES)
+    return bytes([MARKER_AES_GCM]) + nonce + cipher.encrypt(nonce, inner, _PAYLOAD_AAD)
+
+
+def decrypt_fields(payload: bytes, wrapped: bytes, key_id: str) -> dict:
+    payload = bytes(payload)
+    if payload[0] != MARKER_AES_GCM:
+        raise ValueError(f"Невідомий маркер шифрування: {payload[0]:#04x}")
+    nonce = payload[1:1 + NONCE_BYTES]
+    inner = _unwrap(bytes(wrapped), key_id).decrypt(nonce, payload[1 + NONCE_BYTES:], _PAYLOAD_AAD)
+    if inner[0] == _INNER_ZLIB:
+        return _unpack_fields(zlib.decompress(inner[1:]))
+    return _unpack_fields(inner[1:])
+
+
+# ===== Події маперу =====
+def _before_write(mapper, connection, target):
+    if target.is_confidential:
+        fields = {name: getattr(target, name) for name in ENCRYPTED_FIELDS}
+        if target.encrypted_dek is not None and target.key_id is not None:
+            cipher = _unwrap(target.encrypted_dek, target.key_id)
+        else:
+            cipher, target.encrypted_dek, target.key_id = new_dek()
+        target.encrypted_payload = encrypt_fields(fields, cipher)
+        for name in ENCRYPTED_FIELDS:
+            setattr(target, name, PLACEHOLDERS.get(name))
+        # Відкритий текст повертається в об'єкт після запису (_after_write)
+        target._plaintext_fields = fields
+    elif target.encrypted_payload is not None:
+        # Запис перестав бути конфіденційним: поля (вже розшифровані) - у колонки
+        target.encrypted_payload = None
+        target.encrypted_dek = None
+        target.key_id = None
+        for name in ENCRYPTED_FIELDS:
+            attributes.flag_modified(target, name)
+
+
+def _after_write(mapper, connection, target):
+    fields = target.__dict__.pop("_plaintext_fields", None)
+    if fields is not None:
+        for name, value in fields.items():
+            attributes.set_committed_value(target, name, value)
+
+
+def _decrypt_loaded(target, context, attrs=None):
+    state = target.__dict__
+    payload = state.get("encrypted_payload")
+    if payload is None or (attrs is not None and "encrypted_payload" not in attrs):
+        return
+    fields = decrypt_fields(payload, state["encrypted_dek"], state["key_id"])
+    if attrs is None:
+        # Щойно завантажений об'єкт не має історії змін: достатньо записати
+        # значення в __dict__ (set_committed_value утричі дорожчий за розшифрування)
+        state.update(fields)
+        return
+    for name, value in fields.items():
+        attributes.set_committed_value(target, name, value)
+
+
+event.listen(MedicalRecord, "before_insert", _before_write)
+event.listen(MedicalRecord, "before_update", _before_write)
+event.listen(MedicalRecord, "after_insert", _after_write)
+event.listen(MedicalRecord, "after_update", _after_write)
+event.listen(MedicalRecord, "load", _decrypt_loaded)
+event.listen(MedicalRecord, "refresh", _decrypt_loaded)
+
+
+# ===== Фонові задачі =====
+def process_records(engine, mode: str, batch_size: int = 500, pause: float = 0.02) -> dict:
+    """
+    Пакетна обробка конфіденційних записів без зупинки застосунку
+
+    mode: migrate - зашифрувати ще не зашифровані; rotate - переобгорнути
+    DEK під активним майстер-ключем (і зашифрувати незашифровані);
+    reencrypt - нові DEK і перешифрування всіх даних; decrypt - повернути
+    відкритий текст у колонки (базовий варіант бенчмарку). Кожен пакет - коротка
+    транзакція; updated_at і журнал змін не зачіпаються.
+    """
+    table = MedicalRecord.__table__
+    columns = ", ".join(ENCRYPTED_FIELDS)
+    select_sql = (
+        f"SELECT id, encrypted_payload, encrypted_dek, key_id, {columns} FROM {table.name} "
+        f"WHERE id > ? AND is_confidential = 1 ORDER BY id LIMIT ?"
+    )
+    encrypt_sql = (
+        f"UPDATE {table.name} SET encrypted_payload = ?, encrypted_dek = ?, key_id = ?, "
+        + ", ".join(f"{name} = ?" for name in ENCRYPTED_FIELDS) + " WHERE id = ?"
+    )
+    rewrap_sql = f"UPDATE {table.name} SET encrypted_dek = ?, key_id = ? WHERE id = ?"
+    decrypt_sql = (
+        f"UPDATE {table.name} SET encrypted_payload = NULL, encrypted_dek = NULL, key_id = NULL, "
+        + ", ".join(f"{name} = ?" for name in ENCRYPTED_FIELDS) + " WHERE id = ?"
+    )
+    placeholders = tuple(PLACEHOLDERS.get(name) for name in ENCRYPTED_FIELDS)
+    stats = {"rows": 0, "encrypted": 0, "rewrapped": 0, "decrypted": 0}
+    active = keyring().active
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.exec_driver_sql(select_sql, (last_id, batch_size)).fetchall()
+            encrypt_updates, rewrap_updates, decrypt_updates = [], [], []
+            for row in rows:
+                record_id, payload, wrapped, key_id = row[:4]
+                stats["rows"] += 1
+                if mode == "decrypt":
+                    if payload is not None:
+                        fields = decrypt_fields(payload, wrapped, key_id)
+                        decrypt_updates.append(
+                            tuple(compression.encode(fields[name]) for name in ENCRYPTED_FIELDS) + (record_id,)
+                        )
+                    continue
+                if payload is None:
+                    fields = dict(zip(ENCRYPTED_FIELDS, (compression.decode(value) for value in row[4:])))
+                elif mode == "reencrypt":
+                    fields = decrypt_fields(payload, wrapped, key_id)
+                else:
+                    if key_id != active:
+                        rewrap_updates.append(rewrap(bytes(wrapped), key_id) + (record_id,))
+                    continue
+                cipher, new_wrapped, new_key_id = new_dek()
+                encrypt_updates.append(
+                    (encrypt_fields(fields, cipher), new_wrapped, new_key_id) + placeholders + (record_id,)
+                )
+            if encrypt_updates:
+                connection.exec_driver_sql(encrypt_sql, encrypt_updates)
+                stats["encrypted"] += len(encrypt_updates)
+            if rewrap_updates and mode == "rotate":
+                connection.exec_driver_sql(rewrap_sql, rewrap_updates)
+                stats["rewrapped"] += len(rewrap_updates)
+            if decrypt_updates:
+                connection.exec_driver_sql(decrypt_sql, decrypt_updates)
+                stats["decrypted"] += len(decrypt_updates)
+        if len(rows) < batch_size:
+            return stats
+        last_id = rows[-1][0]
+        time.sleep(pause)
+
+
+def key_usage(engine) -> dict:
+    with engine.connect() as connection:
+        return dict(connection.exec_driver_sql(
+            "SELECT coalesce(key_id, '-'), count(*) FROM medical_records WHERE is_confidential = 1 GROUP BY 1"
+        ).all())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Шифрування конфіденційних медичних записів")
+    parser.add_argument("command", choices=("init", "status", "migrate", "rotate", "reencrypt"))
+    parser.add_argument("--db-url", default=os.getenv("DATABASE_URL", "sqlite:///./hospital_management.db"))
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause-ms", type=float, default=20)
+    parser.add_argument("--retire", action="store_true", help="Після ротації видалити невикористовувані майстер-ключі")
+    args = parser.parse_args(argv)
+
+    # При запуску через -m цей модуль - __main__; події маперу зареєстровані в app.field_crypto
+    from app import field_crypto
+
+    try:
+        if args.command == "init":
+            field_crypto.Keyring(field_crypto.MASTER_KEY_FILE).create()
+            print(f"✓ Створено файл майстер-ключів {field_crypto.MASTER_KEY_FILE} - зберігайте його окремо від бекапів БД")
+            return 0
+        ring = field_crypto.keyring()
+    except field_crypto.MasterKeyError as exc:
+        print(f"⚠️  {exc}")
+        return 1
+    engine = create_engine(args.db_url, connect_args={"check_same_thread": False})
+    if args.command == "rotate":
+        print(f"🔑 Новий активний майстер-ключ: {ring.rotate()}")
+    if args.command != "status":
+        started = time.perf_counter()
+        stats = field_crypto.process_records(engine, args.command, args.batch_size, args.pause_ms / 1000)
+        print(f"✓ Оброблено {stats['rows']} конфіденційних записів за {time.perf_counter() - started:.1f} с: "
+              f"зашифровано {stats['encrypted']}, переобгорнуто DEK {stats['rewrapped']}")
+    usage = field_crypto.key_usage(engine)
+    if args.retire:
+        unused = [key_id for key_id in ring.keys if key_id not in usage and key_id != ring.active]
+        ring.retire(unused)
+        print(f"✓ Видалено майстер-ключі: {', '.join(unused) or '-'}")
+    print(f"Активний майстер-ключ: {ring.active}")
+    for key_id, count in sorted(usage.items()):
+        print(f"  {key_id}: {count} записів" + ("  (не зашифровано)" if key_id == "-" else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
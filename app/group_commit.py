@@ -0,0 +1,189 @@
+"""
+Груповий коміт записів (GROUP_COMMIT=1)
+
+SQLite виконує записи по одному, і кожен коміт чекає на синхронізацію
+журналу з диском - пропускна здатність записів обмежена затримкою fsync,
+а не CPU. У режимі групового коміту обробники створення, зміни і
+видалення не комітять самі, а передають одиницю запису (функцію від
+сесії) потоку-записувачу. Записувач бере всі одиниці, що накопичилися в
+черзі, поки комітилася попередня група (до GROUP_COMMIT_MAX_UNITS; з
+GROUP_COMMIT_WINDOW_MS > 0 ще й чекає на нові стільки мілісекунд), виконує
+їх в одній транзакції (BEGIN IMMEDIATE) і комітить один раз: чим довший
+fsync, тим більші групи. Кожна одиниця
+виконується у власній точці збереження (SAVEPOINT): її помилка
+(HTTPException перевірки, порушення обмеження) відкочує лише її, решта
+групи комітиться. Запит отримує результат або свою помилку після коміту
+групи; помилка самого коміту повертається всім одиницям групи.
+
+Перевірки, від яких залежить запис (зайнятість лікаря, унікальність
+страхового номера), виконуються всередині одиниці: одиниці групи
+виконуються послідовно, тож перевірка бачить записи попередніх.
+
+Без GROUP_COMMIT (за замовчуванням), у пакетних запитах (спільна сесія
+app/routers/batch.py) і поза запущеним застосунком одиниця виконується
+на сесії запиту зі звичайним комітом. Порівняння режимів:
+
+    python -m benchmarks.group_commit_benchmark
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy.orm import Session
+
+from app.database import Base, SessionLocal, batch_session
+from app.metrics import register_collector
+
+logger = logging.getLogger("app.group_commit")
+
+ENABLED = os.getenv("GROUP_COMMIT", "0") == "1"
+WINDOW_SECONDS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0")) / 1000
+MAX_UNITS = int(os.getenv("GROUP_COMMIT_MAX_UNITS", "64"))
+
+
+class GroupCommitWriter:
+    """Потік, що виконує одиниці запису групами в одній транзакції"""
+
+    def __init__(self, window: float = WINDOW_SECONDS, max_units: int = MAX_UNITS):
+        self.window = window
+        self.max_units = max_units
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.batches = 0
+        self.commit_seconds = 0.0
+        self.units = {"committed": 0, "failed": 0, "aborted": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Зупинка після виконання вже поставлених у чергу одиниць"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, unit) -> Future:
+        """Постановка одиниці в чергу; unit(session) виконується в контексті викликача"""
+        future = Future()
+        # Контекст запиту (статистика SQL для Server-Timing і бюджету запитів)
+        self._queue.put((unit, future, contextvars.copy_context()))
+        return future
+
+    def _run(self):
+        session = SessionLocal(expire_on_commit=False)
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is None:
+                    break
+                group = [item]
+                deadline = time.monotonic() + self.window
+                while len(group) < self.max_units:
+                    # Без вікна група - те, що накопичилося, поки комітилася попередня
+                    timeout = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    group.append(item)
+                self._commit_group(session, group)
+        finally:
+            session.close()
+
+    def _commit_group(self, session: Session, group: list):
+        # Запити, що вже скасовані (клієнт відключився), не виконуються
+        group = [item for item in group if item[1].set_running_or_notify_cancel()]
+        if not group:
+            return
+        outcomes = []
+        started = time.perf_counter()
+        try:
+            # pysqlite не відкриває транзакцію перед SAVEPOINT; без явного BEGIN
+            # перша точка збереження стала б самою транзакцією і RELEASE її комітив би
+            session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            for unit, future, context in group:
+                outcomes.append((future, *context.run(_apply_unit, session, unit)))
+            session.commit()
+        except Exception as exc:
+            logger.exception("Помилка групового коміту (%d одиниць)", len(group))
+            session.rollback()
+            self.units["aborted"] += len(group)
+            for _, future, _ in group:
+                future.set_exception(exc)
+            return
+        finally:
+            # Результати віддаються іншим потокам: від'єднані, з завантаженими атрибутами
+            session.expunge_all()
+        self.batches += 1
+        self.commit_seconds += time.perf_counter() - started
+        for future, result, error in outcomes:
+            if error is None:
+                self.units["committed"] += 1
+                future.set_result(result)
+            else:
+                self.units["failed"] += 1
+                future.set_exception(error)
+
+    def collect_metrics(self):
+        return [
+            ("group_commit_batches_total", "counter", "Групові коміти", [({}, self.batches)]),
+            ("group_commit_units_total", "counter",
+             "Одиниці запису: committed, failed (власна помилка), aborted (помилка коміту групи)",
+             [({"outcome": outcome}, count) for outcome, count in self.units.items()]),
+            ("group_commit_seconds_total", "counter", "Час виконання і коміту груп", [({}, round(self.commit_seconds, 6))]),
+            ("group_commit_queue_size", "gauge", "Одиниці в черзі записувача", [({}, self._queue.qsize())]),
+        ]
+
+
+def _apply_unit(session: Session, unit):
+    """(результат, None) або (None, помилка) одиниці в окремій точці збереження"""
+    try:
+        with session.begin_nested():
+            result = unit(session)
+            if isinstance(result, Base):
+                session.flush()
+                session.refresh(result)
+        return result, None
+    except Exception as exc:
+        return None, exc
+
+
+writer = GroupCommitWriter()
+register_collector(writer.collect_metrics)
+
+
+async def run(db: Session, unit):
+    """
+    Виконання одиниці запису unit(session) з комітом
+
+    Повертає результат одиниці (об'єкт моделі - оновлений з БД) або
+    піднімає її помилку. У груповому режимі одиниця виконується на сесії
+    записувача, а не на db: вона не повинна використовувати об'єкти,
+    завантажені сесією запиту.
+    """
+    if writer.running and batch_session.get() is None:
+        # Сесія запиту повертає з'єднання в пул, поки одиниця чекає на групу:
+        # інакше одночасні записи вичерпали б пул
+        db.rollback()
+        return await asyncio.wrap_future(writer.submit(unit))
+    result = unit(db)
+    db.commit()
+    if isinstance(result, Base):
+        db.refresh(result)
+    return result
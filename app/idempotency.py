@@ -0,0 +1,227 @@
+"""
+Ідемпотентні повтори запитів створення (заголовок Idempotency-Key)
+
+Клієнт на нестабільному з'єднанні повторює POST з тим самим
+Idempotency-Key. IdempotencyMiddleware для шляхів, заданих у app/main.py:
+
+1. Перший запит із ключем займає рядок idempotency_keys (ключ - хеш
+   користувача, шляху і ключа; INSERT ... ON CONFLICT DO NOTHING), виконується
+   звичайно, а його відповідь (статус, тип, тіло в zlib) зберігається на
+   IDEMPOTENCY_TTL_HOURS. Відповіді 5xx не зберігаються: рядок видаляється,
+   і повтор виконається знову.
+2. Повтор отримує збережену відповідь із заголовком Idempotent-Replayed:
+   true - без валідації, обробника і звернень до бізнес-таблиць.
+3. Повтор, що прийшов, поки перший запит виконується, чекає на його
+   результат (у тому ж процесі - подію, в іншому - опитування таблиці) до
+   IDEMPOTENCY_WAIT_SECONDS, далі - 409.
+4. Той самий ключ з іншим тілом - 422.
+
+Ключ діє в межах користувача (за перевіреним JWT); запити без дійсного
+токена проходять без обробки. Звернення до таблиці виконуються в потоці:
+запис може чекати на блокування БД (груповий коміт тримає BEGIN IMMEDIATE),
+а цикл подій - ні. Рядок, що лишився "виконується" після збою
+процесу, перехоплюється через LOCK_SECONDS. Прострочені рядки видаляються
+при кожному PURGE_EVERY-му зайнятті ключа (індекс за expires_at).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from app.admission import token_subject
+from app.database import engine
+from app.metrics import register_collector
+from app.models import IdempotencyKey
+
+TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# Запит, що "виконується" довше, вважається перерваним збоєм процесу
+LOCK_SECONDS = 60
+POLL_SECONDS = 0.05
+PURGE_EVERY = 100
+
+_table = IdempotencyKey.__table__
+# Ключі, перші запити яких виконуються в цьому процесі: хеш -> подія
+_in_flight = {}
+_outcomes = {}
+_claims = 0
+
+
+def _count(outcome: str):
+    _outcomes[outcome] = _outcomes.get(outcome, 0) + 1
+
+
+def _digest(*parts) -> bytes:
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).digest()[:16]
+
+
+def _claim(key_hash: bytes, request_hash: bytes):
+    """(True, None) - ключ зайнято цим запитом, інакше (False, наявний рядок)"""
+    global _claims
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(delete(_table).where(
+            _table.c.key_hash == key_hash,
+            or_(
+                _table.c.expires_at < now,
+                _table.c.status_code.is_(None) & (_table.c.created_at < now - timedelta(seconds=LOCK_SECONDS)),
+            ),
+        ))
+        inserted = connection.execute(
+            insert(_table).values(
+                key_hash=key_hash, request_hash=request_hash, created_at=now,
+                expires_at=now + timedelta(seconds=LOCK_SECONDS),
+            ).on_conflict_do_nothing(index_elements=["key_hash"])
+        ).rowcount
+        if inserted:
+            _claims += 1
+            if _claims % PURGE_EVERY == 0:
+                connection.execute(delete(_table).where(_table.c.expires_at < now))
+            return True, None
+        return False, connection.execute(select(_table).where(_table.c.key_hash == key_hash)).first()
+
+
+def _store(key_hash: bytes, status_code: int, content_type: str, body: bytes):
+    with engine.begin() as connection:
+        if status_code >= 500:
+            connection.execute(delete(_table).where(_table.c.key_hash == key_hash))
+            return
+        connection.execute(update(_table).where(_table.c.key_hash == key_hash).values(
+            status_code=status_code,
+            content_type=content_type,
+            body=zlib.compress(body),
+            expires_at=datetime.utcnow() + timedelta(hours=TTL_HOURS),
+        ))
+
+
+async def _respond(send, status_code: int, body: bytes, content_type: str = "application/json", extra=()):
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", content_type.encode("latin-1")),
+            (b"content-length", str(len(body)).encode()),
+            *extra,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _error(send, status_code: int, detail: str):
+    await _respond(send, status_code, json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8"))
+
+
+class IdempotencyMiddleware:
+    """Збереження і повтор відповідей POST із заголовком Idempotency-Key"""
+
+    def __init__(self, app, paths=()):
+        self.app = app
+        self.paths = {path.rstrip("/") for path in paths}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(HEADER, b"").decode("latin-1").strip()
+        subject = token_subject(headers.get(b"authorization", b"").decode("latin-1")) if key else None
+        if subject is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _error(send, 400, f"Idempotency-Key довший за {MAX_KEY_LENGTH} символів")
+            return
+
+        # Тіло потрібне для відбитка і передається обробнику повторно
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        key_hash = _digest(subject, scope["path"].rstrip("/"), key)
+        request_hash = hashlib.sha256(body).digest()[:16]
+
+        deadline = time.monotonic() + WAIT_SECONDS
+        waited = False
+        while True:
+            claimed, row = await asyncio.to_thread(_claim, key_hash, request_hash)
+            if claimed:
+                break
+            if row.request_hash != request_hash:
+                _count("mismatch")
+                await _error(send, 422, "Idempotency-Key уже використано з іншим тілом запиту")
+                return
+            if row.status_code is not None:
+                _count("replayed_after_wait" if waited else "replayed")
+                await _respond(send, row.status_code, zlib.decompress(row.body), row.content_type or "application/json",
+                               extra=[(b"idempotent-replayed", b"true")])
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _count("in_progress")
+                await _error(send, 409, "Запит з цим Idempotency-Key ще виконується, повторіть пізніше")
+                return
+            waited = True
+            event = _in_flight.get(key_hash)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(POLL_SECONDS, remaining))
+
+        event = _in_flight[key_hash] = asyncio.Event()
+        replay = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def replay_receive():
+            if replay:
+                return replay.pop()
+            return await receive()
+
+        response = {"status": 500, "content_type": None, "body": []}
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        response["content_type"] = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        _count("executed")
+        try:
+            await self.app(scope, replay_receive, capturing_send)
+        finally:
+            try:
+                await asyncio.to_thread(
+                    _store, key_hash, response["status"], response["content_type"], b"".join(response["body"])
+                )
+            finally:
+                del _in_flight[key_hash]
+                event.set()
+
+
+def collect_metrics():
+    return [(
+        "idempotency_requests_total", "counter",
+        "Запити з Idempotency-Key: executed, replayed, replayed_after_wait, in_progress (409), mismatch (422)",
+        [({"outcome": outcome}, count) for outcome, count in _outcomes.items()],
+    )]
+
+
+register_collector(collect_metrics)
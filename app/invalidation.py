@@ -0,0 +1,166 @@
+"""
+Шина інвалідації кешів між процесами
+
+Запис, що змінює закешовані дані, викликає bus.bump(db, topic) у своїй
+транзакції: лічильник теми в таблиці cache_invalidations збільшується
+разом з комітом. Підписники свого процесу викликаються одразу після коміту.
+
+Кожен процес опитує PRAGMA data_version на окремому з'єднанні SQLite:
+значення змінюється лише після коміту іншого з'єднання (будь-якого
+процесу) і не потребує читання таблиць. Тільки після зміни читаються лічильники тем і
+викликаються підписники тем, що змінилися. Затримка інвалідації між
+процесами - не більше за INVALIDATION_POLL_MS.
+
+Опитування виконується в циклі подій, тому з'єднання не чекає на
+блокування (timeout=0): поки інший запис комітиться, перевірка
+пропускається до наступного такту. Версію теми після власного коміту
+процес запам'ятовує одразу, тож опитування не сповіщає підписників
+удруге про ту саму зміну. Зміни з відкоченої транзакції або точки
+збереження (груповий коміт) не сповіщаються.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from collections import defaultdict
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.metrics import register_collector
+from app.models import CacheInvalidation
+
+logger = logging.getLogger("app.invalidation")
+
+POLL_INTERVAL_SECONDS = float(os.getenv("INVALIDATION_POLL_MS", "50")) / 1000
+
+# Теми інвалідації
+TOPIC_RBAC = "rbac"      # ролі, дозволи, призначення ролей
+TOPIC_USERS = "users"    # облікові записи користувачів
+TOPIC_APPOINTMENTS = "appointments"  # журнал подій записів на прийом
+TOPIC_ARCHIVE = "archive"  # межа архіву записів на прийом
+
+
+class InvalidationBus:
+    """Підписки на теми та міжпроцесне сповіщення про зміни"""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.poll_interval = poll_interval
+        self._subscribers = defaultdict(list)
+        self._versions = {}
+        self._data_version = None
+        self._connection = None
+        self.events = defaultdict(int)
+        self.busy_polls = 0
+
+    def subscribe(self, topic: str, callback):
+        """callback() викликається після кожної зміни теми (в будь-якому процесі)"""
+        self._subscribers[topic].append(callback)
+
+    def bump(self, db: Session, topic: str):
+        """Позначка зміни теми в поточній транзакції сесії"""
+        version = db.execute(
+            sqlite_insert(CacheInvalidation)
+            .values(topic=topic, version=1)
+            .on_conflict_do_update(
+                index_elements=[CacheInvalidation.topic],
+                set_={"version": CacheInvalidation.version + 1},
+            )
+            .returning(CacheInvalidation.version)
+        ).scalar()
+        pending = db.info.get("invalidation_bumps")
+        if pending is None:
+            pending = db.info["invalidation_bumps"] = []
+            event.listen(db, "after_commit", self._after_commit)
+            event.listen(db, "after_soft_rollback", self._after_rollback)
+        pending.append((topic, version, db.get_nested_transaction()))
+
+    def _after_commit(self, session: Session):
+        pending = session.info["invalidation_bumps"]
+        bumps, pending[:] = list(pending), []
+        for topic, version, _ in bumps:
+            # Опитування побачить цю ж версію - сповіщення вже надіслано
+            self._versions[topic] = max(self._versions.get(topic, 0), version)
+            self._notify(topic, "local")
+
+    def _after_rollback(self, session: Session, previous):
+        """Відкочена транзакція чи точка збереження: її позначки не сповіщаються"""
+        pending = session.info["invalidation_bumps"]
+        if not previous.nested:
+            pending.clear()
+            return
+
+        def rolled_back(savepoint):
+            while savepoint is not None:
+                if savepoint is previous:
+                    return True
+                savepoint = savepoint.parent
+            return False
+
+        pending[:] = [bump for bump in pending if not rolled_back(bump[2])]
+
+    def _notify(self, topic: str, source: str):
+        self.events[(topic, source)] += 1
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                callback()
+            except Exception:
+                logger.exception("Помилка підписника інвалідації теми %s", topic)
+
+    def _connect(self):
+        if self._connection is None:
+            # Без очікування блокування: цикл подій не чекає на коміт запису
+            self._connection = sqlite3.connect(engine.url.database, check_same_thread=False, timeout=0)
+        return self._connection
+
+    def poll(self):
+        """Одна перевірка змін від інших з'єднань/процесів"""
+        connection = self._connect()
+        try:
+            data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            rows = connection.execute("SELECT topic, version FROM cache_invalidations").fetchall()
+        except sqlite3.OperationalError as exc:
+            if "locked" not in str(exc):
+                raise
+            # Інше з'єднання саме комітить: data_version не запам'ятовується,
+            # зміна буде прочитана на наступному такті
+            self.busy_polls += 1
+            return
+        first_poll = self._data_version is None
+        self._data_version = data_version
+        for topic, version in rows:
+            if version > self._versions.get(topic, 0):
+                self._versions[topic] = version
+                if not first_poll:
+                    self._notify(topic, "poll")
+
+    async def run(self):
+        """Фонове опитування (запускається в lifespan кожного процесу)"""
+        try:
+            while True:
+                try:
+                    self.poll()
+                except sqlite3.Error:
+                    logger.exception("Помилка опитування шини інвалідації")
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+                self._data_version = None
+
+    def collect_metrics(self):
+        return [
+            ("cache_invalidations_total", "counter", "Інвалідації кешів за темою та джерелом",
+             [({"topic": topic, "source": source}, count) for (topic, source), count in self.events.items()]),
+            ("cache_invalidation_busy_polls_total", "counter", "Опитування шини, пропущені через блокування БД",
+             [({}, self.busy_polls)]),
+        ]
+
+
+bus = InvalidationBus()
+register_collector(bus.collect_metrics)
@@ -0,0 +1,668 @@
+"""
+Фонові завдання з чергою в SQLite
+
+Роботу, що не має блокувати відповідь (перебудова звітів, архівування,
+резервне копіювання, міграції даних), обробник ставить у чергу:
+
+    jobs.enqueue("daily_stats.rebuild")
+    jobs.enqueue("archive.appointments", {"retention_days": 730}, delay=600)
+
+Завдання зберігаються в таблиці jobs і переживають перезапуск. Їх
+виконують JOBS_WORKERS корутин у кожному процесі застосунку (синхронні
+функції - в потоці) або окремий процес:
+
+    python -m app.jobs worker
+
+Вибір завдання - одна інструкція UPDATE ... RETURNING, тож кілька процесів
+не візьмуть те саме завдання. Виконавець тримає завдання до locked_until
+(timeout типу завдання); завдання процесу, що впав, після цього
+повертається в чергу як невдала спроба.
+
+- Повтори: невдала спроба повертає завдання в чергу з експоненційною
+  затримкою (backoff x 2^(спроба-1), до MAX_BACKOFF_SECONDS); після
+  max_attempts спроб - стан failed з текстом помилки.
+- Дедуплікація: у черзі не більше одного завдання з тим самим dedup_key;
+  повторна постановка повертає наявне.
+- Розклад: delay/run_at для окремого завдання; тип завдання з cron
+  ("хвилина година день місяць день_тижня", місцевий час сервера) після
+  кожного виконання ставить у чергу наступне (ключ cron:<назва>).
+  Розклад змінюється змінною JOBS_CRON ("назва=вираз;назва=off").
+
+Типи завдань реєструються декоратором @job; службові - в кінці модуля.
+Стан черги і невдачі - GET /api/jobs/stats, /api/jobs (адміністратор).
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import traceback
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.metrics import register_collector
+from app.models import Job
+
+logger = logging.getLogger("app.jobs")
+
+WORKERS = int(os.getenv("JOBS_WORKERS", "1"))
+POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+RETENTION_DAYS = float(os.getenv("JOBS_RETENTION_DAYS", "7"))
+CRON_OVERRIDES = os.getenv("JOBS_CRON", "")
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+DEFAULT_TIMEOUT_SECONDS = 600
+# Перевірка завдань, виконавці яких не повернулися до locked_until
+RECOVER_SECONDS = 30
+MAX_ERROR_LENGTH = 4000
+
+STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+CRON_PREFIX = "cron:"
+
+
+class UnknownJob(ValueError):
+    """Тип завдання не зареєстровано"""
+
+
+# ===== Розклад cron =====
+class Cron:
+    """Вираз cron: хвилина, година, день місяця, місяць, день тижня (0 і 7 - неділя)"""
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Вираз cron має 5 полів: {expression!r}")
+        self.expression = expression
+        minutes, hours, days, months, weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        self.minutes, self.hours = sorted(minutes), sorted(hours)
+        self.days, self.months = days, months
+        self.weekdays = {day % 7 for day in weekdays}
+        # Як у cron: обмежені обидва поля днів - достатньо збігу одного
+        self.any_day, self.any_weekday = fields[2] == "*", fields[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> set:
+        values = set()
+        for part in field.split(","):
+            spec, _, step = part.partition("/")
+            try:
+                step = int(step) if step else 1
+                if spec == "*":
+                    start, end = low, high
+                elif "-" in spec:
+                    start, end = (int(value) for value in spec.split("-", 1))
+                else:
+                    start = int(spec)
+                    end = high if step != 1 or "/" in part else start
+            except ValueError:
+                raise ValueError(f"Некоректне поле cron: {field!r}")
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"Поле cron поза межами {low}-{high}: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day) -> bool:
+        by_day = day.day in self.days
+        by_weekday = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return by_weekday
+        if self.any_weekday:
+            return by_day
+        return by_day or by_weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Найближчий запуск після moment (той самий часовий пояс, без секунд)"""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        # 29 лютого, що припадає на потрібний день тижня, - раз на 28 років
+        for _ in range(366 * 28):
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Вираз cron не має запусків: {self.expression!r}")
+
+
+def _utc(local: datetime) -> datetime:
+    """Місцевий час сервера -> UTC без часового поясу (як datetime.utcnow у моделях)"""
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# ===== Реєстр типів завдань =====
+@dataclass
+class JobType:
+    name: str
+    func: object
+    max_attempts: int
+    backoff: float
+    timeout: float
+    cron: Optional[Cron]
+
+
+_registry = {}
+
+
+def _cron_overrides() -> dict:
+    overrides = {}
+    for item in CRON_OVERRIDES.split(";"):
+        name, _, expression = item.partition("=")
+        if name.strip():
+            overrides[name.strip()] = expression.strip()
+    return overrides
+
+
+def job(name: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, backoff: float = DEFAULT_BACKOFF_SECONDS,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS, cron: Optional[str] = None):
+    """
+    Реєстрація типу завдання: функція приймає поля payload як аргументи
+
+    Результат функції (JSON-сумісний) зберігається в jobs.result.
+    """
+    expression = _cron_overrides().get(name, cron)
+
+    def decorator(func):
+        _registry[name] = JobType(
+            name=name, func=func, max_attempts=max_attempts, backoff=backoff, timeout=timeout,
+            cron=Cron(expression) if expression and expression != "off" else None,
+        )
+        return func
+    return decorator
+
+
+def registered() -> dict:
+    return dict(_registry)
+
+
+def _job_type(name: str) -> JobType:
+    if name not in _registry:
+        raise UnknownJob(f"Невідоме завдання: {name}")
+    return _registry[name]
+
+
+# ===== Черга =====
+def enqueue(name: str, payload: Optional[dict] = None, delay: float = 0, run_at: Optional[datetime] = None,
+            dedup_key: Optional[str] = None, db: Optional[Session] = None) -> int:
+    """
+    Постановка завдання в чергу; id нового або наявного (dedup_key) завдання
+
+    Із сесією db завдання додається в її транзакцію і з'явиться в черзі
+    лише разом з комітом змін, що його породили. run_at - UTC.
+    """
+    job_type = _job_type(name)
+    payload = payload or {}
+    try:
+        inspect.signature(job_type.func).bind(**payload)
+    except TypeError as exc:
+        raise ValueError(f"Некоректні параметри завдання {name}: {exc}")
+    now = datetime.utcnow()
+    statement = insert(Job).values(
+        name=name,
+        payload=json.dumps(payload, ensure_ascii=False, default=str),
+        dedup_key=dedup_key,
+        state="queued",
+        attempts=0,
+        max_attempts=job_type.max_attempts,
+        run_at=run_at or now + timedelta(seconds=delay),
+        created_at=now,
+    ).on_conflict_do_nothing()
+    existing = select(Job.id).where(Job.dedup_key == dedup_key, Job.state == "queued")
+    if db is not None:
+        job_id = db.execute(statement.returning(Job.id)).scalar()
+        return job_id if job_id is not None else db.execute(existing).scalar()
+    with engine.begin() as connection:
+        job_id = connection.execute(statement.returning(Job.id)).scalar()
+        if job_id is None:
+            return connection.execute(existing).scalar()
+    runner.wake()
+    return job_id
+
+
+def _schedule_next(connection, job_type: JobType):
+    """Наступний запуск типу з розкладом (раніший із запланованого і нового)"""
+    statement = insert(Job).values(
+        name=job_type.name, payload="{}", dedup_key=CRON_PREFIX + job_type.name, state="queued",
+        attempts=0, max_attempts=job_type.max_attempts,
+        run_at=_utc(job_type.cron.next_after(datetime.now())), created_at=datetime.utcnow(),
+    )
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[Job.dedup_key],
+        index_where=text("state = 'queued'"),
+        set_={"run_at": func.min(Job.run_at, statement.excluded.run_at)},
+    ))
+
+
+def ensure_schedules():
+    """Розклад усіх типів з cron у черзі; завдання вимкнених розкладів знімаються"""
+    with engine.begin() as connection:
+        for job_type in _registry.values():
+            if job_type.cron is not None:
+                _schedule_next(connection, job_type)
+            else:
+                connection.execute(delete(Job).where(
+                    Job.dedup_key == CRON_PREFIX + job_type.name, Job.state == "queued",
+                ))
+
+
+@dataclass
+class ClaimedJob:
+    id: int
+    name: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+    dedup_key: Optional[str]
+
+
+def claim(worker_id: str) -> Optional[ClaimedJob]:
+    """Наступне завдання, що настав час виконати (лише зареєстрованих типів)"""
+    if not _registry:
+        return None
+    now = datetime.utcnow()
+    candidate = (
+        select(Job.id)
+        .where(Job.state == "queued", Job.run_at <= now, Job.name.in_(list(_registry)))
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    timeouts = {name: job_type.timeout for name, job_type in _registry.items()}
+    with engine.begin() as connection:
+        row = connection.execute(
+            update(Job)
+            .where(Job.id == candidate, Job.state == "queued")
+            .values(state="running", attempts=Job.attempts + 1, locked_by=worker_id,
+                    locked_until=now + timedelta(seconds=DEFAULT_TIMEOUT_SECONDS), started_at=now)
+            .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts, Job.dedup_key)
+        ).first()
+        if row is None:
+            return None
+        if timeouts[row.name] != DEFAULT_TIMEOUT_SECONDS:
+            connection.execute(update(Job).where(Job.id == row.id).values(
+                locked_until=now + timedelta(seconds=timeouts[row.name])
+            ))
+    return ClaimedJob(row.id, row.name, json.loads(row.payload or "{}"), row.attempts, row.max_attempts, row.dedup_key)
+
+
+def _owned(job_id: int, worker_id: str, attempts: int):
+    # Завдання, повернуте в чергу після locked_until, вже не належить виконавцю
+    return (Job.id == job_id, Job.state == "running", Job.locked_by == worker_id, Job.attempts == attempts)
+
+
+def _finish(connection, claimed: ClaimedJob, worker_id: str, **values) -> bool:
+    result = connection.execute(update(Job).where(*_owned(claimed.id, worker_id, claimed.attempts)).values(
+        locked_by=None, locked_until=None, **values,
+    ))
+    return result.rowcount == 1
+
+
+def complete(claimed: ClaimedJob, worker_id: str, result=None):
+    with engine.begin() as connection:
+        owned = _finish(connection, claimed, worker_id, state="succeeded", finished_at=datetime.utcnow(),
+                        result=json.dumps(result, ensure_ascii=False, default=str), last_error=None)
+        job_type = _registry.get(claimed.name)
+        if owned and job_type is not None and job_type.cron is not None:
+            _schedule_next(connection, job_type)
+
+
+def fail(claimed: ClaimedJob, worker_id: str, error: str) -> str:
+    """Невдала спроба: повтор із затримкою або остаточна невдача; новий стан"""
+    job_type = _registry.get(claimed.name)
+    error = error[-MAX_ERROR_LENGTH:]
+    now = datetime.utcnow()
+    if claimed.attempts < claimed.max_attempts:
+        backoff = job_type.backoff if job_type is not None else DEFAULT_BACKOFF_SECONDS
+        delay = min(backoff * 2 ** (claimed.attempts - 1), MAX_BACKOFF_SECONDS)
+        try:
+            with engine.begin() as connection:
+                _finish(connection, claimed, worker_id, state="queued", last_error=error,
+                        run_at=now + timedelta(seconds=delay))
+            return "retried"
+        except IntegrityError:
+            # У черзі вже є завдання з тим самим dedup_key - воно й виконає роботу
+            error += "\nПовтор не потрібен: у черзі вже є завдання з тим самим ключем"
+    with engine.begin() as connection:
+        owned = _finish(connection, claimed, worker_id, state="failed", last_error=error, finished_at=now)
+        if owned and job_type is not None and job_type.cron is not None:
+            _schedule_next(connection, job_type)
+    return "failed"
+
+
+def release(claimed: ClaimedJob, worker_id: str):
+    """Повернення завдання в чергу без рахування спроби (зупинка виконавця)"""
+    with suppress(IntegrityError), engine.begin() as connection:
+        _finish(connection, claimed, worker_id, state="queued", attempts=claimed.attempts - 1)
+
+
+def recover() -> int:
+    """Завдання виконавців, що не повернулися до locked_until: невдала спроба"""
+    now = datetime.utcnow()
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts, Job.dedup_key, Job.locked_by)
+            .where(Job.state == "running", Job.locked_until < now)
+        ).all()
+    for row in rows:
+        claimed = ClaimedJob(row.id, row.name, {}, row.attempts, row.max_attempts, row.dedup_key)
+        fail(claimed, row.locked_by, f"Виконавець {row.locked_by} не завершив завдання до {now:%Y-%m-%d %H:%M:%S} UTC")
+    return len(rows)
+
+
+def purge(retention_days: float = RETENTION_DAYS) -> int:
+    """Видалення завершених завдань, старших за retention_days"""
+    with engine.begin() as connection:
+        return connection.execute(delete(Job).where(
+            Job.state.in_(FINISHED_STATES),
+            Job.finished_at < datetime.utcnow() - timedelta(days=retention_days),
+        )).rowcount
+
+
+def retry(job_id: int) -> bool:
+    """
+    Повторна постановка невдалого чи скасованого завдання (з нуля спроб)
+
+    False - завдання не в цих станах або в черзі вже є завдання з тим самим dedup_key.
+    """
+    try:
+        with engine.begin() as connection:
+            result = connection.execute(update(Job).where(Job.id == job_id, Job.state.in_(("failed", "cancelled"))).values(
+                state="queued", attempts=0, run_at=datetime.utcnow(), finished_at=None,
+            ))
+    except IntegrityError:
+        return False
+    runner.wake()
+    return result.rowcount == 1
+
+
+def cancel(job_id: int) -> bool:
+    """Скасування завдання в черзі (виконуване не переривається)"""
+    with engine.begin() as connection:
+        return connection.execute(update(Job).where(Job.id == job_id, Job.state == "queued").values(
+            state="cancelled", finished_at=datetime.utcnow(),
+        )).rowcount == 1
+
+
+def stats(connection) -> dict:
+    """Глибина черги за станами і типами, найстаріше прострочене завдання"""
+    now = datetime.utcnow()
+    by_state = {state: 0 for state in STATES}
+    by_name = {}
+    rows = connection.execute(select(Job.name, Job.state, func.count()).group_by(Job.name, Job.state)).all()
+    for name, state, count in rows:
+        by_state[state] = by_state.get(state, 0) + count
+        by_name.setdefault(name, {state: 0 for state in STATES})[state] = count
+    due, oldest = connection.execute(
+        select(func.count(), func.min(Job.run_at)).where(Job.state == "queued", Job.run_at <= now)
+    ).one()
+    next_runs = dict(connection.execute(
+        select(Job.name, func.min(Job.run_at)).where(Job.state == "queued").group_by(Job.name)
+    ).all())
+    return {
+        "states": by_state,
+        "due": due,
+        "oldest_due_seconds": round((now - oldest).total_seconds(), 1) if oldest else None,
+        "by_name": [{"name": name, **counts} for name, counts in sorted(by_name.items())],
+        "types": [
+            {
+                "name": name,
+                "cron": job_type.cron.expression if job_type.cron else None,
+                "max_attempts": job_type.max_attempts,
+                "timeout_seconds": job_type.timeout,
+                "next_run_at": next_runs.get(name),
+            }
+            for name, job_type in sorted(_registry.items())
+        ],
+        "workers": runner.workers if runner.running else 0,
+    }
+
+
+def describe(row: Job) -> dict:
+    """Завдання для API: payload і result - розібраний JSON"""
+    return {
+        "id": row.id, "name": row.name, "state": row.state, "dedup_key": row.dedup_key,
+        "payload": json.loads(row.payload) if row.payload else None,
+        "result": json.loads(row.result) if row.result else None,
+        "attempts": row.attempts, "max_attempts": row.max_attempts, "run_at": row.run_at,
+        "locked_by": row.locked_by, "last_error": row.last_error, "created_at": row.created_at,
+        "started_at": row.started_at, "finished_at": row.finished_at,
+    }
+
+
+# ===== Виконавець =====
+_runs = {}
+_run_seconds = {}
+
+
+class JobRunner:
+    """Корутини, що вибирають і виконують завдання в цьому процесі"""
+
+    def __init__(self, workers: int = WORKERS, poll_interval: float = POLL_SECONDS):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = False
+        self._loop = None
+        self._wakeup = None
+
+    def wake(self):
+        """Негайна перевірка черги (після постановки завдання в цьому процесі)"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        """Виконання до скасування (lifespan або python -m app.jobs worker)"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.running = True
+        await asyncio.to_thread(ensure_schedules)
+        tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        try:
+            while True:
+                try:
+                    recovered = await asyncio.to_thread(recover)
+                    if recovered:
+                        logger.warning("Повернуто в чергу перервані завдання: %d", recovered)
+                except Exception:
+                    logger.exception("Помилка перевірки перерваних завдань")
+                await asyncio.sleep(RECOVER_SECONDS)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                with suppress(asyncio.CancelledError):
+                    await task
+            self.running = False
+            self._loop = None
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await asyncio.to_thread(claim, self.worker_id)
+            except Exception:
+                logger.exception("Помилка вибору завдання")
+                claimed = None
+            if claimed is None:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                continue
+            try:
+                await self._execute(claimed)
+            except asyncio.CancelledError:
+                await asyncio.to_thread(release, claimed, self.worker_id)
+                raise
+
+    async def _execute(self, claimed: ClaimedJob):
+        job_type = _registry[claimed.name]
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(job_type.func):
+                result = await job_type.func(**claimed.payload)
+            else:
+                result = await asyncio.to_thread(job_type.func, **claimed.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            outcome = await asyncio.to_thread(fail, claimed, self.worker_id, traceback.format_exc())
+            log = logger.warning if outcome == "retried" else logger.error
+            log("Завдання %s #%d: спроба %d/%d невдала (%s)", claimed.name, claimed.id,
+                claimed.attempts, claimed.max_attempts, outcome)
+        else:
+            await asyncio.to_thread(complete, claimed, self.worker_id, result)
+            outcome = "succeeded"
+        _runs[(claimed.name, outcome)] = _runs.get((claimed.name, outcome), 0) + 1
+        _run_seconds[claimed.name] = _run_seconds.get(claimed.name, 0.0) + time.perf_counter() - started
+
+
+runner = JobRunner()
+
+
+def collect_metrics():
+    return [
+        ("jobs_runs_total", "counter", "Виконання фонових завдань: succeeded, retried, failed",
+         [({"name": name, "result": outcome}, count) for (name, outcome), count in _runs.items()]),
+        ("jobs_run_seconds_total", "counter", "Час виконання фонових завдань",
+         [({"name": name}, round(seconds, 6)) for name, seconds in _run_seconds.items()]),
+    ]
+
+
+register_collector(collect_metrics)
+
+
+# ===== Службові завдання =====
+# Модулі імпортуються під час виконання: черга не залежить від модулів
+# (і їх залежностей, як cryptography), доки їх завдання не виконуються
+@job("jobs.purge", max_attempts=3, cron="15 * * * *")
+def purge_job(retention_days: float = RETENTION_DAYS):
+    """Видалення завершених завдань, старших за JOBS_RETENTION_DAYS"""
+    return {"deleted": purge(retention_days)}
+
+
+@job("daily_stats.rebuild", max_attempts=3, timeout=3600, cron="30 3 * * 0")
+def daily_stats_job():
+    """Повна перебудова денних підсумків (виправлення розбіжностей)"""
+    from app import daily_stats
+    with engine.begin() as connection:
+        return daily_stats.rebuild(connection)
+
+
+@job("archive.appointments", max_attempts=3, timeout=3600)
+def archive_job(retention_days: int = None, batch_size: int = 500):
+    """Перенесення закритих записів на прийом до архіву"""
+    from app import archive
+    return archive.archive_appointments(engine, retention_days or archive.RETENTION_DAYS, batch_size)
+
+
+@job("backup.run", max_attempts=3, backoff=300, timeout=3600)
+def backup_job():
+    """Резервна копія бази даних"""
+    from app import backup
+    status = backup.run_backup()
+    return {key: status.get(key) for key in ("file", "size", "sha256", "duration_seconds")}
+
+
+@job("compression.reencode", max_attempts=3, timeout=3600)
+def reencode_job(algorithm: str = None, batch_size: int = 500):
+    """Перекодування стиснених текстів медичних записів у формат TEXT_COMPRESSION"""
+    from app import compression
+    from app.models import MedicalRecord
+    return compression.reencode(engine, MedicalRecord.__table__, algorithm, batch_size)
+
+
+@job("field_crypto.migrate", max_attempts=3, timeout=3600)
+def encrypt_job(batch_size: int = 500):
+    """Шифрування ще не зашифрованих конфіденційних медичних записів"""
+    from app import field_crypto
+    return field_crypto.process_records(engine, "migrate", batch_size)
+
+
+# Повтор створив би ще один майстер-ключ
+@job("field_crypto.rotate", max_attempts=1, timeout=3600)
+def rotate_job(batch_size: int = 500):
+    """Новий активний майстер-ключ і переобгортання DEK конфіденційних записів"""
+    from app import field_crypto
+    key_id = field_crypto.keyring().rotate()
+    return {"active_key": key_id, **field_crypto.process_records(engine, "rotate", batch_size)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Фонові завдання (база - DATABASE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Виконавець завдань в окремому процесі")
+    worker.add_argument("--workers", type=int, default=max(WORKERS, 1))
+    enqueue_parser = commands.add_parser("enqueue", help="Постановка завдання в чергу")
+    enqueue_parser.add_argument("name")
+    enqueue_parser.add_argument("--payload", default="{}", help="Параметри завдання, JSON")
+    enqueue_parser.add_argument("--delay", type=float, default=0, help="Затримка запуску, секунд")
+    enqueue_parser.add_argument("--dedup-key")
+    list_parser = commands.add_parser("list", help="Останні завдання")
+    list_parser.add_argument("--state", choices=STATES)
+    list_parser.add_argument("--limit", type=int, default=20)
+    commands.add_parser("stats", help="Глибина черги та невдачі")
+    args = parser.parse_args(argv)
+
+    # При запуску через -m цей модуль - __main__; реєстр типів - в app.jobs
+    from app import jobs
+    from app.startup import coordinated_startup
+
+    coordinated_startup()
+    if args.command == "worker":
+        jobs.runner.workers = args.workers
+        print(f"✓ Виконавець завдань {jobs.runner.worker_id}: {args.workers} корутин, "
+              f"типи: {', '.join(sorted(jobs.registered()))}")
+        with suppress(KeyboardInterrupt):
+            asyncio.run(jobs.runner.run())
+    elif args.command == "enqueue":
+        try:
+            job_id = jobs.enqueue(args.name, json.loads(args.payload), args.delay, dedup_key=args.dedup_key)
+        except ValueError as exc:
+            print(f"⚠️  {exc}")
+            return 1
+        print(f"✓ Завдання #{job_id} ({args.name}) у черзі")
+    elif args.command == "list":
+        query = select(Job).order_by(Job.id.desc()).limit(args.limit)
+        if args.state:
+            query = query.where(Job.state == args.state)
+        with Session(engine) as session:
+            for row in session.execute(query).scalars():
+                error = (row.last_error or "").strip().splitlines()[-1:] or [""]
+                print(f"#{row.id:<6} {row.name:<24} {row.state:<10} {row.attempts}/{row.max_attempts}  "
+                      f"{row.run_at:%Y-%m-%d %H:%M:%S}  {error[0][:80]}")
+    else:
+        with engine.connect() as connection:
+            info = jobs.stats(connection)
+        print("Стани: " + ", ".join(f"{state} {count}" for state, count in info["states"].items()))
+        print(f"Готові до виконання: {info['due']}"
+              + (f" (найстаріше чекає {info['oldest_due_seconds']} с)" if info["oldest_due_seconds"] else ""))
+        for item in info["types"]:
+            schedule = f"cron '{item['cron']}'" if item["cron"] else "за запитом"
+            next_run = f", наступне {item['next_run_at']:%Y-%m-%d %H:%M} UTC" if item["next_run_at"] else ""
+            print(f"  {item['name']:<24} {schedule}{next_run}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
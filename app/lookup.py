@@ -0,0 +1,97 @@
+"""
+Довідковий пошук пацієнтів і лікарів для полів вибору (GET /api/lookup/*)
+
+Patient.search_name ("прізвище ім'я по батькові") і User.search_name
+(full_name) зберігаються в нормалізованому вигляді: NFKC, casefold, єдиний
+апостроф, одинарні пробіли. Запит нормалізується так само і шукається
+діапазоном [префікс, префікс + U+10FFFF) по звичайному індексу - на
+відміну від LIKE з урахуванням регістру, це працює і для кирилиці.
+
+Колонки оновлює ORM перед записом; масові вставки в обхід ORM
+(generate_load_data.py) заповнюють їх самі через normalize_name.
+
+Лікарі фільтруються за роллю через user_roles (індекс за role_id) і за
+відділенням User.department_id.
+"""
+import re
+import unicodedata
+
+from sqlalchemy import bindparam, event, func, select, update
+
+from app.models import Appointment, Patient, User
+
+# Варіанти апострофа в українських іменах (Мар'яна, Мар’яна, Марʼяна)
+_APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "‘": "'", "`": "'", "´": "'"})
+_SPACES = re.compile(r"\s+")
+# Верхня межа діапазону префікса: більша за будь-який символ
+_PREFIX_END = "\U0010ffff"
+
+
+def normalize_name(*parts) -> str:
+    """Нормалізоване ім'я для пошуку з непорожніх частин"""
+    text = " ".join(part for part in parts if part)
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_APOSTROPHES)
+    return _SPACES.sub(" ", text).strip()
+
+
+def prefix_filter(column, query: str):
+    """Умова "column починається з нормалізованого query" для індексу"""
+    prefix = normalize_name(query)
+    return column.between(prefix, prefix + _PREFIX_END)
+
+
+def _patient_name(target) -> str:
+    return normalize_name(target.last_name, target.first_name, target.middle_name)
+
+
+def _user_name(target) -> str:
+    return normalize_name(target.full_name)
+
+
+def _listener(name):
+    def listener(mapper, connection, target):
+        target.search_name = name(target)
+    return listener
+
+
+for _model, _name in ((Patient, _patient_name), (User, _user_name)):
+    event.listen(_model, "before_insert", _listener(_name))
+    event.listen(_model, "before_update", _listener(_name))
+
+
+def backfill(connection):
+    """Міграція: search_name наявних рядків і відділення лікарів"""
+    for model, columns in (
+        (Patient, (Patient.last_name, Patient.first_name, Patient.middle_name)),
+        (User, (User.full_name,)),
+    ):
+        table = model.__table__
+        rows = connection.execute(select(model.id, *columns).where(model.search_name.is_(None))).all()
+        if rows:
+            connection.execute(
+                update(table).where(table.c.id == bindparam("row_id")).values(search_name=bindparam("name")),
+                [{"row_id": row[0], "name": normalize_name(*row[1:])} for row in rows],
+            )
+
+    # Відділення лікаря - те, де в нього найбільше записів на прийом
+    busiest = {}
+    for doctor_id, department_id, total in connection.execute(
+        select(Appointment.doctor_id, Appointment.department_id, func.count())
+        .where(Appointment.department_id.is_not(None))
+        .group_by(Appointment.doctor_id, Appointment.department_id)
+    ):
+        if total > busiest.get(doctor_id, (0, None))[0]:
+            busiest[doctor_id] = (total, department_id)
+    table = User.__table__
+    without_department = set(connection.execute(
+        select(table.c.id).where(table.c.department_id.is_(None))
+    ).scalars())
+    rows = [
+        {"row_id": doctor_id, "department": department_id}
+        for doctor_id, (_, department_id) in busiest.items() if doctor_id in without_department
+    ]
+    if rows:
+        connection.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(department_id=bindparam("department")),
+            rows,
+        )
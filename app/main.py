@@ -1,31 +1,59 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from app import boot_profile  # першим: облік імпорту всіх модулів (BOOT_PROFILE=1)
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from sqlalchemy.orm import Session
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import os
 import uvicorn
 
-from app.database import engine, Base, get_db
-from app.routers import auth, users, patients, appointments, medical_records, departments, rbac
+from app.database import get_db, engine
+from app.routers import auth, users, patients, appointments, medical_records, departments, rbac, changes, backups, batch, lookup, analytics, jobs as jobs_router
 from app.models import User, Role, Permission
 from app.auth import create_access_token
-from app.rbac import init_rbac_system
-
-# Створення таблиць в БД
-Base.metadata.create_all(bind=engine)
+from app.startup import coordinated_startup
+from app.invalidation import bus
+from app.sql_monitor import SQLMonitorMiddleware
+from app.admission import AdmissionMiddleware, RouteLimit
+from app.response_compression import CompressionMiddleware
+from app.idempotency import IdempotencyMiddleware
+from app import metrics, backup, static_assets, group_commit, jobs
+from app import field_crypto
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Ініціалізація системи при запуску"""
-    # Startup
-    db = next(get_db())
-    init_rbac_system(db)
+    # Startup: схема та RBAC - рівно один раз навіть при кількох процесах;
+    # при актуальних версіях - лише читання schema_meta
+    with boot_profile.step("coordinated_startup"):
+        coordinated_startup()
+    # Без правильного файлу майстер-ключів зашифровані записи не читаються
+    field_crypto.check_master_key(engine)
+    with boot_profile.step("static_assets"):
+        static_assets.load()
     print("✓ Система RBAC ініціалізована")
     print("✓ Сервер запущено на http://localhost:8000")
     print("✓ Документація API: http://localhost:8000/docs")
+    background_tasks = [asyncio.create_task(bus.run())]
+    if metrics.MULTIPROC_DIR:
+        background_tasks.append(asyncio.create_task(metrics.run_snapshot_writer()))
+    if backup.INTERVAL_HOURS > 0:
+        background_tasks.append(asyncio.create_task(backup.run_scheduler()))
+    if group_commit.ENABLED:
+        group_commit.writer.start()
+        print("✓ Груповий коміт записів увімкнено")
+    if jobs.WORKERS > 0:
+        background_tasks.append(asyncio.create_task(jobs.runner.run()))
+    boot_profile.mark_ready()
     yield
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # Записувач завершує вже прийняті одиниці
+    await asyncio.to_thread(group_commit.writer.stop)
     # Shutdown (якщо потрібно щось зробити при зупинці)
     print("✓ Сервер зупинено")
 
@@ -45,6 +73,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Повтори створення з тим самим Idempotency-Key отримують збережену відповідь
+# першого запиту замість другого запису (всередині контролю допуску: повтори
+# теж враховуються лімітами)
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=("/api/patients", "/api/appointments", "/api/medical-records"),
+)
+
+# Інструментування SQL: Server-Timing, журнал повільних запитів і детектор N+1
+# (у тестах SQL_QUERY_BUDGET_STRICT=1 перетворює перевищення бюджету на помилку)
+app.add_middleware(
+    SQLMonitorMiddleware,
+    strict=os.getenv("SQL_QUERY_BUDGET_STRICT") == "1"
+)
+
+# Контроль допуску: відра токенів на користувача/IP (RATE_LIMIT_*) і ліміти
+# одночасних запитів за префіксами маршрутів (найдовший збіг). Переповнена
+# черга префікса - 503 з Retry-After, перевищення швидкості - 429
+app.add_middleware(
+    AdmissionMiddleware,
+    limits={
+        # bcrypt: BCRYPT_WORKERS потоків по ~0.25 с - решта чекає у виконавці
+        "/api/auth/login": RouteLimit(concurrency=4, max_queue=32, max_wait_ms=3000),
+        # Довгі з'єднання SSE не займають слотів
+        "/api/appointments/stream": RouteLimit(concurrency=None),
+        # Широкі вибірки синхронізації та резервне копіювання
+        "/api/changes": RouteLimit(concurrency=4, max_queue=16),
+        "/api/backups": RouteLimit(concurrency=2, max_queue=4),
+        # Теплова карта аналітики читає записи за період (до ~0.3 с CPU)
+        "/api/analytics": RouteLimit(concurrency=2, max_queue=8, max_wait_ms=5000),
+        "/api": RouteLimit(concurrency=64, max_queue=256),
+    },
+)
+
+# Стиснення відповідей (gzip/br/zstd за Accept-Encoding, рівень - за розміром
+# і завантаженістю CPU); статичні файли вже стиснені заздалегідь
+app.add_middleware(CompressionMiddleware)
+
+# Метрики запитів (зовнішній шар - враховує час усіх інших middleware)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Підключення роутерів
 app.include_router(auth.router, prefix="/api/auth", tags=["Аутентифікація"])
 app.include_router(users.router, prefix="/api/users", tags=["Користувачі"])
@@ -53,15 +122,22 @@ app.include_router(appointments.router, prefix="/api/appointments", tags=["За
 app.include_router(medical_records.router, prefix="/api/medical-records", tags=["Медичні записи"])
 app.include_router(departments.router, prefix="/api/departments", tags=["Відділення"])
 app.include_router(rbac.router, prefix="/api/rbac", tags=["Управління доступом"])
+app.include_router(changes.router, prefix="/api/changes", tags=["Синхронізація"])
+app.include_router(backups.router, prefix="/api/backups", tags=["Резервне копіювання"])
+app.include_router(batch.router, prefix="/api/batch", tags=["Пакетні запити"])
+app.include_router(lookup.router, prefix="/api/lookup", tags=["Довідники"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Аналітика"])
+app.include_router(jobs_router.router, prefix="/api/jobs", tags=["Фонові завдання"])
 
-# Статичні файли
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Статичні файли: з пам'яті, попередньо стиснені, з хешем вмісту в адресі
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(path: str, request: Request):
+    return static_assets.response(path, request.headers)
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
+async def root(request: Request):
     """Головна сторінка"""
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        return f.read()
+    return static_assets.response(static_assets.INDEX_FILE, request.headers)
 
 @app.get("/api/health")
 async def health_check():
@@ -71,5 +147,10 @@ async def health_check():
         "message": "Система управління ЗОЗ працює"
     }
 
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Метрики у форматі Prometheus"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
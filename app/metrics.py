@@ -0,0 +1,386 @@
+"""
+Метрики застосунку у форматі Prometheus
+
+Лічильники HTTP-запитів оновлюються без блокувань: middleware виконується
+лише в потоці циклу подій, тож кожне з цих значень має одного записувача.
+Облік одного запиту - два виклики perf_counter, пошук у словнику та
+бінарний пошук кошика гістограми. Видачі з'єднань пулу відбуваються і в
+інших потоках (груповий коміт, asyncio.to_thread), тому їх лічильник - під
+блокуванням; кеші оновлюють свої лічильники під власними блокуваннями.
+
+Для кількох процесів uvicorn (--workers N) задайте METRICS_MULTIPROC_DIR:
+кожен процес періодично скидає знімок своїх метрик у файл у цьому
+каталозі, а /api/metrics підсумовує знімки всіх живих процесів. Лічильники
+і гістограми процесу, що завершився, додаються до сукупного файлу
+(aggregate.json), щоб сума не зменшувалася після перезапуску процесу
+(Prometheus сприйняв би це як скидання лічильника); його датчики (gauge)
+відкидаються.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+
+from app import boot_profile
+from app.database import engine
+
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+FLUSH_INTERVAL_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# Межі кошиків гістограми затримок (секунди)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class CacheStats:
+    """Лічильники влучань/промахів кешу для метрик"""
+    __slots__ = ("hits", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+class _RouteStats:
+    __slots__ = ("buckets", "total", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+
+# (method, route) -> _RouteStats
+_routes = {}
+# (method, route, status) -> кількість
+_responses = {}
+_in_flight = 0
+_first_request_done = False
+# Зареєстровані кеші та додаткові колектори: name -> callable
+_caches = {}
+_collectors = []
+
+_pool_checkouts = 0
+_pool_checkouts_lock = threading.Lock()
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    global _pool_checkouts
+    with _pool_checkouts_lock:
+        _pool_checkouts += 1
+
+
+def register_cache(name: str) -> CacheStats:
+    """Реєстрація кешу: повертає лічильники, які кеш має оновлювати"""
+    return _caches.setdefault(name, CacheStats())
+
+
+def register_collector(collector):
+    """
+    Реєстрація додаткового джерела метрик
+
+    collector() повертає список (name, type, help, [(labels, value), ...]).
+    """
+    _collectors.append(collector)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Змонтований застосунок (StaticFiles) - шлях монтування
+        return scope.get("root_path") or "/"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Облік кількості, статусів і затримок HTTP-запитів по маршрутах"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight, _first_request_done
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        _in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_flight -= 1
+            key = (scope["method"], _route_label(scope))
+            stats = _routes.get(key)
+            if stats is None:
+                stats = _routes[key] = _RouteStats()
+            stats.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            stats.total += elapsed
+            stats.count += 1
+            response_key = key + (status_holder[0],)
+            _responses[response_key] = _responses.get(response_key, 0) + 1
+            if not _first_request_done:
+                _first_request_done = True
+                boot_profile.mark_first_request()
+
+
+def _labels(**labels) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def collect() -> dict:
+    """Знімок метрик поточного процесу: {(name, labels): value} та опис сімейств"""
+    samples = {}
+    families = {}
+
+    def family(name, kind, help_text):
+        families[name] = (kind, help_text)
+
+    family("http_requests_total", "counter", "Кількість HTTP-запитів")
+    for (method, route, status), value in _responses.items():
+        samples[("http_requests_total", _labels(method=method, route=route, status=status))] = value
+
+    family("http_request_duration_seconds", "histogram", "Затримка HTTP-запитів")
+    for (method, route), stats in _routes.items():
+        cumulative = 0
+        for bound, value in zip(LATENCY_BUCKETS + (float("inf"),), stats.buckets):
+            cumulative += value
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            samples[("http_request_duration_seconds_bucket",
+                     _labels(method=method, route=route, le=le))] = cumulative
+        samples[("http_request_duration_seconds_sum", _labels(method=method, route=route))] = stats.total
+        samples[("http_request_duration_seconds_count", _labels(method=method, route=route))] = stats.count
+
+    family("http_requests_in_flight", "gauge", "HTTP-запити в обробці")
+    samples[("http_requests_in_flight", ())] = _in_flight
+
+    pool = engine.pool
+    family("db_pool_connections", "gauge", "З'єднання пулу БД за станом")
+    for state, getter in (("checked_out", "checkedout"), ("checked_in", "checkedin"), ("overflow", "overflow")):
+        if hasattr(pool, getter):
+            samples[("db_pool_connections", _labels(state=state))] = getattr(pool, getter)()
+    family("db_pool_checkouts_total", "counter", "Видачі з'єднань з пулу (сесії з активною транзакцією)")
+    samples[("db_pool_checkouts_total", ())] = _pool_checkouts
+
+    # Не на рівні модуля: auth -> models -> field_crypto -> metrics
+    from app.auth import password_executor_stats
+    queued, running = password_executor_stats()
+    family("bcrypt_executor_queue_depth", "gauge", "Операції bcrypt в черзі виконавця")
+    samples[("bcrypt_executor_queue_depth", ())] = queued
+    family("bcrypt_executor_running", "gauge", "Операції bcrypt, що виконуються")
+    samples[("bcrypt_executor_running", ())] = running
+
+    family("cache_requests_total", "counter", "Звернення до кешів застосунку")
+    for name, stats in _caches.items():
+        samples[("cache_requests_total", _labels(cache=name, result="hit"))] = stats.hits
+        samples[("cache_requests_total", _labels(cache=name, result="miss"))] = stats.misses
+
+    for collector in [boot_profile.collect_metrics] + _collectors:
+        for name, kind, help_text, values in collector():
+            family(name, kind, help_text)
+            for labels, value in values:
+                samples[(name, _labels(**labels))] = value
+
+    return {"samples": samples, "families": families}
+
+
+# Типи метрик, що лише зростають: після завершення процесу вони
+# зберігаються в сукупному файлі
+CUMULATIVE_KINDS = ("counter", "histogram")
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(MULTIPROC_DIR, f"metrics-{pid}.json")
+
+
+def _aggregate_path() -> str:
+    return os.path.join(MULTIPROC_DIR, "aggregate.json")
+
+
+def _read_snapshot(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, payload: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _kind(name: str, families: dict) -> str:
+    family = families.get(name)
+    if family is None:
+        for suffix in ("_bucket", "_sum", "_count"):
+            if name.endswith(suffix):
+                family = families.get(name[:-len(suffix)])
+                break
+    return family[0] if family else "untyped"
+
+
+def _aggregate_lock():
+    """
+    Блокування сукупного файлу: кілька процесів можуть одночасно побачити
+    той самий мертвий процес, а читач не повинен застати знімок і вже
+    перенесені з нього значення водночас
+    """
+    # Не на рівні модуля: startup -> models -> field_crypto -> metrics
+    from app.startup import file_lock
+
+    return file_lock(f"{_aggregate_path()}.lock")
+
+
+def _fold_snapshots(paths):
+    """
+    Перенесення лічильників і гістограм знімків процесів, що завершилися,
+    у сукупний файл; самі знімки видаляються (під _aggregate_lock)
+    """
+    aggregate = _read_snapshot(_aggregate_path()) or {"samples": [], "families": {}}
+    samples = {(name, tuple(tuple(pair) for pair in labels)): value
+               for name, labels, value in aggregate["samples"]}
+    families = aggregate["families"]
+    folded = []
+    for path in paths:
+        if not os.path.exists(path):
+            # Уже перенесений іншим процесом
+            continue
+        payload = _read_snapshot(path)
+        folded.append(path)
+        if payload is None:
+            continue
+        for name, labels, value in payload["samples"]:
+            if _kind(name, payload["families"]) not in CUMULATIVE_KINDS:
+                continue
+            key = (name, tuple(tuple(pair) for pair in labels))
+            samples[key] = samples.get(key, 0) + value
+        families.update({
+            name: family for name, family in payload["families"].items() if family[0] in CUMULATIVE_KINDS
+        })
+    if not folded:
+        return
+    _write_json(_aggregate_path(), {
+        "samples": [[name, list(labels), value] for (name, labels), value in samples.items()],
+        "families": families,
+    })
+    for path in folded:
+        os.remove(path)
+
+
+def write_snapshot():
+    """Запис знімка метрик процесу у METRICS_MULTIPROC_DIR (атомарно)"""
+    data = collect()
+    payload = {
+        "samples": [[name, list(labels), value] for (name, labels), value in data["samples"].items()],
+        "families": data["families"],
+    }
+    _write_json(_snapshot_path(os.getpid()), payload)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _collect_all() -> dict:
+    """Метрики всіх процесів: сума знімків живих процесів і сукупного файлу"""
+    write_snapshot()
+    samples = {}
+    families = {}
+    with _aggregate_lock():
+        paths = []
+        dead = []
+        for filename in os.listdir(MULTIPROC_DIR):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                continue
+            pid = int(filename[len("metrics-"):-len(".json")])
+            path = os.path.join(MULTIPROC_DIR, filename)
+            (paths if _pid_alive(pid) else dead).append(path)
+        if dead:
+            _fold_snapshots(dead)
+
+        for path in paths + [_aggregate_path()]:
+            payload = _read_snapshot(path)
+            if payload is None:
+                continue
+            families.update({name: tuple(value) for name, value in payload["families"].items()})
+            for name, labels, value in payload["samples"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                samples[key] = samples.get(key, 0) + value
+    return {"samples": samples, "families": families}
+
+
+def render() -> str:
+    """Метрики у текстовому форматі Prometheus"""
+    data = _collect_all() if MULTIPROC_DIR else collect()
+    by_family = {}
+    for (name, labels), value in data["samples"].items():
+        base = name
+        for suffix in ("_bucket", "_sum", "_count"):
+            if name.endswith(suffix) and name[:-len(suffix)] in data["families"]:
+                base = name[:-len(suffix)]
+        by_family.setdefault(base, []).append((name, labels, value))
+
+    lines = []
+    for base in sorted(by_family):
+        kind, help_text = data["families"].get(base, ("untyped", ""))
+        lines.append(f"# HELP {base} {help_text}")
+        lines.append(f"# TYPE {base} {kind}")
+        for name, labels, value in by_family[base]:
+            if labels:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+async def run_snapshot_writer():
+    """Фонове періодичне скидання знімка (режим кількох процесів)"""
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    try:
+        while True:
+            write_snapshot()
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+    finally:
+        # Підсумки процесу лишаються в сукупному файлі
+        try:
+            write_snapshot()
+            with _aggregate_lock():
+                _fold_snapshots([_snapshot_path(os.getpid())])
+        except OSError:
+            pass
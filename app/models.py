@@ -1,15 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Boolean, Text, Date, Time, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Boolean, Text, Date, Time, Enum, Index, LargeBinary, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from app.database import Base
+from app.compression import CompressedText
 
 # Таблиця зв'язку many-to-many для користувачів і ролей
 user_roles = Table(
     'user_roles',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('role_id', Integer, ForeignKey('roles.id'), primary_key=True)
+    Column('role_id', Integer, ForeignKey('roles.id'), primary_key=True),
+    # Користувачі з роллю (довідник лікарів GET /api/lookup/doctors)
+    Index('ix_user_roles_role_user', 'role_id', 'user_id')
 )
 
 # Таблиця зв'язку many-to-many для ролей і дозволів
@@ -23,6 +26,10 @@ role_permissions = Table(
 class User(Base):
     """Модель користувача системи"""
     __tablename__ = "users"
+    __table_args__ = (
+        # Пошук за префіксом імені (app/lookup.py)
+        Index("ix_users_search_name", "search_name"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
@@ -30,6 +37,9 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     full_name = Column(String, nullable=False)
     phone = Column(String)
+    department_id = Column(Integer, ForeignKey('departments.id'))
+    # Нормалізоване full_name (app/lookup.py)
+    search_name = Column(String)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -81,6 +91,10 @@ class Permission(Base):
 class Patient(Base):
     """Модель пацієнта"""
     __tablename__ = "patients"
+    __table_args__ = (
+        # Пошук за префіксом "прізвище ім'я по батькові" (app/lookup.py)
+        Index("ix_patients_search_name", "search_name"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, nullable=False)
@@ -97,6 +111,8 @@ class Patient(Base):
     chronic_diseases = Column(Text)
     emergency_contact = Column(String)
     emergency_phone = Column(String)
+    # Нормалізоване "прізвище ім'я по батькові" (app/lookup.py)
+    search_name = Column(String)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -134,6 +150,14 @@ class AppointmentStatus(enum.Enum):
 class Appointment(Base):
     """Модель запису на прийом"""
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Хронологія пацієнта (GET /api/patients/{id}/timeline)
+        Index("ix_appointments_patient_date", "patient_id", "appointment_date", "appointment_time"),
+        # Розклад на дату, відбір записів для архівування і покривний індекс
+        # аналітики завантаженості (app/analytics.py читає лише його)
+        Index("ix_appointments_slots", "appointment_date", "appointment_time", "duration_minutes",
+              "status", "department_id", "doctor_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey('patients.id'), nullable=False)
@@ -155,9 +179,40 @@ class Appointment(Base):
     department = relationship("Department", back_populates="appointments")
     created_by = relationship("User", foreign_keys=[created_by_id], back_populates="created_appointments")
 
+class ArchivedAppointment(Base):
+    """Архівний запис на прийом (закритий, старший за горизонт зберігання)
+
+    Ті самі колонки й id, що й в Appointment; переноситься app.archive.
+    """
+    __tablename__ = "appointments_archive"
+    __table_args__ = (
+        Index("ix_appointments_archive_patient_date", "patient_id", "appointment_date", "appointment_time"),
+        Index("ix_appointments_archive_slots", "appointment_date", "appointment_time", "duration_minutes",
+              "status", "department_id", "doctor_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    patient_id = Column(Integer, ForeignKey('patients.id'), nullable=False)
+    doctor_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    department_id = Column(Integer, ForeignKey('departments.id'))
+    appointment_date = Column(Date, nullable=False)
+    appointment_time = Column(Time, nullable=False)
+    duration_minutes = Column(Integer)
+    status = Column(String)
+    reason = Column(Text)
+    notes = Column(Text)
+    created_by_id = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
 class MedicalRecord(Base):
     """Модель медичного запису"""
     __tablename__ = "medical_records"
+    __table_args__ = (
+        # Хронологія пацієнта (GET /api/patients/{id}/timeline)
+        Index("ix_medical_records_patient_visit", "patient_id", "visit_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey('patients.id'), nullable=False)
@@ -165,15 +220,134 @@ class MedicalRecord(Base):
     appointment_id = Column(Integer, ForeignKey('appointments.id'))
     visit_date = Column(DateTime, default=datetime.utcnow)
     diagnosis = Column(Text, nullable=False)
-    symptoms = Column(Text)
-    treatment = Column(Text)
-    prescriptions = Column(Text)
-    lab_results = Column(Text)
-    notes = Column(Text)
+    # Великі клінічні тексти: стиснення при TEXT_COMPRESSION (app/compression.py)
+    symptoms = Column(CompressedText)
+    treatment = Column(CompressedText)
+    prescriptions = Column(CompressedText)
+    lab_results = Column(CompressedText)
+    notes = Column(CompressedText)
     is_confidential = Column(Boolean, default=False)
+    # Шифрування конфіденційних записів (app/field_crypto.py)
+    encrypted_payload = Column(LargeBinary)
+    encrypted_dek = Column(LargeBinary)
+    key_id = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Зв'язки
     patient = relationship("Patient", back_populates="medical_records")
     doctor = relationship("User", back_populates="medical_records_created")
+
+class AppointmentDailyStats(Base):
+    """Денні підсумки записів на прийом: день x лікар x відділення x статус
+
+    Оновлюються разом із записами (app/daily_stats.py); архівування їх не
+    змінює. department_id 0 - запис без відділення.
+    """
+    __tablename__ = "appointment_daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    doctor_id = Column(Integer, primary_key=True)
+    department_id = Column(Integer, primary_key=True)
+    status = Column(String, primary_key=True)
+    appointments = Column(Integer, nullable=False, default=0)
+    booked_minutes = Column(Integer, nullable=False, default=0)
+    # Сума і кількість хвилин від створення запису до прийому
+    lead_minutes = Column(Integer, nullable=False, default=0)
+    lead_count = Column(Integer, nullable=False, default=0)
+
+class MedicalRecordDailyStats(Base):
+    """Денні підсумки медичних записів: день візиту x лікар"""
+    __tablename__ = "medical_record_daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    doctor_id = Column(Integer, primary_key=True)
+    records = Column(Integer, nullable=False, default=0)
+    confidential = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKey(Base):
+    """Збережені відповіді запитів з Idempotency-Key (app/idempotency.py)"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires", "expires_at"),
+        # Ключ - 16 байтів хешу: таблиця без rowid зберігає рядки в самому індексі
+        {"sqlite_with_rowid": False},
+    )
+    
+    key_hash = Column(LargeBinary, primary_key=True)  # користувач, шлях, ключ
+    request_hash = Column(LargeBinary, nullable=False)  # тіло запиту
+    status_code = Column(Integer)  # None - перший запит ще виконується
+    content_type = Column(String)
+    body = Column(LargeBinary)  # zlib
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class Job(Base):
+    """Фонові завдання (app/jobs.py)"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Вибір наступного завдання: черга за часом запуску
+        Index("ix_jobs_state_run_at", "state", "run_at"),
+        # Дедуплікація: не більше одного завдання в черзі з тим самим ключем
+        Index("ux_jobs_dedup_queued", "dedup_key", unique=True, sqlite_where=text("state = 'queued'")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    payload = Column(Text)  # JSON
+    dedup_key = Column(String)
+    state = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    locked_by = Column(String)  # процес, що виконує завдання
+    locked_until = Column(DateTime)  # після - завдання вважається перерваним
+    last_error = Column(Text)
+    result = Column(Text)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class AppointmentEvent(Base):
+    """Журнал подій записів на прийом для потоку змін (SSE)"""
+    __tablename__ = "appointment_events"
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    appointment_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)
+    doctor_id = Column(Integer)
+    department_id = Column(Integer)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChangeLog(Base):
+    """Журнал змін для інкрементальної синхронізації (GET /api/changes)"""
+    __tablename__ = "change_log"
+    # AUTOINCREMENT: номер зміни ніколи не використовується повторно
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # upsert або delete
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaMeta(Base):
+    """Службові версії схеми та початкових даних"""
+    __tablename__ = "schema_meta"
+    
+    key = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False)
+
+class CacheInvalidation(Base):
+    """Лічильник змін для інвалідації кешів між процесами"""
+    __tablename__ = "cache_invalidations"
+    
+    topic = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# Події маперу реєструються разом з моделями, тож жоден запис через ORM
+# (застосунок, скрипти, init_rbac_system) їх не обминає: журнал змін,
+# пошукові імена, денні підсумки, шифрування конфіденційних записів
+from app import change_log, lookup, daily_stats, field_crypto
@@ -1,6 +1,16 @@
 from sqlalchemy.orm import Session
 from app.models import Role, Permission, User
-from app.auth import get_password_hash
+from app.invalidation import bus, TOPIC_RBAC
+
+# Попередньо обчислені bcrypt-хеші тестових паролів (admin123, doctor123,
+# nurse123, registrar123): ініціалізація свіжої бази не витрачає ~1 с CPU
+# на хешування при кожному запуску
+DEFAULT_PASSWORD_HASHES = {
+    "admin": "$2b$12$lFAzM1aQo4NO.OMLKd92jucXvsqEB3TR//lOrs3T/1/kQt.9gWU0W",
+    "doctor": "$2b$12$MCIFDkSbl8rRBqWaIaCLVOhN6FD9dEKqZHVPWgJxw4Z2nc0HMmCJ.",
+    "nurse": "$2b$12$.KFQQKTKlXf9gaTdH2cDZul9tJGpuU4XB/VHGUZcgkKrhqQzSlZf6",
+    "registrar": "$2b$12$1kuGXPTJ16Qv.q6dWL1eOu/Dpg0bIn10pnTlqHdKiNeMtVWlWl4Ci",
+}
 
 def init_rbac_system(db: Session):
     """
@@ -46,6 +56,9 @@ def init_rbac_system(db: Session):
         
         # RBAC
         ("rbac.manage", "Управління ролями та дозволами", "rbac", "manage"),
+        
+        # Аналітика
+        ("analytics.read", "Перегляд аналітики завантаженості", "analytics", "read"),
     ]
     
     permissions = {}
@@ -138,6 +151,7 @@ def init_rbac_system(db: Session):
         permissions["departments.read"],
         permissions["departments.update"],
         permissions["users.read"],
+        permissions["analytics.read"],
     ]
     db.add(head_doctor_role)
     
@@ -147,7 +161,7 @@ def init_rbac_system(db: Session):
     admin_user = User(
         username="admin",
         email="admin@hospital.ua",
-        hashed_password=get_password_hash("admin123"),
+        hashed_password=DEFAULT_PASSWORD_HASHES["admin"],
         full_name="Системний адміністратор",
         phone="+380501234567",
         is_active=True
@@ -159,7 +173,7 @@ def init_rbac_system(db: Session):
     doctor_user = User(
         username="doctor",
         email="doctor@hospital.ua",
-        hashed_password=get_password_hash("doctor123"),
+        hashed_password=DEFAULT_PASSWORD_HASHES["doctor"],
         full_name="Іванов Іван Іванович",
         phone="+380502345678",
         is_active=True
@@ -170,7 +184,7 @@ def init_rbac_system(db: Session):
     nurse_user = User(
         username="nurse",
         email="nurse@hospital.ua",
-        hashed_password=get_password_hash("nurse123"),
+        hashed_password=DEFAULT_PASSWORD_HASHES["nurse"],
         full_name="Петрова Марія Петрівна",
         phone="+380503456789",
         is_active=True
@@ -181,7 +195,7 @@ def init_rbac_system(db: Session):
     registrar_user = User(
         username="registrar",
         email="registrar@hospital.ua",
-        hashed_password=get_password_hash("registrar123"),
+        hashed_password=DEFAULT_PASSWORD_HASHES["registrar"],
         full_name="Сидоренко Олена Миколаївна",
         phone="+380504567890",
         is_active=True
@@ -197,3 +211,21 @@ def init_rbac_system(db: Session):
     print("  - doctor/doctor123 (Лікар)")
     print("  - nurse/nurse123 (Медсестра)")
     print("  - registrar/registrar123 (Реєстратор)")
+
+def add_analytics_permission(db: Session):
+    """
+    Дозвіл analytics.read для наявних баз: адміністратору і завідувачу
+    відділення (нові бази отримують його з init_rbac_system)
+    """
+    if db.query(Permission).filter(Permission.name == "analytics.read").first():
+        return
+    permission = Permission(
+        name="analytics.read",
+        description="Перегляд аналітики завантаженості",
+        resource="analytics",
+        action="read",
+    )
+    db.add(permission)
+    for role in db.query(Role).filter(Role.name.in_(["Адміністратор", "Завідувач відділення"])):
+        role.permissions.append(permission)
+    bus.bump(db, TOPIC_RBAC)
@@ -0,0 +1,287 @@
+"""
+Стиснення динамічних відповідей (JSON списків, експорту, метрик)
+
+CompressionMiddleware стискає відповіді текстових типів, більші за
+RESPONSE_COMPRESSION_MIN_BYTES, кодуванням з RESPONSE_COMPRESSION_ENCODINGS
+(порядок - перевага сервера; zstd і br - за наявності пакетів zstandard і
+brotli), найкращим серед прийнятних для клієнта за Accept-Encoding.
+
+Рівень стиснення обирається за розміром відповіді і завантаженістю CPU
+процесу (частка процесорного часу за останні секунди): невеликі
+відповіді на вільному CPU стискаються сильніше, великі або під
+навантаженням - найшвидшим рівнем, щоб стиснення не стало вузьким місцем
+циклу подій. Великі тіла стискаються в потоці (zlib, brotli і zstd
+звільняють GIL).
+
+Потокові відповіді стискаються частинами зі скиданням після кожної -
+клієнт отримує дані без затримки. Не стискаються: SSE (text/event-stream -
+окремий компресор на кожне довге з'єднання), відповіді з Content-Encoding
+(статичні файли вже стиснені, app/static_assets.py), HEAD, 204/304.
+Співвідношення байтів і витрачений час - у метриках response_compression_*.
+"""
+import asyncio
+import os
+import time
+import zlib
+
+from app.metrics import register_collector
+from app.static_assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+_AVAILABLE = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+ENCODINGS = tuple(
+    encoding for encoding in (
+        name.strip().lower() for name in os.getenv("RESPONSE_COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+    ) if _AVAILABLE.get(encoding)
+)
+
+# Рівні кожного кодування: найшвидший, середній, найсильніший
+LEVELS = {"gzip": (1, 4, 6), "br": (1, 4, 5), "zstd": (1, 3, 6)}
+# Межі розміру: до SMALL_BYTES - найсильніший рівень, до LARGE_BYTES - середній
+SMALL_BYTES = 64 * 1024
+LARGE_BYTES = 1024 * 1024
+# Завантаженість CPU процесу, з якої рівень знижується на один і на два щаблі
+CPU_BUSY = 0.5
+CPU_SATURATED = 0.8
+CPU_SAMPLE_SECONDS = 1.0
+# Тіла, більші за це, стискаються в потоці, а не в циклі подій
+THREAD_BYTES = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml")
+SKIPPED_TYPES = ("text/event-stream",)
+
+
+class _CpuMonitor:
+    """Частка процесорного часу процесу (згладжена), оновлення раз на секунду"""
+
+    def __init__(self):
+        self.busy = 0.0
+        self._wall = time.monotonic()
+        self._cpu = time.process_time()
+
+    def sample(self) -> float:
+        wall = time.monotonic()
+        if wall - self._wall >= CPU_SAMPLE_SECONDS:
+            cpu = time.process_time()
+            current = (cpu - self._cpu) / (wall - self._wall)
+            self.busy = 0.5 * self.busy + 0.5 * current
+            self._wall, self._cpu = wall, cpu
+        return self.busy
+
+
+_cpu = _CpuMonitor()
+
+
+def choose_level(encoding: str, size, busy: float) -> int:
+    """Рівень стиснення за розміром (None - невідомий, потік) і завантаженістю CPU"""
+    if size is None:
+        tier = 1
+    else:
+        tier = 2 if size <= SMALL_BYTES else 1 if size <= LARGE_BYTES else 0
+    if busy >= CPU_SATURATED:
+        tier -= 2
+    elif busy >= CPU_BUSY:
+        tier -= 1
+    return LEVELS[encoding][max(tier, 0)]
+
+
+def negotiate(accept_encoding: str):
+    """Кодування з найбільшим q серед прийнятних; за рівних - перевага сервера"""
+    accepted = accepted_encodings(accept_encoding)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Encoder:
+    """Потоковий компресор: compress(частина, final) -> стиснені байти"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "gzip":
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+
+# Лічильники: кодування -> [відповідей, байтів до, байтів після, секунд]
+_compressed = {}
+# Причина -> кількість нестиснених відповідей
+_skipped = {}
+
+
+def _count_skip(reason: str):
+    _skipped[reason] = _skipped.get(reason, 0) + 1
+
+
+def _header(headers: list, name: bytes):
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """Стиснення відповідей за Accept-Encoding з адаптивним рівнем"""
+
+    def __init__(self, app, minimum_size: int = MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENCODINGS or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        pending = []
+        pending_size = 0
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(body: bytes, final: bool, size=None):
+            nonlocal encoder
+            started = time.perf_counter()
+            if encoder is None:
+                encoder = _Encoder(encoding, choose_level(encoding, size, _cpu.sample()))
+            if len(body) > THREAD_BYTES:
+                data = await asyncio.to_thread(encoder.compress, body, final)
+            else:
+                data = encoder.compress(body, final)
+            stats = _compressed.setdefault(encoding, [0, 0, 0, 0.0])
+            stats[0] += int(final)
+            stats[1] += len(body)
+            stats[2] += len(data)
+            stats[3] += time.perf_counter() - started
+            return data
+
+        def start_headers(content_length=None) -> dict:
+            headers = [
+                (key, value) for key, value in start_message["headers"]
+                if key.lower() not in (b"content-length", b"vary")
+            ]
+            vary = _header(start_message["headers"], b"vary")
+            headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+            headers.append((b"content-encoding", encoding.encode()))
+            if content_length is not None:
+                headers.append((b"content-length", str(content_length).encode()))
+            return {**start_message, "headers": headers}
+
+        async def compressing_send(message):
+            nonlocal start_message, pending_size, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1").lower()
+                reason = None
+                if _header(headers, b"content-encoding") is not None:
+                    reason = "encoded"
+                elif message["status"] in (204, 304) or message["status"] < 200:
+                    reason = "no_body"
+                elif content_type.startswith(SKIPPED_TYPES):
+                    reason = "stream"
+                elif not content_type.startswith(COMPRESSIBLE_TYPES):
+                    reason = "type"
+                else:
+                    content_length = _header(headers, b"content-length")
+                    if content_length is not None and int(content_length) < self.minimum_size:
+                        reason = "small"
+                if reason is not None:
+                    _count_skip(reason)
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None and encoder is None:
+                # Початок тіла накопичується до мінімального розміру
+                pending.append(body)
+                pending_size += len(body)
+                if pending_size < self.minimum_size and more_body:
+                    return
+                body = b"".join(pending)
+                pending.clear()
+                if pending_size < self.minimum_size:
+                    _count_skip("small")
+                    passthrough = True
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body, "more_body": False})
+                    return
+                if not more_body:
+                    data = await send_compressed(body, True, len(body))
+                    await send(start_headers(len(data)))
+                    await send({"type": "http.response.body", "body": data, "more_body": False})
+                    return
+                message_start = start_headers()
+                data = await send_compressed(body, False)
+                await send(message_start)
+                await send({"type": "http.response.body", "body": data, "more_body": True})
+                return
+            data = await send_compressed(body, not more_body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+
+def collect_metrics():
+    responses, bytes_in, bytes_out, seconds = [], [], [], []
+    for encoding, (count, size_in, size_out, elapsed) in _compressed.items():
+        labels = {"encoding": encoding}
+        responses.append((labels, count))
+        bytes_in.append((labels, size_in))
+        bytes_out.append((labels, size_out))
+        seconds.append((labels, elapsed))
+    return [
+        ("response_compression_responses_total", "counter", "Стиснені відповіді за кодуванням", responses),
+        ("response_compression_bytes_in_total", "counter", "Байти відповідей до стиснення", bytes_in),
+        ("response_compression_bytes_out_total", "counter", "Байти відповідей після стиснення", bytes_out),
+        ("response_compression_seconds_total", "counter", "Час CPU на стиснення відповідей", seconds),
+        ("response_compression_skipped_total", "counter",
+         "Нестиснені відповіді: small, type, stream (SSE), encoded, no_body",
+         [({"reason": reason}, count) for reason, count in _skipped.items()]),
+        ("response_compression_cpu_busy_ratio", "gauge", "Завантаженість CPU процесу для вибору рівня",
+         [({}, round(_cpu.busy, 4))]),
+    ]
+
+
+register_collector(collect_metrics)
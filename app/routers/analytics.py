@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from datetime import date, timedelta
+from typing import List, Optional
+
+from app.database import get_db
+from app.models import User
+from app.schemas import UtilizationResponse, DoctorWorkload, MonthlyLoad, DailyLoad, HeatmapResponse
+from app.auth import require_permission
+from app.coalesce import coalesce
+from app import analytics
+
+router = APIRouter()
+
+# Період за замовчуванням: останні 90 днів
+DEFAULT_PERIOD_DAYS = 90
+
+
+def _period(date_from: Optional[date], date_to: Optional[date]) -> tuple:
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_PERIOD_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from має бути не пізніше date_to")
+    if (date_to - date_from).days + 1 > analytics.MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Період не може перевищувати {analytics.MAX_DAYS} днів")
+    return date_from, date_to
+
+
+# Звіти рахуються в потоці (coalesce), тож цикл подій вільний, а однакові
+# одночасні звіти рахуються один раз
+@router.get("/utilization", response_model=UtilizationResponse)
+@coalesce(UtilizationResponse)
+async def get_utilization(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("analytics.read"))
+):
+    """Завантаженість відділень: заброньовані години відносно capacity x робочий час"""
+    return analytics.department_utilization(db, *_period(date_from, date_to))
+
+
+@router.get("/doctors", response_model=List[DoctorWorkload])
+@coalesce(List[DoctorWorkload])
+async def get_doctor_workload(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    department_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("analytics.read"))
+):
+    """Навантаження лікарів (за спаданням заброньованих годин)"""
+    return analytics.doctor_workload(db, *_period(date_from, date_to), department_id=department_id)
+
+
+@router.get("/heatmap", response_model=HeatmapResponse)
+@coalesce(HeatmapResponse)
+async def get_heatmap(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    department_id: Optional[int] = None,
+    doctor_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("analytics.read"))
+):
+    """Теплова карта зайнятості: день тижня x година"""
+    return analytics.occupancy_heatmap(
+        db, *_period(date_from, date_to), department_id=department_id, doctor_id=doctor_id
+    )
+
+
+@router.get("/monthly", response_model=List[MonthlyLoad])
+@coalesce(List[MonthlyLoad])
+async def get_monthly_load(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    department_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("analytics.read"))
+):
+    """Показники за місяцями періоду (для закладу або відділення)"""
+    return analytics.monthly_load(db, *_period(date_from, date_to), department_id=department_id)
+
+
+@router.get("/daily", response_model=List[DailyLoad])
+@coalesce(List[DailyLoad])
+async def get_daily_load(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    department_id: Optional[int] = None,
+    doctor_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("analytics.read"))
+):
+    """Показники за днями (дні із записами): завантаженість, неявки, скасування, медичні записи"""
+    return analytics.daily_load(
+        db, *_period(date_from, date_to), department_id=department_id, doctor_id=doctor_id
+    )
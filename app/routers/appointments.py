@@ -1,42 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, union_all
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import date
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models import User, Appointment, Patient
 from app.schemas import AppointmentCreate, AppointmentUpdate, AppointmentResponse
-from app.auth import get_current_user, require_permission
+from app.auth import get_current_user, require_permission, user_from_token
+from app.sql_monitor import query_budget
+from app.coalesce import coalesce
+from app import archive, events, group_commit
 
 router = APIRouter()
 
 @router.get("/", response_model=List[AppointmentResponse])
+@query_budget(5)
+@coalesce(List[AppointmentResponse])
 async def get_appointments(
     skip: int = 0,
     limit: int = 100,
     patient_id: int = None,
     doctor_id: int = None,
     appointment_date: date = None,
+    date_from: date = None,
+    date_to: date = None,
     status: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("appointments.read"))
 ):
     """
     Отримання списку записів на прийом з фільтрацією
+
+    Запити з датою (appointment_date або date_from) після межі архіву
+    читають лише гарячу таблицю; історичні - ще й архів (див. app.archive).
+    """
+    def filters(model):
+        conditions = []
+        if patient_id:
+            conditions.append(model.patient_id == patient_id)
+        if doctor_id:
+            conditions.append(model.doctor_id == doctor_id)
+        if appointment_date:
+            conditions.append(model.appointment_date == appointment_date)
+        if date_from:
+            conditions.append(model.appointment_date >= date_from)
+        if date_to:
+            conditions.append(model.appointment_date <= date_to)
+        if status:
+            conditions.append(model.status == status)
+        return conditions
+
+    models = archive.partitions(db, appointment_date or date_from)
+    if len(models) == 1:
+        return db.query(Appointment).filter(*filters(Appointment)).offset(skip).limit(limit).all()
+
+    # Кожна частина читає не більше skip + limit рядків за первинним ключем
+    arms = [
+        select(*archive.columns(model)).where(*filters(model))
+        .order_by(model.id).limit(skip + limit).subquery()
+        for model in models
+    ]
+    merged = union_all(*[select(arm) for arm in arms]).subquery()
+    return db.execute(select(merged).order_by(merged.c.id).offset(skip).limit(limit)).all()
+
+@router.get("/stream")
+async def stream_appointments(
+    request: Request,
+    department_id: List[int] = Query(None),
+    doctor_id: List[int] = Query(None),
+    token: str = None,
+):
+    """
+    Потік змін записів на прийом (Server-Sent Events)
+
+    Події appointment (created, updated, cancelled) лише для вказаних
+    відділень чи лікарів (без фільтрів - усі). EventSource не передає
+    заголовки, тому токен можна передати параметром token. Сесія БД
+    закривається до початку потоку - з'єднання не тримає пул.
     """
-    query = db.query(Appointment)
-    
-    if patient_id:
-        query = query.filter(Appointment.patient_id == patient_id)
-    if doctor_id:
-        query = query.filter(Appointment.doctor_id == doctor_id)
-    if appointment_date:
-        query = query.filter(Appointment.appointment_date == appointment_date)
-    if status:
-        query = query.filter(Appointment.status == status)
-    
-    appointments = query.offset(skip).limit(limit).all()
-    return appointments
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Не вдалося перевірити облікові дані",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    with SessionLocal() as db:
+        user = user_from_token(token, db)
+        if not user.has_permission(events.READ_PERMISSION):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Недостатньо прав. Потрібен дозвіл: {events.READ_PERMISSION}"
+            )
+        user_id = user.id
+
+    last_event_id = request.headers.get("last-event-id")
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        events.stream(user_id, department_id, doctor_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{appointment_id}", response_model=AppointmentResponse)
 async def get_appointment(
@@ -44,12 +112,24 @@ async def get_appointment(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("appointments.read"))
 ):
-    """Отримання запису за ID"""
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    """Отримання запису за ID (також архівного)"""
+    appointment = archive.find_appointment(db, appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Запис не знайдено")
     return appointment
 
+def _editable_appointment(db: Session, appointment_id: int) -> Appointment:
+    """Запис гарячої таблиці для зміни; архівні записи лише для читання"""
+    db_appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    if db_appointment:
+        return db_appointment
+    if archive.find_appointment(db, appointment_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Архівний запис не можна змінити"
+        )
+    raise HTTPException(status_code=404, detail="Запис не знайдено")
+
 @router.post("/", response_model=AppointmentResponse, status_code=status.HTTP_201_CREATED)
 async def create_appointment(
     appointment: AppointmentCreate,
@@ -57,38 +137,43 @@ async def create_appointment(
     current_user: User = Depends(require_permission("appointments.create"))
 ):
     """Створення нового запису на прийом"""
-    # Перевірка існування пацієнта
-    patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
-    
-    # Перевірка існування лікаря
-    doctor = db.query(User).filter(User.id == appointment.doctor_id).first()
-    if not doctor:
-        raise HTTPException(status_code=404, detail="Лікаря не знайдено")
-    
-    # Перевірка конфлікту часу (опціонально)
-    existing = db.query(Appointment).filter(
-        Appointment.doctor_id == appointment.doctor_id,
-        Appointment.appointment_date == appointment.appointment_date,
-        Appointment.appointment_time == appointment.appointment_time,
-        Appointment.status.in_(["scheduled", "confirmed", "in_progress"])
-    ).first()
-    
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Лікар вже зайнятий у цей час"
+    created_by_id = current_user.id
+
+    def write(session: Session):
+        # Перевірка існування пацієнта
+        patient = session.query(Patient).filter(Patient.id == appointment.patient_id).first()
+        if not patient:
+            raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
+        
+        # Перевірка існування лікаря
+        doctor = session.query(User).filter(User.id == appointment.doctor_id).first()
+        if not doctor:
+            raise HTTPException(status_code=404, detail="Лікаря не знайдено")
+        
+        # Перевірка конфлікту часу (опціонально)
+        existing = session.query(Appointment).filter(
+            Appointment.doctor_id == appointment.doctor_id,
+            Appointment.appointment_date == appointment.appointment_date,
+            Appointment.appointment_time == appointment.appointment_time,
+            Appointment.status.in_(["scheduled", "confirmed", "in_progress"])
+        ).first()
+        
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Лікар вже зайнятий у цей час"
+            )
+        
+        db_appointment = Appointment(
+            **appointment.model_dump(),
+            created_by_id=created_by_id
         )
-    
-    db_appointment = Appointment(
-        **appointment.model_dump(),
-        created_by_id=current_user.id
-    )
-    db.add(db_appointment)
-    db.commit()
-    db.refresh(db_appointment)
-    return db_appointment
+        session.add(db_appointment)
+        session.flush()
+        events.publish(session, "created", db_appointment)
+        return db_appointment
+
+    return await group_commit.run(db, write)
 
 @router.put("/{appointment_id}", response_model=AppointmentResponse)
 async def update_appointment(
@@ -98,17 +183,19 @@ async def update_appointment(
     current_user: User = Depends(require_permission("appointments.update"))
 ):
     """Оновлення запису на прийом"""
-    db_appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    if not db_appointment:
-        raise HTTPException(status_code=404, detail="Запис не знайдено")
-    
     update_data = appointment_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_appointment, field, value)
-    
-    db.commit()
-    db.refresh(db_appointment)
-    return db_appointment
+
+    def write(session: Session):
+        db_appointment = _editable_appointment(session, appointment_id)
+        
+        for field, value in update_data.items():
+            setattr(db_appointment, field, value)
+        
+        session.flush()
+        events.publish(session, "cancelled" if update_data.get("status") == "cancelled" else "updated", db_appointment)
+        return db_appointment
+
+    return await group_commit.run(db, write)
 
 @router.delete("/{appointment_id}")
 async def cancel_appointment(
@@ -117,10 +204,12 @@ async def cancel_appointment(
     current_user: User = Depends(require_permission("appointments.delete"))
 ):
     """Скасування запису на прийом"""
-    db_appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    if not db_appointment:
-        raise HTTPException(status_code=404, detail="Запис не знайдено")
-    
-    db_appointment.status = "cancelled"
-    db.commit()
+    def write(session: Session):
+        db_appointment = _editable_appointment(session, appointment_id)
+        
+        db_appointment.status = "cancelled"
+        session.flush()
+        events.publish(session, "cancelled", db_appointment)
+
+    await group_commit.run(db, write)
     return {"message": "Запис скасовано"}
@@ -6,11 +6,12 @@ from app.database import get_db
 from app.models import User
 from app.schemas import Token, UserLogin, UserResponse
 from app.auth import (
-    verify_password,
+    verify_password_async,
     create_access_token,
     get_current_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.sql_monitor import query_budget
 
 router = APIRouter()
 
@@ -37,7 +38,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     print(f"[DEBUG] Хеш паролю в БД: {user.hashed_password[:20]}...")
     
     # Перевірка пароля
-    password_valid = verify_password(user_data.password, user.hashed_password)
+    password_valid = await verify_password_async(user_data.password, user.hashed_password)
     print(f"[DEBUG] Перевірка пароля: {password_valid}")
     
     if not password_valid:
@@ -64,6 +65,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
+@query_budget(3)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """
     Отримання інформації про поточного користувача
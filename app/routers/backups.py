@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import logging
+import os
+
+from app.models import User
+from app.schemas import BackupStatus, BackupsResponse, BackupVerification
+from app.auth import require_role
+from app import backup
+
+router = APIRouter()
+logger = logging.getLogger("app.backup")
+
+# Фонове копіювання, запущене через API цього процесу
+_task = None
+
+
+async def _run_in_background():
+    try:
+        await asyncio.to_thread(backup.run_backup)
+    except backup.BackupInProgress:
+        pass
+    except Exception:
+        logger.exception("Помилка резервного копіювання")
+
+
+@router.get("/", response_model=BackupsResponse)
+async def get_backups(
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """Наявні резервні копії та стан (прогрес) останнього копіювання"""
+    return {"status": backup.read_status(), "backups": backup.list_backups()}
+
+
+@router.post("/", response_model=BackupStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_backup(
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """
+    Запуск резервного копіювання у фоні
+
+    Прогрес - у GET /api/backups (status.pages_done / status.pages_total).
+    """
+    global _task
+    if backup.is_running():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Резервне копіювання вже виконується"
+        )
+    _task = asyncio.create_task(_run_in_background())
+    # Дати потоку копіювання взяти блокування й записати початковий стан
+    for _ in range(20):
+        if backup.is_running() or _task.done():
+            break
+        await asyncio.sleep(0.01)
+    return backup.read_status()
+
+
+@router.post("/{name}/verify", response_model=BackupVerification)
+async def verify_backup(
+    name: str,
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """Перевірка копії: контрольна сума, розпакування та integrity_check"""
+    if name != os.path.basename(name) or not name.endswith(backup.SUFFIX):
+        raise HTTPException(status_code=400, detail="Некоректне ім'я копії")
+    path = os.path.join(backup.BACKUP_DIR, name)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Резервну копію не знайдено")
+    try:
+        info = await asyncio.to_thread(backup.verify, path)
+    except backup.BackupVerificationError as exc:
+        return {"name": name, "valid": False, "error": str(exc)}
+    return {"name": name, "valid": True, **info}
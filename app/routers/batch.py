@@ -0,0 +1,169 @@
+"""
+Пакетні запити: кілька викликів API за один HTTP-запит
+
+POST /api/batch приймає список вкладених запитів (метод, шлях відносно
+/api, тіло) і виконує їх у процесі через маршрутизатор застосунку, в
+одному автентифікованому контексті: токен перевіряється і користувач з
+ролями завантажується один раз, усі вкладені запити працюють з однією
+сесією БД. Кожен вкладений запит проходить ті самі перевірки дозволів, що
+й окремий.
+
+Вкладені запити виконуються по одному в порядку списку: обробники
+працюють зі спільною синхронною сесією, тож одночасне виконання не дало б
+виграшу, а помилка одного запиту відкочувала б транзакцію решти. Читання
+після зміни бачить її результат.
+Відповіді повертаються разом у порядку запитів: {"status", "body"}. Тіла
+JSON вставляються у відповідь пакета як є, без повторної серіалізації.
+
+Допуск і ліміти швидкості (app/admission.py) рахують пакет як один запит.
+"""
+import json
+import logging
+import os
+from typing import List
+from urllib.parse import quote, urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from app.database import get_db, batch_session
+from app.models import User
+from app.schemas import BatchItem, BatchRequest, BatchResponse
+from app.auth import get_current_user, batch_user
+from app.metrics import register_collector
+
+router = APIRouter()
+logger = logging.getLogger("app.batch")
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+# Шляхи, недоступні в пакеті: вкладені пакети і нескінченний потік SSE
+BATCH_EXCLUDED_PATHS = ("/api/batch", "/api/appointments/stream")
+# Переспрямування на шлях зі скісною рискою в кінці (/patients -> /patients/)
+MAX_REDIRECTS = 1
+
+_subrequests = {}
+
+
+async def _dispatch(request: Request, method: str, path: str, body: bytes) -> tuple:
+    """Виконання вкладеного запиту маршрутизатором; (статус, заголовки, тіло)"""
+    parts = urlsplit(path)
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    authorization = request.headers.get("authorization")
+    if authorization:
+        headers.append((b"authorization", authorization.encode("latin-1")))
+    scope = {
+        **request.scope,
+        "method": method,
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        # Як у браузері: не-ASCII символи параметрів - у %-кодуванні
+        "query_string": quote(parts.query, safe="=&+%").encode(),
+        "headers": headers,
+    }
+    for key in ("endpoint", "route", "path_params", "router"):
+        scope.pop(key, None)
+
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        return {"type": "http.disconnect"}
+
+    response = {"status": 500, "headers": [], "body": []}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await request.app.router(scope, receive, send)
+    return response["status"], response["headers"], b"".join(response["body"])
+
+
+async def _execute(request: Request, db: Session, item: BatchItem) -> tuple:
+    """(статус, тіло JSON у байтах) вкладеного запиту"""
+    method = item.method.upper()
+    path = "/api" + item.path if item.path.startswith("/") else "/api/" + item.path
+    if method not in BATCH_METHODS:
+        return 405, json.dumps({"detail": f"Метод {method} не підтримується в пакеті"}, ensure_ascii=False).encode()
+    if urlsplit(path).path.rstrip("/").startswith(BATCH_EXCLUDED_PATHS):
+        return 400, json.dumps({"detail": "Цей шлях недоступний у пакеті"}, ensure_ascii=False).encode()
+    body = json.dumps(item.body).encode() if item.body is not None else b""
+    _subrequests[method] = _subrequests.get(method, 0) + 1
+
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            code, headers, content = await _dispatch(request, method, path, body)
+            location = dict(headers).get(b"location")
+            if code not in (307, 308) or location is None:
+                break
+            target = urlsplit(location.decode("latin-1"))
+            path = target.path + (f"?{target.query}" if target.query else "")
+    except StarletteHTTPException as exc:
+        # Маршрутизатор застосунку (scope з "app") не відповідає сам на
+        # невідомий шлях (404) чи метод (405), а піднімає виняток
+        return exc.status_code, json.dumps({"detail": exc.detail}, ensure_ascii=False).encode()
+    except Exception:
+        logger.exception("Помилка вкладеного запиту %s %s", method, path)
+        # Незавершена транзакція не повинна зачепити наступні запити пакета
+        db.rollback()
+        return 500, json.dumps({"detail": "Внутрішня помилка сервера"}, ensure_ascii=False).encode()
+
+    content_type = dict(headers).get(b"content-type", b"")
+    if not content:
+        return code, b"null"
+    if not content_type.startswith(b"application/json"):
+        return code, json.dumps(content.decode("utf-8", "replace"), ensure_ascii=False).encode()
+    return code, content
+
+
+@router.post("/", response_model=BatchResponse)
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Виконання пакета запитів в одному контексті автентифікації та сесії БД
+
+    Шляхи вкладених запитів - відносно /api (як у static/app.js), напр.
+    {"requests": [{"method": "GET", "path": "/patients"}, {"method": "GET", "path": "/users"}]}
+    """
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Пакет порожній")
+    if len(batch.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Забагато запитів у пакеті (максимум {BATCH_MAX_REQUESTS})"
+        )
+
+    session_token = batch_session.set(db)
+    user_token = batch_user.set(current_user)
+    try:
+        results: List[tuple] = []
+        for item in batch.requests:
+            results.append(await _execute(request, db, item))
+    finally:
+        batch_user.reset(user_token)
+        batch_session.reset(session_token)
+
+    content = b'{"responses":[' + b",".join(
+        b'{"status":%d,"body":%s}' % (code, body) for code, body in results
+    ) + b"]}"
+    return Response(content=content, media_type="application/json")
+
+
+def collect_metrics():
+    return [(
+        "batch_subrequests_total", "counter", "Вкладені запити пакетів за методом",
+        [({"method": method}, count) for method, count in _subrequests.items()],
+    )]
+
+
+register_collector(collect_metrics)
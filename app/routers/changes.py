@@ -0,0 +1,130 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
+
+from app.database import get_db
+from app.models import User, ChangeLog, Patient, Appointment, ArchivedAppointment, MedicalRecord
+from app.schemas import (
+    PatientResponse, AppointmentResponse, MedicalRecordResponse, UserResponse, ChangesResponse
+)
+from app.auth import get_current_user
+from app.change_log import OP_DELETE
+from app.sql_monitor import query_budget
+from app import archive
+
+router = APIRouter()
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 5000
+
+# Сутність -> (модель, дозвіл на читання, схема, опції завантаження)
+CHANGE_ENTITIES = {
+    "patient": (Patient, "patients.read", PatientResponse, ()),
+    "appointment": (Appointment, "appointments.read", AppointmentResponse, ()),
+    "medical_record": (MedicalRecord, "medical_records.read", MedicalRecordResponse, ()),
+    "user": (User, "users.read", UserResponse, (selectinload(User.roles),)),
+}
+
+
+def _is_soft_deleted(entity: str, row) -> bool:
+    """М'яке видалення: деактивація або скасування"""
+    if entity in ("patient", "user"):
+        return not row.is_active
+    if entity == "appointment":
+        return row.status == "cancelled"
+    return False
+
+
+def _parse_token(since: Optional[str]) -> int:
+    if not since:
+        return 0
+    if not since.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некоректний токен синхронізації"
+        )
+    return int(since)
+
+
+@router.get("/", response_model=ChangesResponse)
+@query_budget(11)
+async def get_changes(
+    since: Optional[str] = None,
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Інкрементальна синхронізація пацієнтів, записів, медичних записів і користувачів
+
+    Повертає зміни після токена since у порядку журналу: op = upsert (дані
+    поточного стану), soft_delete (деактивація чи скасування, з даними) або
+    delete (видалення, лише id). Кілька змін одного об'єкта на сторінці
+    згортаються в останню. Сутності без дозволу на читання пропускаються;
+    недоступні конфіденційні медичні записи подаються як delete. Наступний
+    запит - з since=next_token; has_more означає, що журнал ще не вичерпано.
+    """
+    position = _parse_token(since)
+    allowed = [
+        entity for entity, (_, permission, _, _) in CHANGE_ENTITIES.items()
+        if current_user.has_permission(permission)
+    ]
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостатньо прав для синхронізації"
+        )
+
+    # Токен просувається і за рядками недоступних сутностей, тому фільтр
+    # за сутністю застосовується вже до прочитаної сторінки
+    log = (
+        db.query(ChangeLog.seq, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+        .filter(ChangeLog.seq > position)
+        .order_by(ChangeLog.seq)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(log) > limit
+    log = log[:limit]
+    next_token = str(log[-1].seq if log else position)
+
+    # Остання зміна кожного об'єкта на сторінці
+    latest = {}
+    for entry in log:
+        if entry.entity in allowed:
+            latest.pop((entry.entity, entry.entity_id), None)
+            latest[(entry.entity, entry.entity_id)] = entry
+
+    rows = {}
+    for entity in allowed:
+        ids = [entity_id for (name, entity_id), entry in latest.items() if name == entity and entry.op != OP_DELETE]
+        if ids:
+            model, _, _, options = CHANGE_ENTITIES[entity]
+            for row in db.query(model).options(*options).filter(model.id.in_(ids)):
+                rows[(entity, row.id)] = row
+            # Записи на прийом, перенесені до архіву після зміни
+            archived_ids = [entity_id for entity_id in ids if (entity, entity_id) not in rows]
+            if entity == "appointment" and archived_ids and archive.archived_before(db) is not None:
+                for row in db.query(ArchivedAppointment).filter(ArchivedAppointment.id.in_(archived_ids)):
+                    rows[(entity, row.id)] = row
+
+    is_admin = current_user.has_role("Адміністратор")
+    changes = []
+    for key, entry in latest.items():
+        entity, entity_id = key
+        row = rows.get(key)
+        if (
+            row is not None and entity == "medical_record" and row.is_confidential
+            and not is_admin and row.doctor_id != current_user.id
+        ):
+            row = None
+        change = {"seq": entry.seq, "entity": entity, "id": entity_id}
+        if row is None:
+            change["op"] = OP_DELETE
+        else:
+            schema = CHANGE_ENTITIES[entity][2]
+            change["op"] = "soft_delete" if _is_soft_deleted(entity, row) else "upsert"
+            change["data"] = schema.model_validate(row).model_dump(mode="json")
+        changes.append(change)
+
+    return {"changes": changes, "next_token": next_token, "has_more": has_more}
@@ -6,10 +6,14 @@ from app.database import get_db
 from app.models import User, Department
 from app.schemas import DepartmentCreate, DepartmentResponse
 from app.auth import get_current_user, require_permission
+from app.sql_monitor import query_budget
+from app.coalesce import coalesce
 
 router = APIRouter()
 
 @router.get("/", response_model=List[DepartmentResponse])
+@query_budget(4)
+@coalesce(List[DepartmentResponse])
 async def get_departments(
     skip: int = 0,
     limit: int = 100,
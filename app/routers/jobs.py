@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db
+from app.models import User, Job
+from app.schemas import JobCreate, JobResponse, JobStats
+from app.auth import require_role
+from app import jobs
+
+router = APIRouter()
+
+
+def _get_job(db: Session, job_id: int) -> Job:
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Завдання не знайдено")
+    return job
+
+
+@router.get("/stats", response_model=JobStats)
+async def get_job_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """Глибина черги за станами і типами, найстаріше прострочене завдання, розклади"""
+    return jobs.stats(db.connection())
+
+
+@router.get("/", response_model=List[JobResponse])
+async def get_jobs(
+    state: Optional[str] = None,
+    name: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """Останні завдання (невдалі: ?state=failed)"""
+    if state is not None and state not in jobs.STATES:
+        raise HTTPException(status_code=400, detail=f"Невідомий стан завдання: {state}")
+    query = db.query(Job)
+    if state is not None:
+        query = query.filter(Job.state == state)
+    if name is not None:
+        query = query.filter(Job.name == name)
+    return [jobs.describe(job) for job in query.order_by(Job.id.desc()).limit(limit)]
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """Завдання з параметрами, результатом і текстом останньої помилки"""
+    return jobs.describe(_get_job(db, job_id))
+
+
+@router.post("/", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    job_data: JobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """
+    Постановка завдання в чергу
+
+    Із dedup_key повертається наявне завдання з тим самим ключем у черзі.
+    """
+    try:
+        job_id = jobs.enqueue(job_data.name, job_data.payload, job_data.delay_seconds, dedup_key=job_data.dedup_key)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return jobs.describe(_get_job(db, job_id))
+
+
+@router.post("/{job_id}/retry", response_model=JobResponse)
+async def retry_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """Повторна постановка невдалого або скасованого завдання"""
+    _get_job(db, job_id)
+    db.rollback()
+    if not jobs.retry(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Повторити можна лише невдале або скасоване завдання без такого ж у черзі (dedup_key)"
+        )
+    return jobs.describe(_get_job(db, job_id))
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("Адміністратор"))
+):
+    """Скасування завдання, що ще чекає в черзі"""
+    _get_job(db, job_id)
+    db.rollback()
+    if not jobs.cancel(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Скасувати можна лише завдання в черзі"
+        )
+    return jobs.describe(_get_job(db, job_id))
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.database import get_db
+from app.models import User, Role, Patient, user_roles
+from app.schemas import LookupItem
+from app.auth import require_permission
+from app.sql_monitor import query_budget
+from app.lookup import prefix_filter
+
+router = APIRouter()
+
+DOCTOR_ROLE = "Лікар"
+LOOKUP_LIMIT = 20
+LOOKUP_MAX_LIMIT = 50
+
+
+@router.get("/patients", response_model=List[LookupItem])
+@query_budget(4)
+async def lookup_patients(
+    q: str = "",
+    limit: int = Query(LOOKUP_LIMIT, ge=1, le=LOOKUP_MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("patients.read"))
+):
+    """
+    Пацієнти для поля вибору: id і "прізвище ім'я по батькові"
+
+    q - початок ПІБ без урахування регістру (індекс ix_patients_search_name).
+    """
+    rows = db.execute(
+        select(Patient.id, Patient.last_name, Patient.first_name, Patient.middle_name)
+        .where(prefix_filter(Patient.search_name, q), Patient.is_active == True)
+        .order_by(Patient.search_name)
+        .limit(limit)
+    ).all()
+    return [
+        {"id": row.id, "name": " ".join(part.strip() for part in (row.last_name, row.first_name, row.middle_name) if part)}
+        for row in rows
+    ]
+
+
+@router.get("/doctors", response_model=List[LookupItem])
+@query_budget(4)
+async def lookup_doctors(
+    q: str = "",
+    department_id: Optional[int] = None,
+    limit: int = Query(LOOKUP_LIMIT, ge=1, le=LOOKUP_MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("appointments.read"))
+):
+    """
+    Активні лікарі для поля вибору: id і ПІБ
+
+    q - початок ПІБ без урахування регістру; department_id - відділення лікаря.
+    """
+    query = (
+        select(User.id, User.full_name)
+        .join(user_roles, user_roles.c.user_id == User.id)
+        .join(Role, Role.id == user_roles.c.role_id)
+        .where(Role.name == DOCTOR_ROLE, User.is_active == True, prefix_filter(User.search_name, q))
+    )
+    if department_id is not None:
+        query = query.where(User.department_id == department_id)
+    rows = db.execute(query.order_by(User.search_name).limit(limit)).all()
+    return [{"id": row.id, "name": row.full_name} for row in rows]
@@ -6,10 +6,13 @@ from app.database import get_db
 from app.models import User, MedicalRecord, Patient
 from app.schemas import MedicalRecordCreate, MedicalRecordUpdate, MedicalRecordResponse
 from app.auth import get_current_user, require_permission
+from app.sql_monitor import query_budget
+from app import group_commit
 
 router = APIRouter()
 
 @router.get("/", response_model=List[MedicalRecordResponse])
+@query_budget(4)
 async def get_medical_records(
     skip: int = 0,
     limit: int = 100,
@@ -64,19 +67,22 @@ async def create_medical_record(
     current_user: User = Depends(require_permission("medical_records.create"))
 ):
     """Створення медичного запису"""
-    # Перевірка існування пацієнта
-    patient = db.query(Patient).filter(Patient.id == record.patient_id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
-    
-    db_record = MedicalRecord(
-        **record.model_dump(),
-        doctor_id=current_user.id
-    )
-    db.add(db_record)
-    db.commit()
-    db.refresh(db_record)
-    return db_record
+    doctor_id = current_user.id
+
+    def write(session: Session):
+        # Перевірка існування пацієнта
+        patient = session.query(Patient).filter(Patient.id == record.patient_id).first()
+        if not patient:
+            raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
+        
+        db_record = MedicalRecord(
+            **record.model_dump(),
+            doctor_id=doctor_id
+        )
+        session.add(db_record)
+        return db_record
+
+    return await group_commit.run(db, write)
 
 @router.put("/{record_id}", response_model=MedicalRecordResponse)
 async def update_medical_record(
@@ -86,25 +92,28 @@ async def update_medical_record(
     current_user: User = Depends(require_permission("medical_records.update"))
 ):
     """Оновлення медичного запису"""
-    db_record = db.query(MedicalRecord).filter(MedicalRecord.id == record_id).first()
-    if not db_record:
-        raise HTTPException(status_code=404, detail="Запис не знайдено")
-    
-    # Лікар може редагувати тільки свої записи
-    if not current_user.has_role("Адміністратор"):
-        if db_record.doctor_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Ви можете редагувати тільки свої записи"
-            )
-    
+    is_admin = current_user.has_role("Адміністратор")
+    user_id = current_user.id
     update_data = record_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_record, field, value)
-    
-    db.commit()
-    db.refresh(db_record)
-    return db_record
+
+    def write(session: Session):
+        db_record = session.query(MedicalRecord).filter(MedicalRecord.id == record_id).first()
+        if not db_record:
+            raise HTTPException(status_code=404, detail="Запис не знайдено")
+        
+        # Лікар може редагувати тільки свої записи
+        if not is_admin:
+            if db_record.doctor_id != user_id:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Ви можете редагувати тільки свої записи"
+                )
+        
+        for field, value in update_data.items():
+            setattr(db_record, field, value)
+        return db_record
+
+    return await group_commit.run(db, write)
 
 @router.delete("/{record_id}")
 async def delete_medical_record(
@@ -113,17 +122,21 @@ async def delete_medical_record(
     current_user: User = Depends(require_permission("medical_records.delete"))
 ):
     """Видалення медичного запису"""
-    db_record = db.query(MedicalRecord).filter(MedicalRecord.id == record_id).first()
-    if not db_record:
-        raise HTTPException(status_code=404, detail="Запис не знайдено")
-    
-    # Тільки адміністратор може видаляти медичні записи
-    if not current_user.has_role("Адміністратор"):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Недостатньо прав для видалення"
-        )
-    
-    db.delete(db_record)
-    db.commit()
+    is_admin = current_user.has_role("Адміністратор")
+
+    def write(session: Session):
+        db_record = session.query(MedicalRecord).filter(MedicalRecord.id == record_id).first()
+        if not db_record:
+            raise HTTPException(status_code=404, detail="Запис не знайдено")
+        
+        # Тільки адміністратор може видаляти медичні записи
+        if not is_admin:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Недостатньо прав для видалення"
+            )
+        
+        session.delete(db_record)
+
+    await group_commit.run(db, write)
     return {"message": "Медичний запис видалено"}
@@ -1,15 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import String, and_, literal, or_, select, type_coerce, union_all
 from sqlalchemy.orm import Session
+from datetime import datetime
 from typing import List
+import base64
+import json
 
 from app.database import get_db
-from app.models import User, Patient
-from app.schemas import PatientCreate, PatientUpdate, PatientResponse
+from app.models import User, Patient, Appointment, ArchivedAppointment, MedicalRecord
+from app.schemas import PatientCreate, PatientUpdate, PatientResponse, TimelineResponse
 from app.auth import get_current_user, require_permission
+from app.sql_monitor import query_budget
+from app import archive, group_commit
 
 router = APIRouter()
 
+# Хронологія пацієнта
+TIMELINE_PAGE_SIZE = 50
+TIMELINE_MAX_PAGE_SIZE = 200
+TIMELINE_KINDS = ("appointment", "medical_record")
+
+
+def _encode_cursor(timestamp: str, kind: str, item_id: int) -> str:
+    raw = json.dumps([timestamp, kind, item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, kind, item_id = json.loads(raw)
+        if not isinstance(timestamp, str) or kind not in TIMELINE_KINDS or not isinstance(item_id, int):
+            raise ValueError(cursor)
+        return timestamp, kind, item_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некоректний курсор")
+
+
+def _before_cursor(ts_column, id_column, kind: str, cursor):
+    """Умова keyset-пагінації гілки: (ts, kind, id) менше за курсор"""
+    cursor_ts, cursor_kind, cursor_id = cursor
+    if kind < cursor_kind:
+        return ts_column <= cursor_ts
+    if kind > cursor_kind:
+        return ts_column < cursor_ts
+    return or_(ts_column < cursor_ts, and_(ts_column == cursor_ts, id_column < cursor_id))
+
 @router.get("/", response_model=List[PatientResponse])
+@query_budget(4)
 async def get_patients(
     skip: int = 0,
     limit: int = 100,
@@ -46,6 +84,115 @@ async def get_patient(
         raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
     return patient
 
+@router.get("/{patient_id}/timeline", response_model=TimelineResponse)
+@query_budget(9)
+async def get_patient_timeline(
+    patient_id: int,
+    limit: int = Query(TIMELINE_PAGE_SIZE, ge=1, le=TIMELINE_MAX_PAGE_SIZE),
+    cursor: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("patients.read"))
+):
+    """
+    Хронологія пацієнта: записи на прийом і медичні записи одним потоком
+
+    Від новіших до старіших, з курсорною пагінацією (next_cursor). Кожна
+    гілка UNION ALL читає не більше limit + 1 рядків за індексом
+    (patient_id, дата). Розділи без дозволу на читання пропускаються,
+    конфіденційні медичні записи бачать лише адміністратор та автор.
+    """
+    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
+
+    position = _decode_cursor(cursor) if cursor else None
+    arms = []
+
+    if current_user.has_permission("appointments.read"):
+        # Гаряча таблиця і (якщо є) архів - окремі гілки з тим самим kind:
+        # id записів у частинах не перетинаються
+        for model in archive.partitions(db):
+            # Дата й час зберігаються як 'YYYY-MM-DD' і 'HH:MM:SS.ffffff', тож
+            # їх конкатенація впорядковується так само, як visit_date
+            appointment_date = type_coerce(model.appointment_date, String)
+            appointment_ts = appointment_date + " " + type_coerce(model.appointment_time, String)
+            query = select(
+                literal("appointment").label("kind"), model.id.label("id"), appointment_ts.label("ts")
+            ).where(model.patient_id == patient_id)
+            if position:
+                query = query.where(
+                    appointment_date <= position[0][:10],
+                    _before_cursor(appointment_ts, model.id, "appointment", position),
+                )
+            arms.append(query.order_by(
+                model.appointment_date.desc(), model.appointment_time.desc(), model.id.desc()
+            ).limit(limit + 1).subquery())
+
+    if current_user.has_permission("medical_records.read"):
+        visit_ts = type_coerce(MedicalRecord.visit_date, String)
+        query = select(
+            literal("medical_record").label("kind"), MedicalRecord.id.label("id"), visit_ts.label("ts")
+        ).where(MedicalRecord.patient_id == patient_id, MedicalRecord.visit_date.isnot(None))
+        if not current_user.has_role("Адміністратор"):
+            query = query.where(or_(
+                MedicalRecord.is_confidential.isnot(True), MedicalRecord.doctor_id == current_user.id
+            ))
+        if position:
+            query = query.where(_before_cursor(visit_ts, MedicalRecord.id, "medical_record", position))
+        arms.append(query.order_by(
+            MedicalRecord.visit_date.desc(), MedicalRecord.id.desc()
+        ).limit(limit + 1).subquery())
+
+    if not arms:
+        return {"patient": patient, "items": [], "next_cursor": None}
+
+    timeline = union_all(*[select(arm) for arm in arms]).subquery()
+    rows = db.execute(
+        select(timeline)
+        .order_by(timeline.c.ts.desc(), timeline.c.kind.desc(), timeline.c.id.desc())
+        .limit(limit + 1)
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(last.ts, last.kind, last.id)
+    rows = rows[:limit]
+
+    appointment_ids = [row.id for row in rows if row.kind == "appointment"]
+    record_ids = [row.id for row in rows if row.kind == "medical_record"]
+    appointments = {
+        a.id: a for a in db.query(Appointment).filter(Appointment.id.in_(appointment_ids))
+    } if appointment_ids else {}
+    archived_ids = [appointment_id for appointment_id in appointment_ids if appointment_id not in appointments]
+    if archived_ids:
+        appointments.update(
+            (a.id, a) for a in db.query(ArchivedAppointment).filter(ArchivedAppointment.id.in_(archived_ids))
+        )
+    records = {
+        r.id: r for r in db.query(MedicalRecord).filter(MedicalRecord.id.in_(record_ids))
+    } if record_ids else {}
+
+    # Рядок, видалений між запитами, просто пропускається
+    items = []
+    for row in rows:
+        if row.kind == "appointment":
+            appointment = appointments.get(row.id)
+            if appointment is None:
+                continue
+            items.append({
+                "kind": row.kind, "id": row.id, "appointment": appointment,
+                "timestamp": datetime.combine(appointment.appointment_date, appointment.appointment_time),
+            })
+        else:
+            record = records.get(row.id)
+            if record is None:
+                continue
+            items.append({
+                "kind": row.kind, "id": row.id, "medical_record": record,
+                "timestamp": record.visit_date,
+            })
+    return {"patient": patient, "items": items, "next_cursor": next_cursor}
+
 @router.post("/", response_model=PatientResponse, status_code=status.HTTP_201_CREATED)
 async def create_patient(
     patient: PatientCreate,
@@ -53,22 +200,23 @@ async def create_patient(
     current_user: User = Depends(require_permission("patients.create"))
 ):
     """Додавання нового пацієнта"""
-    # Перевірка унікальності страхового номера
-    if patient.insurance_number:
-        existing = db.query(Patient).filter(
-            Patient.insurance_number == patient.insurance_number
-        ).first()
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Пацієнт з таким страховим номером вже існує"
-            )
-    
-    db_patient = Patient(**patient.model_dump())
-    db.add(db_patient)
-    db.commit()
-    db.refresh(db_patient)
-    return db_patient
+    def write(session: Session):
+        # Перевірка унікальності страхового номера
+        if patient.insurance_number:
+            existing = session.query(Patient).filter(
+                Patient.insurance_number == patient.insurance_number
+            ).first()
+            if existing:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Пацієнт з таким страховим номером вже існує"
+                )
+        
+        db_patient = Patient(**patient.model_dump())
+        session.add(db_patient)
+        return db_patient
+
+    return await group_commit.run(db, write)
 
 @router.put("/{patient_id}", response_model=PatientResponse)
 async def update_patient(
@@ -78,17 +226,18 @@ async def update_patient(
     current_user: User = Depends(require_permission("patients.update"))
 ):
     """Оновлення даних пацієнта"""
-    db_patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if not db_patient:
-        raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
-    
     update_data = patient_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_patient, field, value)
-    
-    db.commit()
-    db.refresh(db_patient)
-    return db_patient
+
+    def write(session: Session):
+        db_patient = session.query(Patient).filter(Patient.id == patient_id).first()
+        if not db_patient:
+            raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
+        
+        for field, value in update_data.items():
+            setattr(db_patient, field, value)
+        return db_patient
+
+    return await group_commit.run(db, write)
 
 @router.delete("/{patient_id}")
 async def delete_patient(
@@ -97,11 +246,13 @@ async def delete_patient(
     current_user: User = Depends(require_permission("patients.delete"))
 ):
     """Видалення пацієнта"""
-    db_patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if not db_patient:
-        raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
-    
-    # М'яке видалення - деактивація
-    db_patient.is_active = False
-    db.commit()
+    def write(session: Session):
+        db_patient = session.query(Patient).filter(Patient.id == patient_id).first()
+        if not db_patient:
+            raise HTTPException(status_code=404, detail="Пацієнта не знайдено")
+        
+        # М'яке видалення - деактивація
+        db_patient.is_active = False
+
+    await group_commit.run(db, write)
     return {"message": "Пацієнта деактивовано"}
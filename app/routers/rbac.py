@@ -1,24 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List
 
 from app.database import get_db
 from app.models import User, Role, Permission
 from app.schemas import RoleResponse, RolePermissionsResponse, PermissionResponse
 from app.auth import get_current_user, require_permission
+from app.sql_monitor import query_budget
+from app.invalidation import bus, TOPIC_RBAC
 
 router = APIRouter()
 
+# Стратегія завантаження для RolePermissionsResponse: дозволи всіх ролей
+# підвантажуються одним додатковим запитом
+ROLE_PERMISSIONS_LOAD_OPTIONS = (selectinload(Role.permissions),)
+
 @router.get("/roles", response_model=List[RolePermissionsResponse])
+@query_budget(5)
 async def get_roles(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("rbac.manage"))
 ):
     """Отримання всіх ролей з їх дозволами"""
-    roles = db.query(Role).all()
+    roles = db.query(Role).options(*ROLE_PERMISSIONS_LOAD_OPTIONS).all()
     return roles
 
 @router.get("/permissions", response_model=List[PermissionResponse])
+@query_budget(4)
 async def get_permissions(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("rbac.manage"))
@@ -28,6 +36,7 @@ async def get_permissions(
     return permissions
 
 @router.get("/my-permissions", response_model=List[PermissionResponse])
+@query_budget(3)
 async def get_my_permissions(
     current_user: User = Depends(get_current_user)
 ):
@@ -58,6 +67,7 @@ async def assign_permission_to_role(
     
     if permission not in role.permissions:
         role.permissions.append(permission)
+        bus.bump(db, TOPIC_RBAC)
         db.commit()
     
     return {"message": f"Дозвіл '{permission.name}' додано до ролі '{role.name}'"}
@@ -80,6 +90,7 @@ async def remove_permission_from_role(
     
     if permission in role.permissions:
         role.permissions.remove(permission)
+        bus.bump(db, TOPIC_RBAC)
         db.commit()
     
     return {"message": f"Дозвіл '{permission.name}' видалено з ролі '{role.name}'"}
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List
 
 from app.database import get_db
 from app.models import User, Role
 from app.schemas import UserCreate, UserUpdate, UserResponse
-from app.auth import get_password_hash, get_current_user, require_permission
+from app.auth import get_password_hash_async, get_current_user, require_permission
+from app.sql_monitor import query_budget
+from app.invalidation import bus, TOPIC_RBAC, TOPIC_USERS
 
 router = APIRouter()
 
+# Стратегія завантаження для UserResponse: ролі всіх користувачів сторінки
+# підвантажуються одним додатковим запитом замість запиту на кожен рядок
+USER_LOAD_OPTIONS = (selectinload(User.roles),)
+
 @router.get("/", response_model=List[UserResponse])
+@query_budget(5)
 async def get_users(
     skip: int = 0,
     limit: int = 100,
@@ -17,17 +24,18 @@ async def get_users(
     current_user: User = Depends(require_permission("users.read"))
 ):
     """Отримання списку користувачів"""
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = db.query(User).options(*USER_LOAD_OPTIONS).offset(skip).limit(limit).all()
     return users
 
 @router.get("/{user_id}", response_model=UserResponse)
+@query_budget(5)
 async def get_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("users.read"))
 ):
     """Отримання користувача за ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).options(*USER_LOAD_OPTIONS).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Користувача не знайдено")
     return user
@@ -58,10 +66,12 @@ async def create_user(
         email=user.email,
         full_name=user.full_name,
         phone=user.phone,
-        hashed_password=get_password_hash(user.password)
+        department_id=user.department_id,
+        hashed_password=await get_password_hash_async(user.password)
     )
     
     db.add(db_user)
+    bus.bump(db, TOPIC_USERS)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -82,6 +92,7 @@ async def update_user(
     for field, value in update_data.items():
         setattr(db_user, field, value)
     
+    bus.bump(db, TOPIC_USERS)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -105,6 +116,7 @@ async def delete_user(
         )
     
     db.delete(db_user)
+    bus.bump(db, TOPIC_USERS)
     db.commit()
     return {"message": "Користувача видалено"}
 
@@ -126,6 +138,7 @@ async def assign_role_to_user(
     
     if role not in user.roles:
         user.roles.append(role)
+        bus.bump(db, TOPIC_RBAC)
         db.commit()
     
     return {"message": f"Роль '{role.name}' призначено користувачу '{user.username}'"}
@@ -148,6 +161,7 @@ async def remove_role_from_user(
     
     if role in user.roles:
         user.roles.remove(role)
+        bus.bump(db, TOPIC_RBAC)
         db.commit()
     
     return {"message": f"Роль '{role.name}' видалено у користувача '{user.username}'"}
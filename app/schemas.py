@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, validator
 from datetime import datetime, date, time
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 # ===== AUTH SCHEMAS =====
 class Token(BaseModel):
@@ -20,6 +20,7 @@ class UserBase(BaseModel):
     email: EmailStr
     full_name: str
     phone: Optional[str] = None
+    department_id: Optional[int] = None
 
 class UserCreate(UserBase):
     password: str
@@ -28,6 +29,7 @@ class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     full_name: Optional[str] = None
     phone: Optional[str] = None
+    department_id: Optional[int] = None
     is_active: Optional[bool] = None
 
 class RoleBase(BaseModel):
@@ -199,3 +201,166 @@ class MedicalRecordResponse(MedicalRecordBase):
     
     class Config:
         from_attributes = True
+
+# ===== PATIENT TIMELINE SCHEMAS =====
+class TimelineItem(BaseModel):
+    kind: str  # "appointment" або "medical_record"
+    id: int
+    timestamp: datetime
+    appointment: Optional[AppointmentResponse] = None
+    medical_record: Optional[MedicalRecordResponse] = None
+
+class TimelineResponse(BaseModel):
+    patient: PatientResponse
+    items: List[TimelineItem]
+    next_cursor: Optional[str] = None
+
+# ===== DELTA SYNC SCHEMAS =====
+class ChangeItem(BaseModel):
+    seq: int
+    entity: str  # patient, appointment, medical_record, user
+    id: int
+    op: str  # upsert, soft_delete, delete
+    data: Optional[dict] = None
+
+class ChangesResponse(BaseModel):
+    changes: List[ChangeItem]
+    next_token: str
+    has_more: bool
+
+# ===== BACKUP SCHEMAS =====
+class BackupFile(BaseModel):
+    name: str
+    size: int
+    created_at: datetime
+    sha256: Optional[str] = None
+
+class BackupStatus(BaseModel):
+    state: Optional[str] = None  # running, done, failed
+    file: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    pages_total: Optional[int] = None
+    pages_done: int = 0
+    stalls: int = 0
+    single_pass: bool = False
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    error: Optional[str] = None
+
+class BackupsResponse(BaseModel):
+    status: BackupStatus
+    backups: List[BackupFile]
+
+class BackupVerification(BaseModel):
+    name: str
+    valid: bool
+    sha256: Optional[str] = None
+    schema_version: Optional[int] = None
+    error: Optional[str] = None
+
+# ===== BATCH SCHEMAS =====
+class BatchItem(BaseModel):
+    method: str = "GET"
+    path: str  # відносно /api, напр. /patients?skip=0
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+class BatchItemResult(BaseModel):
+    status: int
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchItemResult]
+
+# ===== LOOKUP SCHEMAS =====
+class LookupItem(BaseModel):
+    id: int
+    name: str
+
+# ===== ANALYTICS SCHEMAS =====
+class LoadStats(BaseModel):
+    appointments: int
+    booked_hours: float
+    available_hours: Optional[float] = None
+    utilization: Optional[float] = None  # частка доступного часу
+    no_show_rate: Optional[float] = None  # неявки / (завершені + неявки)
+    cancellation_rate: Optional[float] = None
+    avg_lead_days: Optional[float] = None  # від створення запису до прийому
+
+class DepartmentUtilization(LoadStats):
+    department_id: int
+    name: str
+    capacity: Optional[int] = None
+
+class TotalUtilization(LoadStats):
+    capacity: int
+
+class UtilizationResponse(BaseModel):
+    date_from: date
+    date_to: date
+    working_days: int
+    departments: List[DepartmentUtilization]
+    total: TotalUtilization
+
+class DoctorWorkload(LoadStats):
+    doctor_id: int
+    name: Optional[str] = None
+    medical_records: int = 0
+
+class MonthlyLoad(LoadStats):
+    month: str  # YYYY-MM
+
+class DailyLoad(LoadStats):
+    date: date
+    medical_records: int = 0
+
+class HeatmapResponse(BaseModel):
+    date_from: date
+    date_to: date
+    department_id: Optional[int] = None
+    doctor_id: Optional[int] = None
+    capacity: Optional[int] = None
+    weekdays: List[str]
+    hours: List[int]
+    occupancy: List[List[float]]  # [день тижня][година]
+
+# ===== JOB SCHEMAS =====
+class JobCreate(BaseModel):
+    name: str
+    payload: dict = {}
+    delay_seconds: float = 0
+    dedup_key: Optional[str] = None
+
+class JobResponse(BaseModel):
+    id: int
+    name: str
+    state: str
+    dedup_key: Optional[str] = None
+    payload: Optional[Any] = None
+    result: Optional[Any] = None
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    locked_by: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class JobTypeInfo(BaseModel):
+    name: str
+    cron: Optional[str] = None
+    max_attempts: int
+    timeout_seconds: float
+    next_run_at: Optional[datetime] = None
+
+class JobStats(BaseModel):
+    states: Dict[str, int]
+    due: int  # у черзі, час виконання настав
+    oldest_due_seconds: Optional[float] = None
+    by_name: List[Dict[str, Any]]
+    types: List[JobTypeInfo]
+    workers: int  # виконавці в цьому процесі
@@ -0,0 +1,214 @@
+"""
+Моніторинг SQL-запитів
+
+Підрахунок і хронометраж SQL-запитів у межах одного HTTP-запиту:
+- заголовок Server-Timing з кількістю запитів, сумарним часом БД
+  та найповільнішим запитом;
+- структурований журнал повільних запитів (SQL без параметрів);
+- детектор N+1: ендпоінти оголошують бюджет запитів через @query_budget.
+
+Пороги налаштовуються змінними середовища:
+- SQL_SLOW_QUERY_MS - поріг повільного SQL-запиту (мс)
+- SQL_SLOW_REQUEST_MS - поріг HTTP-запиту з повільною роботою БД (мс)
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.database import engine
+
+logger = logging.getLogger("app.sql")
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+SLOW_REQUEST_MS = float(os.getenv("SQL_SLOW_REQUEST_MS", "500"))
+
+# Статистика SQL поточного HTTP-запиту (None поза запитом)
+_current_stats = contextvars.ContextVar("sql_stats", default=None)
+
+# Літерали в тексті SQL (рядки та числа) - замінюються на "?" у журналі
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class SQLStats:
+    """Статистика SQL-запитів одного HTTP-запиту"""
+    __slots__ = ("count", "statements", "db_time", "slowest_time", "slowest_sql", "scope")
+
+    def __init__(self, scope=None):
+        self.count = 0
+        self.statements = []
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+        self.scope = scope
+
+    def record(self, statement: str, duration: float):
+        self.db_time += duration
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_sql = statement
+
+    def server_timing(self) -> str:
+        """Значення заголовка Server-Timing"""
+        value = f'db;dur={self.db_time * 1000:.2f};desc="{self.count} queries"'
+        if self.slowest_sql is not None:
+            value += f", db-slowest;dur={self.slowest_time * 1000:.2f}"
+        return value
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запит виконав більше SQL-запитів, ніж оголошено для ендпоінта"""
+
+
+def redact_sql(statement: str) -> str:
+    """SQL для журналу: без літералів і зайвих пробілів"""
+    return " ".join(_SQL_LITERALS.sub("?", statement).split())
+
+
+def route_of(scope) -> str:
+    """Шаблон маршруту запиту (/api/users/{user_id}) або сирий шлях"""
+    if scope is None:
+        return "-"
+    return getattr(scope.get("route"), "path", scope.get("path", "-"))
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.statements.append(statement)
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if duration * 1000 >= SLOW_QUERY_MS:
+        scope = stats.scope if stats is not None else None
+        slow_query_logger.warning(json.dumps({
+            "event": "slow_query",
+            "method": scope["method"] if scope else None,
+            "route": route_of(scope),
+            "duration_ms": round(duration * 1000, 2),
+            "sql": redact_sql(statement),
+        }, ensure_ascii=False))
+
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(context):
+    # Запит завершився помилкою - after_cursor_execute не буде викликано
+    conn = context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+@contextmanager
+def track_queries(scope=None):
+    """Збір статистики SQL у поточному контексті (включно з потоками threadpool)"""
+    stats = SQLStats(scope)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def current_stats():
+    """Статистика SQL поточного HTTP-запиту або None"""
+    return _current_stats.get()
+
+
+@contextmanager
+def assert_max_queries(max_statements: int):
+    """
+    Перевірка кількості SQL-запитів для тестів
+
+    Рахує всі запити до engine, поки блок активний, незалежно від потоку,
+    тож працює і з TestClient, який виконує застосунок в окремому потоці.
+    """
+    stats = SQLStats()
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        stats.count += 1
+        stats.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        yield stats
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    if stats.count > max_statements:
+        raise QueryBudgetExceeded(_format_report(stats, max_statements))
+
+
+def query_budget(max_statements: int):
+    """Декоратор: оголошує максимальну кількість SQL-запитів для ендпоінта"""
+    def decorator(func):
+        func.__query_budget__ = max_statements
+        return func
+    return decorator
+
+
+def _format_report(stats: SQLStats, max_statements: int, label: str = "") -> str:
+    lines = [f"{label}виконано {stats.count} SQL-запитів при бюджеті {max_statements}:"]
+    lines.extend(f"  {i}. {sql.strip()}" for i, sql in enumerate(stats.statements, 1))
+    return "\n".join(lines)
+
+
+class SQLMonitorMiddleware:
+    """
+    Інструментування SQL на рівні HTTP-запиту
+
+    Додає заголовок Server-Timing, журналює запити з повільною роботою БД
+    і перевіряє бюджет SQL-запитів ендпоінта (детектор N+1). У строгому
+    режимі (тести) перевищення бюджету призводить до QueryBudgetExceeded,
+    інакше - до попередження в журналі.
+    """
+
+    def __init__(self, app, strict: bool = False):
+        self.app = app
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(scope) as stats:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        if stats.db_time * 1000 >= SLOW_REQUEST_MS:
+            slow_query_logger.warning(json.dumps({
+                "event": "slow_request",
+                "method": scope["method"],
+                "route": route_of(scope),
+                "queries": stats.count,
+                "db_time_ms": round(stats.db_time * 1000, 2),
+                "slowest_ms": round(stats.slowest_time * 1000, 2),
+                "slowest_sql": redact_sql(stats.slowest_sql or ""),
+            }, ensure_ascii=False))
+
+        budget = getattr(scope.get("endpoint"), "__query_budget__", None)
+        if budget is None or stats.count <= budget:
+            return
+        report = _format_report(stats, budget, f"{scope['method']} {route_of(scope)}: ")
+        if self.strict:
+            raise QueryBudgetExceeded(report)
+        logger.warning(report)
@@ -0,0 +1,186 @@
+"""
+Координація запуску кількох процесів
+
+При `uvicorn --workers N` кожен процес виконує lifespan. Звичайний запуск
+обходиться читанням schema_meta: якщо версії схеми та початкових
+даних збігаються з поточними, жодного DDL і жодного заповнення не
+виконується. Інакше створення схеми, міграції та заповнення RBAC
+виконуються під файловим блокуванням поруч із файлом БД: перший процес
+виконує роботу, решта чекають і бачать оновлені версії.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, select
+
+from app.database import engine, Base, SessionLocal
+from app.models import SchemaMeta, Appointment, ArchivedAppointment, MedicalRecord, Patient, User, user_roles
+from app.rbac import init_rbac_system, add_analytics_permission
+from app import change_log, lookup, daily_stats
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Версія схеми: збільшується з кожною зміною моделей. Нові таблиці створює
+# create_all; нові колонки чи індекси на наявних таблицях потребують
+# міграції в MIGRATIONS
+SCHEMA_VERSION = 11
+# Версія початкових даних: збільшується разом із записом у SEED_MIGRATIONS
+SEED_VERSION = 2
+
+
+def _create_indexes(*tables):
+    """Міграція: індекси, додані до наявних таблиць"""
+    def migrate(connection):
+        for table in tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    return migrate
+
+
+def _add_columns(table, *names):
+    """Міграція: колонки, додані до наявної таблиці"""
+    def migrate(connection):
+        existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+        for name in names:
+            if name not in existing:
+                column = table.c[name]
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(connection.dialect)}"
+                )
+    return migrate
+
+
+def _drop_indexes(*names):
+    """Міграція: індекси, замінені іншими"""
+    def migrate(connection):
+        for name in names:
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    return migrate
+
+
+def _steps(*migrations):
+    """Міграція з кількох кроків"""
+    def migrate(connection):
+        for step in migrations:
+            step(connection)
+    return migrate
+
+
+# Міграції наявних баз: версія -> функція(connection). Мають бути
+# ідемпотентними: база без schema_meta проходить усі міграції
+MIGRATIONS = {
+    2: _create_indexes(Appointment.__table__, MedicalRecord.__table__),
+    4: change_log.backfill,
+    5: _add_columns(MedicalRecord.__table__, "encrypted_payload", "encrypted_dek", "key_id"),
+    6: _create_indexes(Appointment.__table__),
+    7: _steps(
+        _add_columns(Patient.__table__, "search_name"),
+        _add_columns(User.__table__, "department_id", "search_name"),
+        _create_indexes(Patient.__table__, User.__table__, user_roles),
+        lookup.backfill,
+    ),
+    8: _steps(
+        _drop_indexes("ix_appointments_date", "ix_appointments_archive_date"),
+        _create_indexes(Appointment.__table__, ArchivedAppointment.__table__),
+    ),
+    9: daily_stats.rebuild,
+}
+# Доповнення початкових даних: версія -> функція(session)
+SEED_MIGRATIONS = {
+    1: init_rbac_system,
+    2: add_analytics_permission,
+}
+
+
+def _lock_path() -> str:
+    database = engine.url.database
+    if engine.url.get_backend_name() == "sqlite" and database and database != ":memory:":
+        return f"{os.path.abspath(database)}.startup.lock"
+    return os.path.join(tempfile.gettempdir(), "hospital_management.startup.lock")
+
+
+@contextmanager
+def file_lock(path: str):
+    """Ексклюзивне міжпроцесне блокування на файлі (очікує звільнення)"""
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_versions(connection) -> dict:
+    # Нова база або база, створена до появи schema_meta, - версія 0
+    if not inspect(connection).has_table(SchemaMeta.__tablename__):
+        return {}
+    return dict(connection.execute(select(SchemaMeta.key, SchemaMeta.value)).all())
+
+
+def _set_version(connection, key: str, value: int):
+    connection.execute(SchemaMeta.__table__.delete().where(SchemaMeta.key == key))
+    connection.execute(SchemaMeta.__table__.insert().values(key=key, value=value))
+
+
+def mark_current(connection):
+    """
+    Позначка поточних версій для бази, створеної повністю в обхід
+    coordinated_startup (create_all, init_rbac_system і заповнення похідних
+    таблиць, як у generate_load_data.py): перший запуск не повторює міграцій
+    """
+    Base.metadata.create_all(bind=connection)
+    _set_version(connection, "schema_version", SCHEMA_VERSION)
+    _set_version(connection, "seed_version", SEED_VERSION)
+
+
+def _is_current(versions: dict) -> bool:
+    return (versions.get("schema_version", 0) >= SCHEMA_VERSION
+            and versions.get("seed_version", 0) >= SEED_VERSION)
+
+
+def coordinated_startup() -> bool:
+    """
+    Приведення схеми та початкових даних до поточних версій
+
+    Повертає True, якщо була виконана робота (DDL, міграції чи заповнення).
+    """
+    with engine.connect() as connection:
+        if _is_current(_read_versions(connection)):
+            return False
+
+    with file_lock(_lock_path()):
+        with engine.begin() as connection:
+            versions = _read_versions(connection)
+            if _is_current(versions):
+                return False
+
+            schema_version = versions.get("schema_version", 0)
+            if schema_version < SCHEMA_VERSION:
+                Base.metadata.create_all(bind=connection)
+                for version in range(schema_version + 1, SCHEMA_VERSION + 1):
+                    if version in MIGRATIONS:
+                        MIGRATIONS[version](connection)
+                _set_version(connection, "schema_version", SCHEMA_VERSION)
+
+        seed_version = versions.get("seed_version", 0)
+        for version in range(seed_version + 1, SEED_VERSION + 1):
+            if version in SEED_MIGRATIONS:
+                with SessionLocal() as db:
+                    SEED_MIGRATIONS[version](db)
+                    db.commit()
+        with engine.begin() as connection:
+            _set_version(connection, "seed_version", SEED_VERSION)
+    return True
@@ -0,0 +1,164 @@
+"""
+Доставка статичного фронтенду з пам'яті
+
+Файли каталогу static/ читаються один раз при запуску і стискаються
+наперед (gzip і, якщо встановлено пакет brotli, br); відповідь обирає
+найкраще кодування, прийнятне за Accept-Encoding. Кожен файл має адресу
+з хешем вмісту (/static/app.3f2a9c1b7d4e.js) із заголовком immutable -
+браузер не перевіряє її повторно. Посилання в index.html переписуються на
+такі адреси, а сама сторінка віддається з ETag і no-cache: після
+оновлення фронтенду браузер отримує нову сторінку (а з нею нові адреси)
+замість закешованої, інакше - 304 без тіла.
+
+Звичайні адреси (/static/app.js) теж працюють, з ETag і no-cache. Зміни
+файлів на диску стають видимими після перезапуску сервера.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.getenv("STATIC_DIR", "static")
+STATIC_PREFIX = "/static/"
+INDEX_FILE = "index.html"
+HASH_LENGTH = 12
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Менші файли не стискаються: виграш менший за накладні витрати
+MIN_COMPRESS_BYTES = 256
+
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+# Кодування в порядку переваги
+ENCODINGS = ("br", "gzip")
+
+
+@dataclass
+class Asset:
+    """Файл фронтенду: вміст у кожному доступному кодуванні"""
+    name: str
+    content_type: str
+    digest: str
+    bodies: dict  # кодування ("identity", "gzip", "br") -> байти
+
+    @property
+    def hashed_name(self) -> str:
+        stem, extension = os.path.splitext(self.name)
+        return f"{stem}.{self.digest}{extension}"
+
+
+def _compress(content: bytes) -> dict:
+    bodies = {"identity": content}
+    if len(content) < MIN_COMPRESS_BYTES:
+        return bodies
+    compressed = {"gzip": gzip.compress(content, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(content, quality=BROTLI_QUALITY)
+    for encoding, body in compressed.items():
+        if len(body) < len(content):
+            bodies[encoding] = body
+    return bodies
+
+
+def _asset(name: str, content: bytes) -> Asset:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    # Для text/* кодування додає Response
+    if content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    return Asset(
+        name=name,
+        content_type=content_type,
+        digest=hashlib.sha256(content).hexdigest()[:HASH_LENGTH],
+        bodies=_compress(content),
+    )
+
+
+def build(directory: str = STATIC_DIR) -> dict:
+    """Адреса відносно /static/ (звичайна і з хешем) -> (Asset, immutable)"""
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, directory).replace(os.sep, "/")] = f.read()
+
+    assets = {name: _asset(name, content) for name, content in files.items() if name != INDEX_FILE}
+    if INDEX_FILE in files:
+        page = files[INDEX_FILE].decode("utf-8")
+        # Спершу довші імена: /static/app.js не має зачепити /static/app.json
+        for name in sorted(assets, key=len, reverse=True):
+            page = page.replace(f'"{STATIC_PREFIX}{name}"', f'"{STATIC_PREFIX}{assets[name].hashed_name}"')
+        assets[INDEX_FILE] = _asset(INDEX_FILE, page.encode("utf-8"))
+
+    routes = {}
+    for name, asset in assets.items():
+        routes[name] = (asset, False)
+        if name != INDEX_FILE:
+            routes[asset.hashed_name] = (asset, True)
+    return routes
+
+
+_routes: Optional[dict] = None
+
+
+def load():
+    """Читання і стиснення файлів (при запуску; інакше - при першому запиті)"""
+    global _routes
+    _routes = build()
+    return _routes
+
+
+def accepted_encodings(accept_encoding: str) -> dict:
+    """Кодування -> q з заголовка Accept-Encoding"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if token.strip():
+            accepted[token.strip().lower()] = quality
+    return accepted
+
+
+def _encoding(asset: Asset, accept_encoding: str) -> str:
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ENCODINGS:
+        if encoding in asset.bodies and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+def response(name: str, headers) -> Response:
+    """Відповідь з файлом фронтенду name (відносно /static/) або 404"""
+    routes = _routes if _routes is not None else load()
+    if name not in routes:
+        return Response("Файл не знайдено", status_code=404, media_type="text/plain")
+    asset, immutable = routes[name]
+    encoding = _encoding(asset, headers.get("accept-encoding", ""))
+    # Різні кодування - різні представлення: власний ETag для кожного
+    etag = f'"{asset.digest}"' if encoding == "identity" else f'"{asset.digest}-{encoding}"'
+    response_headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_IMMUTABLE if immutable else CACHE_REVALIDATE,
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers=response_headers)
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    return Response(asset.bodies[encoding], media_type=asset.content_type, headers=response_headers)
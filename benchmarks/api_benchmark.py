@@ -0,0 +1,422 @@
+"""
+Наскрізний бенчмарк API з контролем регресій
+
+Застосунок FastAPI викликається в процесі через ASGI-транспорт httpx, без
+мережі. Для кожного розміру даних генерується база (generate_load_data.py),
+після чого в окремому процесі з DATABASE_URL на копію цієї бази
+проганяються сценарії: вхід, списки з фільтрами та пошуком, окремі
+ресурси, хронологія пацієнта, синхронізація змін, довідники, аналітика,
+пакетні запити, запис на прийом, створення медичного запису та зміни RBAC.
+
+Для кожного сценарію вимірюються пропускна здатність, p50/p99 і кількість
+SQL-запитів на HTTP-запит (із заголовка Server-Timing).
+
+За замовчуванням перевіряються лише детерміновані ознаки - статуси
+відповідей і кількість SQL-запитів - відносно базових ліній у
+benchmarks/baselines/ (у git). Запуск завершується з кодом 1, якщо вони
+погіршилися або базової лінії для розміру чи сценарію немає (її записує
+--update-baseline).
+
+Час залежить від машини, тому з --timing p50 і пропускна здатність
+порівнюються з базовою лінією, записаною на цій самій машині
+(benchmarks/.data/, не в git), найкращим з --repeats прогонів.
+
+ВИКОРИСТАННЯ:
+    python -m benchmarks.api_benchmark --sizes small,medium
+    python -m benchmarks.api_benchmark --sizes small --update-baseline
+    python -m benchmarks.api_benchmark --timing --repeats 5 --threshold 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(ROOT_DIR, "benchmarks", "baselines")
+DATA_DIR = os.path.join(ROOT_DIR, "benchmarks", ".data")
+# Майстер-ключ згенерованих наборів (конфіденційні записи в них зашифровані)
+DATA_KEY_FILE = os.path.join(DATA_DIR, "master.key")
+
+# Розміри наборів даних: параметри generate_load_data.generate
+SIZES = {
+    "small": {"patients": 2_000, "appointments": 20_000, "doctors": 30},
+    "medium": {"patients": 20_000, "appointments": 200_000, "doctors": 100},
+    "large": {"patients": 100_000, "appointments": 1_000_000, "doctors": 200},
+}
+SEED = 42
+# Фіксована дата генерації: однакові дані між запусками та машинами
+ANCHOR_DATE = date(2026, 1, 15)
+
+DEFAULT_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.25"))
+# Прогонів для вимірювання часу: береться найкращий результат кожного сценарію
+DEFAULT_REPEATS = int(os.getenv("BENCH_REPEATS", "3"))
+# Детерміновані ознаки сценарію - вміст базових ліній у git
+DETERMINISTIC_FIELDS = ("statuses", "sql_per_request")
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Scenario:
+    """Сценарій: назва, кількість ітерацій і фабрика запиту (method, url, json)"""
+
+    def __init__(self, name, make_request, iterations=None):
+        self.name = name
+        self.make_request = make_request
+        self.iterations = iterations
+
+
+def build_scenarios(ids):
+    """Сценарії для бази з заданими ідентифікаторами"""
+    slot = [0]
+
+    def next_booking():
+        # Кожне бронювання - унікальний слот у далекому майбутньому
+        slot[0] += 1
+        day = ANCHOR_DATE + timedelta(days=365 + slot[0] // 40)
+        minute = (slot[0] % 40) * 15
+        return ("POST", "/api/appointments/", {
+            "patient_id": ids["patient_id"],
+            "doctor_id": ids["doctor_id"],
+            "appointment_date": day.isoformat(),
+            "appointment_time": f"{8 + minute // 60:02d}:{minute % 60:02d}:00",
+            "duration_minutes": 30,
+            "reason": "Бенчмарк",
+        })
+
+    toggle = [False]
+
+    def rbac_mutation():
+        toggle[0] = not toggle[0]
+        method = "POST" if toggle[0] else "DELETE"
+        return (method, f"/api/rbac/roles/{ids['role_id']}/permissions/{ids['permission_id']}", None)
+
+    today = ANCHOR_DATE.isoformat()
+    # Звіти за фіксований період: за замовчуванням аналітика рахує від сьогодні
+    period = f"date_from={(ANCHOR_DATE - timedelta(days=89)).isoformat()}&date_to={today}"
+    return [
+        Scenario("auth.login", lambda: ("POST", "/api/auth/login",
+                                        {"username": "admin", "password": "admin123"}), iterations=20),
+        Scenario("auth.me", lambda: ("GET", "/api/auth/me", None)),
+        Scenario("users.list", lambda: ("GET", "/api/users/", None)),
+        Scenario("users.get", lambda: ("GET", f"/api/users/{ids['doctor_id']}", None)),
+        Scenario("patients.list", lambda: ("GET", "/api/patients/", None)),
+        Scenario("patients.search", lambda: ("GET", "/api/patients/?search=Шевч", None)),
+        Scenario("patients.get", lambda: ("GET", f"/api/patients/{ids['patient_id']}", None)),
+        Scenario("patients.timeline", lambda: ("GET", f"/api/patients/{ids['patient_id']}/timeline", None)),
+        Scenario("appointments.list", lambda: ("GET", "/api/appointments/", None)),
+        Scenario("appointments.by_doctor", lambda: ("GET", f"/api/appointments/?doctor_id={ids['doctor_id']}", None)),
+        Scenario("appointments.by_patient", lambda: ("GET", f"/api/appointments/?patient_id={ids['patient_id']}", None)),
+        Scenario("appointments.today", lambda: ("GET", f"/api/appointments/?appointment_date={today}", None)),
+        Scenario("appointments.by_status", lambda: ("GET", "/api/appointments/?status=scheduled", None)),
+        Scenario("appointments.get", lambda: ("GET", f"/api/appointments/{ids['appointment_id']}", None)),
+        Scenario("appointments.create", next_booking),
+        Scenario("medical_records.list", lambda: ("GET", "/api/medical-records/", None)),
+        Scenario("medical_records.by_patient", lambda: ("GET", f"/api/medical-records/?patient_id={ids['patient_id']}", None)),
+        Scenario("medical_records.get", lambda: ("GET", f"/api/medical-records/{ids['record_id']}", None)),
+        Scenario("medical_records.create", lambda: ("POST", "/api/medical-records/", {
+            "patient_id": ids["patient_id"],
+            "diagnosis": "Z00.0 Загальний медичний огляд",
+            "symptoms": "Скарг немає",
+        })),
+        Scenario("departments.list", lambda: ("GET", "/api/departments/", None)),
+        Scenario("changes.first_page", lambda: ("GET", "/api/changes/?since=0", None)),
+        Scenario("lookup.patients", lambda: ("GET", "/api/lookup/patients?q=Шевч", None)),
+        Scenario("lookup.doctors", lambda: ("GET", "/api/lookup/doctors?q=", None)),
+        Scenario("analytics.utilization", lambda: ("GET", f"/api/analytics/utilization?{period}", None)),
+        Scenario("analytics.doctors", lambda: ("GET", f"/api/analytics/doctors?{period}", None)),
+        Scenario("analytics.daily", lambda: ("GET", f"/api/analytics/daily?{period}", None)),
+        Scenario("batch.reads", lambda: ("POST", "/api/batch/", {"requests": [
+            {"method": "GET", "path": "/departments/"},
+            {"method": "GET", "path": f"/patients/{ids['patient_id']}"},
+            {"method": "GET", "path": f"/appointments/?doctor_id={ids['doctor_id']}"},
+        ]})),
+        Scenario("rbac.roles", lambda: ("GET", "/api/rbac/roles", None)),
+        Scenario("rbac.permissions", lambda: ("GET", "/api/rbac/permissions", None)),
+        Scenario("rbac.mutation", rbac_mutation),
+    ]
+
+
+def _pick_ids():
+    """Ідентифікатори типових сутностей у згенерованій базі"""
+    from sqlalchemy import func
+    from app.database import SessionLocal
+    from app.models import Appointment, MedicalRecord, Permission, Role
+
+    db = SessionLocal()
+    try:
+        # Найзавантаженіший лікар і пацієнт з найдовшою історією - найгірший випадок
+        doctor_id = (db.query(Appointment.doctor_id)
+                     .group_by(Appointment.doctor_id)
+                     .order_by(func.count().desc()).limit(1).scalar())
+        patient_id = (db.query(Appointment.patient_id)
+                      .group_by(Appointment.patient_id)
+                      .order_by(func.count().desc()).limit(1).scalar())
+        record_id = (db.query(MedicalRecord.id)
+                     .filter(MedicalRecord.is_confidential == False)
+                     .order_by(MedicalRecord.id).limit(1).scalar())
+        role_id = db.query(Role.id).filter(Role.name == "Медсестра").scalar()
+        permission_id = db.query(Permission.id).filter(Permission.name == "departments.update").scalar()
+        return {
+            "doctor_id": doctor_id,
+            "patient_id": patient_id,
+            "appointment_id": db.query(func.max(Appointment.id)).scalar() // 2,
+            "record_id": record_id,
+            "role_id": role_id,
+            "permission_id": permission_id,
+        }
+    finally:
+        db.close()
+
+
+async def _run_scenarios(iterations: int, warmup: int):
+    import httpx
+    from app.main import app
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            for scenario in build_scenarios(_pick_ids()):
+                count = scenario.iterations or iterations
+                latencies = []
+                statements = []
+                statuses = set()
+                for i in range(warmup + count):
+                    method, url, body = scenario.make_request()
+                    started = time.perf_counter()
+                    response = await client.request(method, url, json=body, headers=headers)
+                    elapsed = time.perf_counter() - started
+                    if i < warmup:
+                        continue
+                    latencies.append(elapsed)
+                    statuses.add(response.status_code)
+                    match = _SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+                    if match:
+                        statements.append(int(match.group(1)))
+                latencies.sort()
+                results[scenario.name] = {
+                    "iterations": count,
+                    "rps": round(count / sum(latencies), 1),
+                    "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+                    "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+                    "sql_per_request": round(statistics.mean(statements), 2) if statements else None,
+                    "statuses": sorted(statuses),
+                }
+                print(f"  {scenario.name:<28} {results[scenario.name]['rps']:>9} req/s  "
+                      f"p50 {results[scenario.name]['p50_ms']:>8} ms  "
+                      f"p99 {results[scenario.name]['p99_ms']:>8} ms  "
+                      f"SQL {results[scenario.name]['sql_per_request']}", file=sys.stderr)
+    return results
+
+
+def _worker(args):
+    """Режим підпроцесу: DATABASE_URL уже вказує на копію бази"""
+    results = asyncio.run(_run_scenarios(args.iterations, args.warmup))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def _ensure_dataset(size: str) -> str:
+    """
+    Згенерована база для розміру (кешується в benchmarks/.data)
+
+    Задає MASTER_KEY_FILE наборів для цього процесу і процесів прогонів:
+    викликається до першого імпорту app.field_crypto.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.environ["MASTER_KEY_FILE"] = DATA_KEY_FILE
+    from generate_load_data import generate, FORMAT_VERSION
+    from app import field_crypto
+    from app.startup import SCHEMA_VERSION
+
+    if field_crypto.MASTER_KEY_FILE != DATA_KEY_FILE:
+        raise RuntimeError("app.field_crypto імпортовано до вибору ключа наборів даних")
+    if not os.path.exists(DATA_KEY_FILE):
+        # Набори, зашифровані іншим ключем (або ще без шифрування), непридатні
+        for name in os.listdir(DATA_DIR):
+            if name.endswith(".db"):
+                os.remove(os.path.join(DATA_DIR, name))
+        field_crypto.Keyring(DATA_KEY_FILE).create()
+    # Версії схеми і генератора в імені: після їх зміни набір генерується заново
+    path = os.path.join(
+        DATA_DIR, f"{size}-seed{SEED}-{ANCHOR_DATE.isoformat()}-v{SCHEMA_VERSION}-g{FORMAT_VERSION}.db"
+    )
+    if not os.path.exists(path):
+        print(f"🏗  Генерація набору даних '{size}'...", file=sys.stderr)
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        params = SIZES[size]
+        generate(f"sqlite:///{tmp_path}", params["patients"], params["appointments"],
+                 params["doctors"], 0.6, SEED, ANCHOR_DATE, 730, 60, 20_000)
+        os.replace(tmp_path, path)
+    return path
+
+
+def _best_of(runs: list) -> dict:
+    """Найкращий час кожного сценарію з кількох прогонів; статуси - усі, SQL - найбільше"""
+    best = {}
+    for name in runs[0]:
+        samples = [run[name] for run in runs]
+        statements = [sample["sql_per_request"] for sample in samples if sample["sql_per_request"] is not None]
+        best[name] = {
+            "iterations": samples[0]["iterations"],
+            "rps": max(sample["rps"] for sample in samples),
+            "p50_ms": min(sample["p50_ms"] for sample in samples),
+            "p99_ms": min(sample["p99_ms"] for sample in samples),
+            "sql_per_request": max(statements) if statements else None,
+            "statuses": sorted(set().union(*(sample["statuses"] for sample in samples))),
+        }
+    return best
+
+
+def run_size(size: str, iterations: int, warmup: int, repeats: int = 1) -> dict:
+    dataset = _ensure_dataset(size)
+    return _best_of([_run_once(size, dataset, iterations, warmup, repeat, repeats) for repeat in range(repeats)])
+
+
+def _run_once(size: str, dataset: str, iterations: int, warmup: int, repeat: int, repeats: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Кожен прогін - на свіжій копії: мутаційні сценарії не накопичуються
+        db_path = os.path.join(tmp_dir, "bench.db")
+        shutil.copyfile(dataset, db_path)
+        output = os.path.join(tmp_dir, "results.json")
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "SQL_SLOW_QUERY_MS": "1000000",
+            "SQL_SLOW_REQUEST_MS": "1000000",
+            # Один користувач з однієї адреси: відра токенів обмежили б сценарії
+            "RATE_LIMIT_USER_RPS": "0",
+            "RATE_LIMIT_IP_RPS": "0",
+        }
+        print(f"🚀 Розмір '{size}', прогін {repeat + 1}/{repeats}:", file=sys.stderr)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.api_benchmark", "--worker",
+             "--iterations", str(iterations), "--warmup", str(warmup), "--output", output],
+            cwd=ROOT_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def _timing_baseline_path(size: str) -> str:
+    """Базова лінія часу цієї машини (не в git: мілісекунди іншої машини непорівнянні)"""
+    return os.path.join(DATA_DIR, f"timing-{platform.node() or 'local'}-{size}.json")
+
+
+def compare(size: str, results: dict, baseline: dict):
+    """Регресії детермінованих ознак: статуси відповідей і кількість SQL-запитів"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            regressions.append(f"{size}/{name}: немає базової лінії сценарію (--update-baseline)")
+            continue
+        if current["statuses"] != base["statuses"]:
+            regressions.append(f"{size}/{name}: статуси відповіді {base['statuses']} -> {current['statuses']}")
+        if (current["sql_per_request"] is not None and base.get("sql_per_request") is not None
+                and current["sql_per_request"] > base["sql_per_request"]):
+            regressions.append(f"{size}/{name}: SQL-запитів {base['sql_per_request']} -> {current['sql_per_request']}")
+    return regressions
+
+
+def compare_timing(size: str, results: dict, baseline: dict, threshold: float):
+    """Регресії часу відносно базової лінії тієї самої машини"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            regressions.append(f"{size}/{name}: немає базової лінії часу сценарію (--update-baseline)")
+            continue
+        if current["p50_ms"] > base["p50_ms"] * (1 + threshold):
+            regressions.append(f"{size}/{name}: p50 {base['p50_ms']} -> {current['p50_ms']} ms")
+        if current["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{size}/{name}: пропускна здатність {base['rps']} -> {current['rps']} req/s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк API з контролем регресій")
+    parser.add_argument("--sizes", default="small", help=f"Розміри через кому: {', '.join(SIZES)}")
+    parser.add_argument("--iterations", type=int, default=200, help="Ітерацій на сценарій")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timing", action="store_true",
+                        help="Порівнювати також p50 і пропускну здатність з базовою лінією цієї машини")
+    parser.add_argument("--repeats", type=int, default=None,
+                        help=f"Прогонів на розмір, найкращий час (за замовчуванням {DEFAULT_REPEATS} "
+                             "з --timing чи --update-baseline, інакше 1)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Допустиме погіршення p50/пропускної здатності з --timing (частка)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Записати результати як базові лінії (детерміновану і час цієї машини)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        _worker(args)
+        return 0
+
+    repeats = args.repeats or (DEFAULT_REPEATS if args.timing or args.update_baseline else 1)
+    regressions = []
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    for size in args.sizes.split(","):
+        if size not in SIZES:
+            parser.error(f"Невідомий розмір: {size}")
+        baseline_path = os.path.join(BASELINE_DIR, f"{size}.json")
+        timing_path = _timing_baseline_path(size)
+        if not args.update_baseline:
+            # Відсутня лінія не повинна мовчки ставати новою і проходити перевірку
+            missing = [path for path in (baseline_path, timing_path if args.timing else None)
+                       if path is not None and not os.path.exists(path)]
+            if missing:
+                regressions.extend(f"{size}: немає базової лінії {path} (--update-baseline)" for path in missing)
+                continue
+        results = run_size(size, args.iterations, args.warmup, repeats)
+        if args.update_baseline:
+            deterministic = {
+                name: {field: result[field] for field in DETERMINISTIC_FIELDS} for name, result in results.items()
+            }
+            for path, content in ((baseline_path, deterministic), (timing_path, results)):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(content, f, ensure_ascii=False, indent=2)
+                print(f"✓ Базову лінію записано: {path}", file=sys.stderr)
+            continue
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions.extend(compare(size, results, json.load(f)))
+        if args.timing:
+            with open(timing_path, encoding="utf-8") as f:
+                regressions.extend(compare_timing(size, results, json.load(f), args.threshold))
+
+    if regressions:
+        print("\n❌ Виявлено регресії:", file=sys.stderr)
+        for line in regressions:
+            print(f"  - {line}", file=sys.stderr)
+        return 1
+    print("\n✅ Регресій не виявлено", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT_DIR)
+    sys.exit(main())
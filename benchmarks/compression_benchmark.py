@@ -0,0 +1,190 @@
+"""
+Бенчмарк стиснення клінічних текстів медичних записів
+
+На копії згенерованої бази частина медичних записів отримує великі
+лабораторні звіти та нотатки (детерміновано). Далі для кожного формату
+(off, zlib, zstd - якщо встановлено zstandard) копія перекодовується
+міграцією app.compression.reencode і після VACUUM вимірюються:
+
+- розмір файлу БД і кількість сторінок таблиці medical_records;
+- частка таблиці, що вміщається в кеш сторінок SQLite;
+- промахи кешу сторінок на запит списку - сторінки, прочитані з ОС
+  (rchar з /proc/self/io, лише Linux), за фіксованого cache_size;
+- p50/p99 запиту списку (100 записів через ORM, з декодуванням).
+
+ВИКОРИСТАННЯ:
+    python -m benchmarks.compression_benchmark --size small
+    python -m benchmarks.compression_benchmark --size medium --cache-kib 8000
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED = 42
+# Частка медичних записів із великим лабораторним звітом
+LARGE_REPORT_RATIO = 0.4
+LIST_PAGE_SIZE = 100
+
+LAB_TESTS = [
+    ("Гемоглобін", "г/л", 120, 160), ("Еритроцити", "10^12/л", 3.9, 5.5),
+    ("Лейкоцити", "10^9/л", 4.0, 9.0), ("Тромбоцити", "10^9/л", 150, 400),
+    ("ШОЕ", "мм/год", 2, 15), ("Глюкоза", "ммоль/л", 3.3, 5.5),
+    ("Холестерин загальний", "ммоль/л", 3.0, 5.2), ("ЛПНЩ", "ммоль/л", 1.5, 3.0),
+    ("ЛПВЩ", "ммоль/л", 1.0, 2.2), ("Тригліцериди", "ммоль/л", 0.4, 1.7),
+    ("АЛТ", "Од/л", 5, 41), ("АСТ", "Од/л", 5, 40), ("Креатинін", "мкмоль/л", 62, 115),
+    ("Сечовина", "ммоль/л", 2.5, 8.3), ("Білірубін загальний", "мкмоль/л", 3.4, 20.5),
+    ("Калій", "ммоль/л", 3.5, 5.1), ("Натрій", "ммоль/л", 136, 145), ("С-реактивний білок", "мг/л", 0, 5),
+    ("ТТГ", "мМО/л", 0.4, 4.0), ("Феритин", "нг/мл", 30, 400),
+]
+
+
+def _lab_report(rng: random.Random) -> str:
+    lines = [f"Лабораторний звіт № {rng.randrange(10**6, 10**7)}", "Матеріал: венозна кров", ""]
+    for _ in range(rng.randint(3, 8)):
+        lines.append(f"Забір {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025, {rng.randint(7, 11):02d}:{rng.randint(0, 59):02d}")
+        for name, unit, low, high in rng.sample(LAB_TESTS, rng.randint(10, len(LAB_TESTS))):
+            value = round(rng.uniform(low * 0.7, high * 1.3), 1)
+            flag = "↑" if value > high else "↓" if value < low else ""
+            lines.append(f"  {name:<24} {value:>8} {unit:<10} (норма {low}-{high}) {flag}")
+        lines.append("")
+    lines.append("Висновок: результати оцінювати в комплексі з клінічними даними.")
+    return "\n".join(lines)
+
+
+def _inflate(path: str):
+    """Великі звіти й нотатки для частини медичних записів (звичайним текстом)"""
+    import sqlite3
+
+    rng = random.Random(SEED)
+    connection = sqlite3.connect(path)
+    ids = [row[0] for row in connection.execute("SELECT id FROM medical_records ORDER BY id")]
+    updates = []
+    for record_id in ids:
+        if rng.random() < LARGE_REPORT_RATIO:
+            notes = " ".join(rng.choice(["Стан стабільний.", "Скарг не висуває.", "Рекомендовано контроль через місяць.",
+                                         "Дієта з обмеженням солі.", "Продовжити прийом препаратів."])
+                             for _ in range(rng.randint(20, 80)))
+            updates.append((_lab_report(rng), notes, record_id))
+    connection.executemany("UPDATE medical_records SET lab_results = ?, notes = ? WHERE id = ?", updates)
+    connection.commit()
+    connection.execute("VACUUM")
+    connection.close()
+    return len(ids), len(updates)
+
+
+def _read_chars():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def measure(path: str, cache_kib: int, queries: int) -> dict:
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from app.models import MedicalRecord
+
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def set_cache_size(dbapi_connection, connection_record):
+        dbapi_connection.execute(f"PRAGMA cache_size = -{cache_kib}")
+
+    with engine.connect() as connection:
+        page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+        table_pages = connection.exec_driver_sql(
+            "SELECT count(*) FROM dbstat WHERE name = 'medical_records'"
+        ).scalar()
+        total = connection.exec_driver_sql("SELECT count(*) FROM medical_records").scalar()
+
+    rng = random.Random(SEED)
+    offsets = [rng.randrange(max(1, total - LIST_PAGE_SIZE)) for _ in range(queries)]
+    session = sessionmaker(bind=engine)()
+    # Прогрів: кеш у стаціонарному стані
+    for offset in offsets[: queries // 4]:
+        session.query(MedicalRecord).order_by(MedicalRecord.id).offset(offset).limit(LIST_PAGE_SIZE).all()
+        session.expunge_all()
+
+    timings = []
+    chars_before = _read_chars()
+    for offset in offsets:
+        started = time.perf_counter()
+        session.query(MedicalRecord).order_by(MedicalRecord.id).offset(offset).limit(LIST_PAGE_SIZE).all()
+        timings.append((time.perf_counter() - started) * 1000)
+        session.expunge_all()
+    chars_after = _read_chars()
+    session.close()
+    engine.dispose()
+
+    timings.sort()
+    cache_pages = cache_kib * 1024 // page_size
+    misses = None
+    if chars_before is not None and chars_after is not None:
+        misses = round((chars_after - chars_before) / page_size / queries, 1)
+    return {
+        "file_mb": round(os.path.getsize(path) / 1e6, 2),
+        "table_pages": table_pages,
+        "cache_coverage": round(min(1.0, cache_pages / table_pages), 3),
+        "misses_per_query": misses,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p99_ms": round(timings[min(len(timings) - 1, int(0.99 * len(timings)))], 2),
+    }
+
+
+def main(argv=None):
+    from benchmarks.api_benchmark import SIZES, _ensure_dataset
+    from app import compression
+
+    parser = argparse.ArgumentParser(description="Бенчмарк стиснення клінічних текстів")
+    parser.add_argument("--size", default="small", choices=list(SIZES))
+    parser.add_argument("--cache-kib", type=int, default=2000, help="Кеш сторінок SQLite (як cache_size=-N)")
+    parser.add_argument("--queries", type=int, default=400)
+    args = parser.parse_args(argv)
+
+    algorithms = ["off", "zlib"] + (["zstd"] if compression.zstandard is not None else [])
+    dataset = _ensure_dataset(args.size)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base = os.path.join(tmp_dir, "inflated.db")
+        shutil.copyfile(dataset, base)
+        total, inflated = _inflate(base)
+        print(f"📄 Медичних записів: {total}, з великим звітом: {inflated}", file=sys.stderr)
+
+        from sqlalchemy import create_engine
+        from app.models import MedicalRecord
+
+        for algorithm in algorithms:
+            path = os.path.join(tmp_dir, f"{algorithm}.db")
+            shutil.copyfile(base, path)
+            engine = create_engine(f"sqlite:///{path}")
+            started = time.perf_counter()
+            compression.reencode(engine, MedicalRecord.__table__, algorithm, batch_size=2000, pause=0)
+            reencode_seconds = time.perf_counter() - started
+            with engine.connect() as connection:
+                connection.exec_driver_sql("VACUUM")
+            engine.dispose()
+            results[algorithm] = measure(path, args.cache_kib, args.queries)
+            results[algorithm]["reencode_s"] = round(reencode_seconds, 2)
+
+    print(f"\n{'формат':<8}{'файл МБ':>10}{'сторінок':>10}{'у кеші':>9}{'промахів/запит':>16}"
+          f"{'p50 мс':>9}{'p99 мс':>9}{'міграція с':>12}")
+    for algorithm, row in results.items():
+        print(f"{algorithm:<8}{row['file_mb']:>10}{row['table_pages']:>10}{row['cache_coverage']:>9.1%}"
+              f"{str(row['misses_per_query']):>16}{row['p50_ms']:>9}{row['p99_ms']:>9}{row['reencode_s']:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT_DIR)
+    sys.exit(main())
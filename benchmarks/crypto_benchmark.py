@@ -0,0 +1,130 @@
+"""
+Бенчмарк шифрування конфіденційних медичних записів
+
+Вимірює вартість розшифрування для списку медичних записів (як у
+GET /api/medical-records: 100 записів через ORM + серіалізація
+MedicalRecordResponse) на копіях згенерованої бази:
+
+- plain        - шифрування знято (конфіденційні записи відкритим текстом);
+- confidential - набір генератора: зашифровані конфіденційні записи (~5%);
+- all          - зашифровані всі записи (найгірший випадок);
+- all-cold     - те саме з порожнім кешем DEK перед кожним запитом.
+
+Для кожного варіанта береться найкращий із --rounds прогонів (шум
+планувальника на коротких вимірах перевищує різницю між варіантами).
+
+ВИКОРИСТАННЯ:
+    python -m benchmarks.crypto_benchmark --size small
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED = 42
+LIST_PAGE_SIZE = 100
+
+
+def _prepare(path: str, mode: str):
+    import sqlite3
+    from sqlalchemy import create_engine
+    from app import field_crypto
+
+    if mode == "all":
+        connection = sqlite3.connect(path)
+        connection.execute("UPDATE medical_records SET is_confidential = 1")
+        connection.commit()
+        connection.close()
+    if mode != "confidential":
+        engine = create_engine(f"sqlite:///{path}")
+        field_crypto.process_records(engine, "decrypt" if mode == "plain" else "migrate", batch_size=2000, pause=0)
+        engine.dispose()
+
+
+def measure(path: str, queries: int, cold: bool = False) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import field_crypto
+    from app.models import MedicalRecord
+    from app.schemas import MedicalRecordResponse
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as connection:
+        total = connection.exec_driver_sql("SELECT count(*) FROM medical_records").scalar()
+    rng = random.Random(SEED)
+    offsets = [rng.randrange(max(1, total - LIST_PAGE_SIZE)) for _ in range(queries)]
+    session = sessionmaker(bind=engine)()
+
+    def run(offset):
+        if cold:
+            field_crypto._dek_cache.clear()
+        records = session.query(MedicalRecord).order_by(MedicalRecord.id).offset(offset).limit(LIST_PAGE_SIZE).all()
+        [MedicalRecordResponse.model_validate(record) for record in records]
+        session.expunge_all()
+
+    for offset in offsets[: queries // 4]:
+        run(offset)
+    stats = field_crypto.dek_cache_stats
+    hits, misses = stats.hits, stats.misses
+    timings = []
+    started_all = time.perf_counter()
+    for offset in offsets:
+        started = time.perf_counter()
+        run(offset)
+        timings.append((time.perf_counter() - started) * 1000)
+    elapsed = time.perf_counter() - started_all
+    session.close()
+    engine.dispose()
+
+    timings.sort()
+    lookups = (stats.hits - hits) + (stats.misses - misses)
+    return {
+        "rps": round(queries / elapsed, 1),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p99_ms": round(timings[min(len(timings) - 1, int(0.99 * len(timings)))], 2),
+        "dek_hit_rate": round((stats.hits - hits) / lookups, 3) if lookups else None,
+    }
+
+
+def main(argv=None):
+    from benchmarks.api_benchmark import SIZES, _ensure_dataset
+
+    parser = argparse.ArgumentParser(description="Бенчмарк шифрування медичних записів")
+    parser.add_argument("--size", default="small", choices=list(SIZES))
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    dataset = _ensure_dataset(args.size)
+    results = {}
+
+    def best(path, cold=False):
+        return max((measure(path, args.queries, cold) for _ in range(args.rounds)), key=lambda row: row["rps"])
+
+    # Ключ наборів даних (benchmarks/.data), а не робочий
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ("plain", "confidential", "all"):
+            path = os.path.join(tmp_dir, f"{mode}.db")
+            shutil.copyfile(dataset, path)
+            _prepare(path, mode)
+            results[mode] = best(path)
+        results["all-cold"] = best(os.path.join(tmp_dir, "all.db"), cold=True)
+
+    base = results["plain"]["rps"]
+    print(f"\n{'варіант':<14}{'списків/с':>11}{'p50 мс':>9}{'p99 мс':>9}{'втрата':>9}{'кеш DEK':>9}")
+    for mode, row in results.items():
+        loss = 1 - row["rps"] / base
+        hit_rate = "-" if row["dek_hit_rate"] is None else f"{row['dek_hit_rate']:.0%}"
+        print(f"{mode:<14}{row['rps']:>11}{row['p50_ms']:>9}{row['p99_ms']:>9}{loss:>9.1%}{hit_rate:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT_DIR)
+    sys.exit(main())
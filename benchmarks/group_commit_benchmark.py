@@ -0,0 +1,241 @@
+"""
+Бенчмарк групового коміту записів
+
+Порівнює пропускну здатність записів у двох режимах:
+
+- commit - кожен запит комітить сам (за замовчуванням);
+- group  - груповий коміт (GROUP_COMMIT=1, app/group_commit.py)
+
+на двох рівнях:
+
+- api     - POST /api/appointments/ через ASGI-транспорт httpx, як у
+            api_benchmark (разом з автентифікацією, перевірками, подіями SSE);
+- session - лише шлях коміту: group_commit.run з одиницею, що додає
+            пацієнта, на сесії кожного "запиту".
+
+Для кожного режиму і рівня одночасності (--concurrency) прогін
+виконується в окремому процесі на свіжій копії бази в каталозі --dir:
+виграш групового коміту залежить від затримки fsync носія, тож
+вимірювати варто на диску, де працюватиме база. Затримка fsync каталогу
+вимірюється і друкується разом з результатами.
+
+ВИКОРИСТАННЯ:
+    python -m benchmarks.group_commit_benchmark --size small
+    python -m benchmarks.group_commit_benchmark --layers session --concurrency 1,16,64 --dir /var/lib/hospital
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ("commit", "group")
+FSYNC_SAMPLES = 50
+
+
+def fsync_latency_ms(directory: str) -> float:
+    """Середня затримка запису 4 КБ з fsync у каталозі"""
+    path = os.path.join(directory, "fsync-probe")
+    try:
+        with open(path, "wb") as f:
+            started = time.perf_counter()
+            for _ in range(FSYNC_SAMPLES):
+                f.write(b"\0" * 4096)
+                f.flush()
+                os.fsync(f.fileno())
+            return (time.perf_counter() - started) / FSYNC_SAMPLES * 1000
+    finally:
+        os.remove(path)
+
+
+async def _run_writes(requests: int, concurrency: int) -> dict:
+    import httpx
+    from app.main import app
+    from app.group_commit import writer
+    from benchmarks.api_benchmark import ANCHOR_DATE, _percentile, _pick_ids
+
+    async with app.router.lifespan_context(app):
+        ids = _pick_ids()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            def booking(i):
+                # Кожне бронювання - унікальний слот у далекому майбутньому
+                day = ANCHOR_DATE + timedelta(days=730 + i // 40)
+                minute = (i % 40) * 15
+                return {
+                    "patient_id": ids["patient_id"],
+                    "doctor_id": ids["doctor_id"],
+                    "appointment_date": day.isoformat(),
+                    "appointment_time": f"{8 + minute // 60:02d}:{minute % 60:02d}:00",
+                    "duration_minutes": 30,
+                    "reason": "Бенчмарк",
+                }
+
+            latencies = []
+            statuses = set()
+            pending = iter(range(requests))
+
+            async def client_loop():
+                for i in pending:
+                    started = time.perf_counter()
+                    response = await client.post("/api/appointments/", json=booking(i), headers=headers)
+                    latencies.append(time.perf_counter() - started)
+                    statuses.add(response.status_code)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    committed = writer.units["committed"]
+    return {
+        "writes_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "units_per_commit": round(committed / writer.batches, 1) if writer.batches else 1.0,
+        "statuses": sorted(statuses),
+    }
+
+
+async def _run_session_writes(requests: int, concurrency: int) -> dict:
+    from app import group_commit
+    from app.database import SessionLocal
+    from app.models import Patient
+    from benchmarks.api_benchmark import ANCHOR_DATE, _percentile
+
+    if group_commit.ENABLED:
+        group_commit.writer.start()
+    latencies = []
+    pending = iter(range(requests))
+
+    async def client_loop():
+        for i in pending:
+            def write(session, i=i):
+                session.add(Patient(
+                    first_name="Бенчмарк", last_name="Груповий", birth_date=ANCHOR_DATE, phone=f"+38{i:010d}",
+                ))
+
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                await group_commit.run(db, write)
+            finally:
+                db.close()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    group_commit.writer.stop()
+
+    latencies.sort()
+    writer = group_commit.writer
+    return {
+        "writes_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "units_per_commit": round(writer.units["committed"] / writer.batches, 1) if writer.batches else 1.0,
+        "statuses": [],
+    }
+
+
+LAYERS = {"api": _run_writes, "session": _run_session_writes}
+
+
+def _worker(args):
+    """Режим підпроцесу: DATABASE_URL і GROUP_COMMIT уже задані"""
+    results = asyncio.run(LAYERS[args.layer](args.requests, args.worker_concurrency))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+
+def run_mode(dataset: str, directory: str, layer: str, mode: str, requests: int, concurrency: int) -> dict:
+    db_path = os.path.join(directory, "group-commit-bench.db")
+    output = os.path.join(directory, "group-commit-bench.json")
+    shutil.copyfile(dataset, db_path)
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "GROUP_COMMIT": "1" if mode == "group" else "0",
+        "SQL_SLOW_QUERY_MS": "1000000",
+        "SQL_SLOW_REQUEST_MS": "1000000",
+        "RATE_LIMIT_USER_RPS": "0",
+        "RATE_LIMIT_IP_RPS": "0",
+    }
+    try:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.group_commit_benchmark", "--worker", "--layers", layer,
+             "--requests", str(requests), "--worker-concurrency", str(concurrency), "--output", output],
+            cwd=ROOT_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        for path in (db_path, output, f"{db_path}-journal", f"{db_path}-wal", f"{db_path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def main(argv=None):
+    from benchmarks.api_benchmark import SIZES
+
+    parser = argparse.ArgumentParser(description="Бенчмарк групового коміту записів")
+    parser.add_argument("--size", default="small", choices=list(SIZES))
+    parser.add_argument("--layers", default="api,session", help=f"Рівні через кому: {', '.join(LAYERS)}")
+    parser.add_argument("--requests", type=int, default=400, help="Записів на прогін")
+    parser.add_argument("--concurrency", default="1,8,32", help="Рівні одночасності через кому")
+    parser.add_argument("--dir", help="Каталог для копій бази (за замовчуванням - тимчасовий)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-concurrency", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        args.layer = args.layers
+        _worker(args)
+        return 0
+
+    from benchmarks.api_benchmark import _ensure_dataset
+
+    layers = args.layers.split(",")
+    for layer in layers:
+        if layer not in LAYERS:
+            parser.error(f"Невідомий рівень: {layer}")
+    dataset = _ensure_dataset(args.size)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        print(f"fsync у {args.dir or directory}: {fsync_latency_ms(directory):.2f} мс", file=sys.stderr)
+        rows = []
+        for layer in layers:
+            for concurrency in levels:
+                results = {mode: run_mode(dataset, directory, layer, mode, args.requests, concurrency) for mode in MODES}
+                rows.append((layer, concurrency, results))
+                print(f"  {layer}, одночасність {concurrency}: готово", file=sys.stderr)
+
+    print(f"\n{'рівень':<9}{'одночасн.':<11}{'режим':<8}{'записів/с':>11}{'p50 мс':>9}{'p99 мс':>9}{'на коміт':>10}")
+    for layer, concurrency, results in rows:
+        for mode in MODES:
+            row = results[mode]
+            if row["statuses"] and row["statuses"] != [201]:
+                print(f"⚠️  {layer}/{mode}: статуси відповідей {row['statuses']}", file=sys.stderr)
+            print(f"{layer:<9}{concurrency:<11}{mode:<8}{row['writes_per_second']:>11}{row['p50_ms']:>9}"
+                  f"{row['p99_ms']:>9}{row['units_per_commit']:>10}")
+        speedup = results["group"]["writes_per_second"] / results["commit"]["writes_per_second"]
+        print(f"{'':<20}{'group/commit':<19}{speedup:>9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT_DIR)
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Перевірка N+1: кількість SQL-запитів не залежить від розміру сторінки
+
+Списки GET /api/users і GET /api/rbac/roles викликаються на свіжій базі
+двічі: з малою сторінкою і після додавання користувачів і ролей з
+дозволами - з великою. Кожен виклик виконується в
+sql_monitor.assert_max_queries з бюджетом ендпоінта (@query_budget), а
+кількість запитів в обох викликах має збігатися: лінива підвантажка
+зв'язків на кожен рядок дала б різницю.
+
+ВИКОРИСТАННЯ:
+    python -m benchmarks.query_count_check
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+SMALL_PAGE = 2
+LARGE_PAGE = 30
+EXTRA_ROLES = 10
+
+
+def _budget(app, path: str) -> int:
+    """Бюджет SQL-запитів GET-ендпоінта (@query_budget)"""
+    for route in app.routes:
+        if getattr(route, "path", None) == path and "GET" in route.methods:
+            return route.endpoint.__query_budget__
+    raise LookupError(path)
+
+
+def _add_rows():
+    """Користувачі з ролями і ролі з дозволами для великої сторінки"""
+    from app.auth import get_password_hash
+    from app.database import SessionLocal
+    from app.models import Permission, Role, User
+
+    db = SessionLocal()
+    try:
+        permissions = db.query(Permission).all()
+        roles = db.query(Role).all()
+        for i in range(EXTRA_ROLES):
+            roles.append(Role(name=f"Перевірка {i}", permissions=permissions[i::EXTRA_ROLES]))
+        hashed_password = get_password_hash("check123")
+        for i in range(LARGE_PAGE):
+            db.add(User(
+                username=f"check{i}", email=f"check{i}@hospital.ua", hashed_password=hashed_password,
+                full_name=f"Перевірка Користувач {i}", roles=roles[i % len(roles):][:2],
+            ))
+        db.add_all(roles)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _check() -> list:
+    import httpx
+    from app.main import app
+    from app.sql_monitor import assert_max_queries, QueryBudgetExceeded
+
+    checks = (
+        ("/api/users/", "/api/users/?limit={page}"),
+        ("/api/rbac/roles", "/api/rbac/roles"),
+    )
+    counts = {route: [] for route, _ in checks}
+    failures = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+            response = await client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            for page in (SMALL_PAGE, LARGE_PAGE):
+                if page == LARGE_PAGE:
+                    _add_rows()
+                for route, template in checks:
+                    url = template.format(page=page)
+                    # Перший виклик прогріває кеші автентифікації та RBAC
+                    (await client.get(url, headers=headers)).raise_for_status()
+                    try:
+                        with assert_max_queries(_budget(app, route)) as stats:
+                            response = await client.get(url, headers=headers)
+                    except QueryBudgetExceeded as exc:
+                        failures.append(f"{url}: {exc}")
+                        continue
+                    response.raise_for_status()
+                    counts[route].append((len(response.json()), stats.count))
+                    print(f"  {url:<28} рядків {len(response.json()):>3}  SQL {stats.count}", file=sys.stderr)
+
+    for route, measured in counts.items():
+        if len(measured) == 2 and measured[0][1] != measured[1][1]:
+            failures.append(f"{route}: SQL-запитів {measured[0][1]} для {measured[0][0]} рядків, "
+                            f"{measured[1][1]} для {measured[1][0]} рядків")
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # До першого імпорту app: engine і ключі створюються при імпорті
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'check.db')}"
+        os.environ["MASTER_KEY_FILE"] = os.path.join(tmp_dir, "master.key")
+        os.environ["JOBS_WORKERS"] = "0"
+        os.environ["RATE_LIMIT_USER_RPS"] = "0"
+        os.environ["RATE_LIMIT_IP_RPS"] = "0"
+        failures = asyncio.run(_check())
+
+    if failures:
+        print("\n❌ Кількість SQL-запитів залежить від розміру сторінки:", file=sys.stderr)
+        for failure in failures:
+            print(f"  - {failure}", file=sys.stderr)
+        return 1
+    print("\n✅ Кількість SQL-запитів не залежить від розміру сторінки", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,499 @@
+"""
+Генератор великих обсягів синтетичних даних для навантажувального тестування
+
+Заповнює схему з app/models.py відділеннями, лікарями, пацієнтами, записами
+на прийом і медичними записами. Результат детермінований: однакові --seed
+та --anchor-date (за замовчуванням - фіксована дата) дають однакову базу.
+
+Генератор пише лише в порожню базу (за замовчуванням ./load.db, а не робочу
+базу застосунку) і вимикає для неї синхронізацію з диском: збій посеред
+завантаження може пошкодити файл. Конфіденційні медичні записи (~5%)
+шифруються після завантаження ключем з MASTER_KEY_FILE - той самий файл
+потрібен застосунку, що працюватиме з базою.
+
+Дані вставляються пакетами через SQLAlchemy Core у великих транзакціях,
+тож 1 млн записів на прийом завантажується за десятки секунд.
+
+ВИКОРИСТАННЯ:
+    python generate_load_data.py --patients 100000 --appointments 1000000
+    python generate_load_data.py --db-url sqlite:///./load-7.db --seed 7
+"""
+import argparse
+import itertools
+import random
+import sys
+import time as timer
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import bindparam, create_engine, event, insert, inspect, select, func
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import (
+    User, Role, Patient, Department, Appointment, MedicalRecord, user_roles
+)
+from app.rbac import init_rbac_system
+from app.startup import mark_current
+from app.auth import get_password_hash
+from app.lookup import normalize_name
+from app import change_log, daily_stats, field_crypto
+
+DEFAULT_DB_URL = "sqlite:///./load.db"
+# Версія вмісту згенерованих баз: збільшується, коли генератор пише інші
+# дані для тих самих параметрів (кешовані набори бенчмарків стають застарілими)
+FORMAT_VERSION = 2
+# Фіксована дата "сьогодні": той самий --seed дає ту саму базу в будь-який день
+DEFAULT_ANCHOR_DATE = date(2026, 1, 15)
+
+# ===== СЛОВНИКИ =====
+MALE_FIRST_NAMES = [
+    "Олександр", "Андрій", "Іван", "Максим", "Дмитро", "Сергій", "Володимир",
+    "Михайло", "Богдан", "Тарас", "Юрій", "Олег", "Василь", "Петро", "Микола",
+    "Артем", "Назар", "Ярослав", "Роман", "Віталій", "Євген", "Степан", "Остап",
+]
+FEMALE_FIRST_NAMES = [
+    "Олена", "Марія", "Анна", "Оксана", "Наталія", "Ірина", "Тетяна", "Юлія",
+    "Світлана", "Катерина", "Вікторія", "Ольга", "Людмила", "Софія", "Дарина",
+    "Христина", "Галина", "Лариса", "Надія", "Соломія", "Зоряна", "Мирослава",
+]
+# Прізвища без родової форми
+NEUTRAL_LAST_NAMES = [
+    "Шевченко", "Коваленко", "Бондаренко", "Ткаченко", "Кравченко", "Олійник",
+    "Шевчук", "Поліщук", "Бойко", "Мельник", "Коваль", "Лисенко", "Марченко",
+    "Руденко", "Савченко", "Петренко", "Мороз", "Павленко", "Кравчук", "Гончаренко",
+    "Клименко", "Левченко", "Карпенко", "Сидоренко", "Романюк", "Гнатюк", "Ковальчук",
+]
+# Прізвища з родовою формою: (чоловіча, жіноча)
+GENDERED_LAST_NAMES = [
+    ("Ковальський", "Ковальська"), ("Вишневський", "Вишневська"),
+    ("Левицький", "Левицька"), ("Грушевський", "Грушевська"),
+    ("Білецький", "Білецька"), ("Кривонос", "Кривонос"),
+]
+# По батькові: (чоловіче, жіноче) від імені батька
+PATRONYMICS = [
+    ("Олександрович", "Олександрівна"), ("Андрійович", "Андріївна"),
+    ("Іванович", "Іванівна"), ("Петрович", "Петрівна"), ("Миколайович", "Миколаївна"),
+    ("Васильович", "Василівна"), ("Сергійович", "Сергіївна"),
+    ("Володимирович", "Володимирівна"), ("Михайлович", "Михайлівна"),
+    ("Юрійович", "Юріївна"), ("Богданович", "Богданівна"), ("Степанович", "Степанівна"),
+]
+CITIES = ["Київ", "Львів", "Харків", "Одеса", "Дніпро", "Вінниця", "Полтава", "Чернігів"]
+STREETS = ["Хрещатик", "Шевченка", "Франка", "Лесі Українки", "Грушевського", "Соборна", "Незалежності"]
+BLOOD_TYPES = ["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"]
+BLOOD_TYPE_WEIGHTS = [37, 36, 14, 5, 3, 3, 1, 1]
+ALLERGIES = [None] * 8 + ["Пеніцилін", "Аспірин", "Пилок рослин", "Лактоза", "Горіхи"]
+CHRONIC = [None] * 7 + ["Гіпертонія", "Цукровий діабет 2 типу", "Бронхіальна астма", "Гастрит"]
+
+DEPARTMENTS = [
+    ("Кардіологія", "Відділення серцево-судинних захворювань", 15),
+    ("Неврологія", "Відділення нервових захворювань", 12),
+    ("Педіатрія", "Дитяче відділення", 20),
+    ("Хірургія", "Хірургічне відділення", 10),
+    ("Терапія", "Терапевтичне відділення", 25),
+    ("Ендокринологія", "Відділення ендокринних захворювань", 8),
+    ("Офтальмологія", "Відділення хвороб очей", 8),
+    ("Отоларингологія", "ЛОР-відділення", 8),
+    ("Травматологія", "Відділення травматології та ортопедії", 12),
+    ("Гінекологія", "Гінекологічне відділення", 10),
+    ("Урологія", "Урологічне відділення", 8),
+    ("Дерматологія", "Відділення шкірних захворювань", 6),
+]
+# Відносне навантаження відділень (терапія і педіатрія - найзавантаженіші)
+DEPARTMENT_WEIGHTS = [10, 6, 14, 5, 20, 4, 4, 4, 7, 6, 3, 3]
+
+REASONS = [
+    "Планова консультація", "Біль у грудях", "Головний біль", "Підвищений тиск",
+    "Повторний огляд", "Результати аналізів", "Біль у спині", "Кашель, температура",
+    "Профілактичний огляд", "Направлення на госпіталізацію",
+]
+DIAGNOSES = [
+    ("J06.9 Гостра інфекція верхніх дихальних шляхів", "Кашель, нежить, субфебрильна температура",
+     "Рясне пиття, симптоматична терапія", "Парацетамол 500 мг при t > 38.5"),
+    ("I10 Есенціальна гіпертензія", "Головний біль, запаморочення",
+     "Корекція способу життя, антигіпертензивна терапія", "Лізиноприл 10 мг 1 р/д"),
+    ("E11.9 Цукровий діабет 2 типу", "Спрага, поліурія, втома",
+     "Дієта, контроль глікемії", "Метформін 850 мг 2 р/д"),
+    ("M54.5 Біль у попереку", "Біль у поперековому відділі при рухах",
+     "ЛФК, фізіотерапія", "Ібупрофен 400 мг 3 р/д 5 днів"),
+    ("K29.7 Гастрит", "Біль в епігастрії, печія",
+     "Дієта №1, інгібітори протонної помпи", "Омепразол 20 мг 2 р/д"),
+    ("J45.9 Бронхіальна астма", "Задишка, свистяче дихання",
+     "Базисна інгаляційна терапія", "Сальбутамол за потреби"),
+    ("G43.9 Мігрень", "Пульсуючий головний біль, фотофобія",
+     "Уникання тригерів", "Суматриптан 50 мг при нападі"),
+    ("Z00.0 Загальний медичний огляд", "Скарг немає",
+     "Рекомендації щодо профілактики", None),
+]
+LAB_RESULTS = [
+    None, None, "ЗАК: без патологічних змін",
+    "Глюкоза крові 6.8 ммоль/л, HbA1c 7.1%",
+    "Загальний холестерин 6.2 ммоль/л, ЛПНЩ 4.1 ммоль/л",
+    "ЗАК: лейкоцити 11.2×10⁹/л, ШОЕ 24 мм/год",
+]
+TIME_SLOTS = [time(hour, minute) for hour in range(8, 18) for minute in (0, 15, 30, 45)]
+DURATIONS = [15, 30, 30, 30, 45, 60]
+
+# Розподіл статусів: для минулих і майбутніх дат
+PAST_STATUSES = ["completed", "cancelled", "no_show", "scheduled", "confirmed"]
+PAST_STATUS_WEIGHTS = [76, 12, 8, 2, 2]
+FUTURE_STATUSES = ["scheduled", "confirmed", "cancelled"]
+FUTURE_STATUS_WEIGHTS = [68, 26, 6]
+
+
+def _cum_weights(weights):
+    return list(itertools.accumulate(weights))
+
+
+class LoadDataGenerator:
+    """Детермінований генератор синтетичних даних"""
+
+    def __init__(self, engine, seed: int, anchor_date: date, batch_size: int):
+        self.engine = engine
+        self.rng = random.Random(seed)
+        self.anchor_date = anchor_date
+        self.batch_size = batch_size
+
+    def _person_name(self, gender: str):
+        rng = self.rng
+        male = gender == "Чоловік"
+        first = rng.choice(MALE_FIRST_NAMES if male else FEMALE_FIRST_NAMES)
+        if rng.random() < 0.8:
+            last = rng.choice(NEUTRAL_LAST_NAMES)
+        else:
+            last = rng.choice(GENDERED_LAST_NAMES)[0 if male else 1]
+        middle = rng.choice(PATRONYMICS)[0 if male else 1]
+        return first, last, middle
+
+    def _insert_batches(self, conn, table, rows):
+        """Пакетна вставка з генератора рядків"""
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                conn.execute(insert(table), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            conn.execute(insert(table), batch)
+            total += len(batch)
+        return total
+
+    def generate_departments(self, conn):
+        rows = [
+            {"name": name, "description": description, "phone": f"+38044{2000000 + i:07d}",
+             "floor": 1 + i % 5, "capacity": capacity, "is_active": True,
+             "created_at": datetime.combine(self.anchor_date, time(8)) - timedelta(days=1000)}
+            for i, (name, description, capacity) in enumerate(DEPARTMENTS)
+        ]
+        conn.execute(insert(Department.__table__), rows)
+        return [row_id for (row_id,) in conn.execute(
+            select(Department.id).order_by(Department.id.desc()).limit(len(rows))
+        )][::-1]
+
+    def generate_doctors(self, conn, count: int, department_ids, doctor_role_id: int):
+        """Лікарі з одним хешем пароля doctor123 (bcrypt обчислюється один раз)"""
+        hashed_password = get_password_hash("doctor123")
+        created_at = datetime.combine(self.anchor_date, time(8)) - timedelta(days=900)
+        rows = []
+        for i in range(count):
+            gender = self.rng.choice(["Чоловік", "Жінка"])
+            first, last, middle = self._person_name(gender)
+            rows.append({
+                "username": f"load_doctor{i:05d}",
+                "email": f"load_doctor{i:05d}@hospital.ua",
+                "hashed_password": hashed_password,
+                "full_name": f"{last} {first} {middle}",
+                "search_name": normalize_name(last, first, middle),
+                "phone": f"+38067{self.rng.randrange(10**7):07d}",
+                "is_active": True,
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+        # Розподіл лікарів по відділеннях пропорційно навантаженню відділень
+        dept_cum = _cum_weights(DEPARTMENT_WEIGHTS)
+        for row in rows:
+            row["department_id"] = department_ids[self.rng.choices(range(len(department_ids)), cum_weights=dept_cum)[0]]
+        conn.execute(insert(User.__table__), rows)
+        doctor_ids = list(conn.execute(
+            select(User.id).where(User.username.like("load_doctor%")).order_by(User.id)
+        ).scalars())
+        conn.execute(insert(user_roles), [
+            {"user_id": doctor_id, "role_id": doctor_role_id} for doctor_id in doctor_ids
+        ])
+
+        doctor_departments = {doctor_id: row["department_id"] for doctor_id, row in zip(doctor_ids, rows)}
+        return doctor_ids, doctor_departments
+
+    def generate_patients(self, conn, count: int):
+        rng = self.rng
+        anchor = self.anchor_date
+        blood_cum = _cum_weights(BLOOD_TYPE_WEIGHTS)
+        first_id = (conn.execute(select(func.max(Patient.id))).scalar() or 0) + 1
+
+        def rows():
+            for i in range(count):
+                gender = "Чоловік" if rng.random() < 0.46 else "Жінка"
+                first, last, middle = self._person_name(gender)
+                birth_date = anchor - timedelta(days=rng.randrange(365, 365 * 95))
+                created_at = datetime.combine(anchor, time(9)) - timedelta(
+                    days=rng.randrange(1, 2000), minutes=rng.randrange(600)
+                )
+                yield {
+                    "first_name": first,
+                    "last_name": last,
+                    "middle_name": middle,
+                    "search_name": normalize_name(last, first, middle),
+                    "birth_date": birth_date,
+                    "gender": gender,
+                    "phone": f"+38050{rng.randrange(10**7):07d}",
+                    "email": None if rng.random() < 0.4 else f"patient{first_id + i}@ukr.net",
+                    "address": f"м. {rng.choice(CITIES)}, вул. {rng.choice(STREETS)}, {rng.randrange(1, 200)}",
+                    "insurance_number": f"UA{first_id + i:010d}",
+                    "blood_type": rng.choices(BLOOD_TYPES, cum_weights=blood_cum)[0],
+                    "allergies": rng.choice(ALLERGIES),
+                    "chronic_diseases": rng.choice(CHRONIC),
+                    "emergency_contact": None,
+                    "emergency_phone": None,
+                    "is_active": rng.random() > 0.01,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+
+        inserted = self._insert_batches(conn, Patient.__table__, rows())
+        return first_id, inserted
+
+    def generate_appointments(self, conn, count: int, patient_range, doctor_ids,
+                              doctor_departments, days_back: int, days_ahead: int,
+                              record_ratio: float, created_by_id: int):
+        """
+        Записи на прийом і медичні записи до частини завершених прийомів
+
+        Навантаження на лікарів нерівномірне (закон Ципфа): найзавантаженіший
+        лікар має в десятки разів більше прийомів, ніж найменш завантажений.
+        Це найбільші таблиці, тому рядки формуються кортежами вже у форматі
+        зберігання SQLite і вставляються без обробки параметрів SQLAlchemy.
+        """
+        rng = self.rng
+        random_ = rng.random
+        randrange = rng.randrange
+        first_patient_id, patient_count = patient_range
+        doctor_cum = _cum_weights([1.0 / (rank + 1) ** 0.9 for rank in range(len(doctor_ids))])
+        shuffled_doctors = doctor_ids[:]
+        rng.shuffle(shuffled_doctors)
+        past_cum = _cum_weights(PAST_STATUS_WEIGHTS)
+        future_cum = _cum_weights(FUTURE_STATUS_WEIGHTS)
+        past_total, future_total = past_cum[-1], future_cum[-1]
+        first_id = (conn.execute(select(func.max(Appointment.id))).scalar() or 0) + 1
+
+        # Попередньо відформатовані дати й час (формат зберігання SQLAlchemy для SQLite)
+        max_lead = 90
+        day_strings = {
+            offset: (self.anchor_date + timedelta(days=offset)).isoformat()
+            for offset in range(-days_back - max_lead, days_ahead + 1)
+        }
+        slot_strings = [f"{slot.hour:02d}:{slot.minute:02d}:00.000000" for slot in TIME_SLOTS]
+        minute_strings = [f"{8 + m // 60:02d}:{m % 60:02d}:00.000000" for m in range(600)]
+
+        appointment_columns = (
+            "id", "patient_id", "doctor_id", "department_id", "appointment_date",
+            "appointment_time", "duration_minutes", "status", "reason", "notes",
+            "created_by_id", "created_at", "updated_at",
+        )
+        record_columns = (
+            "patient_id", "doctor_id", "appointment_id", "visit_date", "diagnosis",
+            "symptoms", "treatment", "prescriptions", "lab_results", "notes",
+            "is_confidential", "created_at", "updated_at",
+        )
+        appointment_sql = _insert_sql(conn, Appointment.__table__, appointment_columns)
+        record_sql = _insert_sql(conn, MedicalRecord.__table__, record_columns)
+
+        appointments = []
+        records = []
+        inserted = 0
+        chunk = 10_000
+        for start in range(0, count, chunk):
+            size = min(chunk, count - start)
+            doctors = rng.choices(shuffled_doctors, cum_weights=doctor_cum, k=size)
+            for offset, doctor_id in enumerate(doctors):
+                appointment_id = first_id + start + offset
+                day_offset = randrange(-days_back, days_ahead + 1)
+                if day_offset < 0:
+                    status = PAST_STATUSES[bisect_right(past_cum, random_() * past_total)]
+                else:
+                    status = FUTURE_STATUSES[bisect_right(future_cum, random_() * future_total)]
+                appointment_date = day_strings[day_offset]
+                appointment_time = slot_strings[randrange(len(slot_strings))]
+                lead_days = min(int(rng.expovariate(1 / 7)), max_lead)
+                created_at = f"{day_strings[day_offset - lead_days]} {minute_strings[randrange(600)]}"
+                patient_id = first_patient_id + randrange(patient_count)
+                appointments.append((
+                    appointment_id, patient_id, doctor_id, doctor_departments[doctor_id],
+                    appointment_date, appointment_time, DURATIONS[randrange(len(DURATIONS))],
+                    status, REASONS[randrange(len(REASONS))], None, created_by_id,
+                    created_at, created_at,
+                ))
+                if status == "completed" and random_() < record_ratio:
+                    diagnosis, symptoms, treatment, prescriptions = DIAGNOSES[randrange(len(DIAGNOSES))]
+                    visit_date = f"{appointment_date} {appointment_time}"
+                    records.append((
+                        patient_id, doctor_id, appointment_id, visit_date, diagnosis,
+                        symptoms, treatment, prescriptions,
+                        LAB_RESULTS[randrange(len(LAB_RESULTS))], None,
+                        1 if random_() < 0.05 else 0, visit_date, visit_date,
+                    ))
+            if len(appointments) >= self.batch_size:
+                conn.exec_driver_sql(appointment_sql, appointments)
+                inserted += len(appointments)
+                appointments = []
+            if len(records) >= self.batch_size:
+                conn.exec_driver_sql(record_sql, records)
+                records = []
+
+        if appointments:
+            conn.exec_driver_sql(appointment_sql, appointments)
+            inserted += len(appointments)
+        if records:
+            conn.exec_driver_sql(record_sql, records)
+        record_count = conn.execute(select(func.count(MedicalRecord.id))).scalar()
+        return inserted, record_count
+
+
+def _insert_sql(conn, table, columns) -> str:
+    """INSERT з позиційними параметрами у заданому порядку колонок"""
+    stmt = insert(table).values({name: bindparam(name) for name in columns})
+    compiled = stmt.compile(dialect=conn.dialect)
+    if tuple(compiled.positiontup) != tuple(columns):
+        raise RuntimeError(f"Неочікуваний порядок параметрів INSERT для {table.name}")
+    return str(compiled)
+
+
+def _configure_bulk_load(engine):
+    """Швидкі налаштування SQLite лише для з'єднань генератора"""
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.execute("PRAGMA cache_size=-200000")
+        cursor.close()
+
+
+def _ensure_empty(engine):
+    """Відмова писати в базу, що вже містить дані (зокрема робочу)"""
+    with engine.connect() as conn:
+        for name in inspect(conn).get_table_names():
+            if name in Base.metadata.tables and conn.execute(select(Base.metadata.tables[name]).limit(1)).first():
+                raise RuntimeError(f"База {engine.url} не порожня (таблиця {name}) - вкажіть нову базу через --db-url")
+
+
+def generate(db_url: str, patients: int, appointments: int, doctors: int,
+             record_ratio: float, seed: int, anchor_date: date,
+             days_back: int, days_ahead: int, batch_size: int):
+    """Повне заповнення бази; повертає статистику для звіту"""
+    # Без майстер-ключа конфіденційні записи лишилися б відкритим текстом
+    field_crypto.keyring()
+    engine = create_engine(db_url)
+    _ensure_empty(engine)
+    # Прагми нижче - лише для нових з'єднань
+    engine.dispose()
+    _configure_bulk_load(engine)
+    Base.metadata.create_all(bind=engine)
+
+    with Session(bind=engine) as db:
+        init_rbac_system(db)
+        doctor_role_id = db.query(Role.id).filter(Role.name == "Лікар").scalar()
+        admin_id = db.query(User.id).filter(User.username == "admin").scalar()
+
+    generator = LoadDataGenerator(engine, seed, anchor_date, batch_size)
+    timings = {}
+    with engine.begin() as conn:
+        started = timer.perf_counter()
+        department_ids = generator.generate_departments(conn)
+        doctor_ids, doctor_departments = generator.generate_doctors(
+            conn, doctors, department_ids, doctor_role_id
+        )
+        timings["doctors"] = timer.perf_counter() - started
+
+        started = timer.perf_counter()
+        patient_range = generator.generate_patients(conn, patients)
+        timings["patients"] = timer.perf_counter() - started
+
+    with engine.begin() as conn:
+        started = timer.perf_counter()
+        appointment_count, record_count = generator.generate_appointments(
+            conn, appointments, patient_range, doctor_ids, doctor_departments,
+            days_back, days_ahead, record_ratio, admin_id
+        )
+        timings["appointments"] = timer.perf_counter() - started
+
+    # Вставки в обхід ORM не оновлюють денні підсумки - перебудова одним проходом
+    with engine.begin() as conn:
+        started = timer.perf_counter()
+        daily_stats.rebuild(conn)
+        timings["daily_stats"] = timer.perf_counter() - started
+
+    # Журнал змін для синхронізації з нуля: INSERT ... SELECT на сутність
+    with engine.begin() as conn:
+        started = timer.perf_counter()
+        change_log.backfill(conn)
+        timings["change_log"] = timer.perf_counter() - started
+
+    # Вставлені в обхід ORM конфіденційні записи - відкритим текстом, як до шифрування
+    started = timer.perf_counter()
+    field_crypto.process_records(engine, "migrate", pause=0)
+    timings["field_crypto"] = timer.perf_counter() - started
+
+    # Схема, RBAC, денні підсумки і журнал змін уже актуальні: перший запуск
+    # застосунку на цій базі - теплий, без міграцій
+    with engine.begin() as conn:
+        mark_current(conn)
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+    return {
+        "doctors": len(doctor_ids),
+        "patients": patient_range[1],
+        "appointments": appointment_count,
+        "medical_records": record_count,
+        "timings": timings,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерація синтетичних даних для навантажувального тестування")
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL, help="URL порожньої бази даних SQLAlchemy")
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--appointments", type=int, default=1_000_000)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--record-ratio", type=float, default=0.6,
+                        help="Частка завершених прийомів з медичним записом")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor-date", type=date.fromisoformat, default=DEFAULT_ANCHOR_DATE,
+                        help="Дата 'сьогодні' для розподілу дат (YYYY-MM-DD)")
+    parser.add_argument("--days-back", type=int, default=730)
+    parser.add_argument("--days-ahead", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    print(f"🏥 Генерація даних у {args.db_url} (seed={args.seed}, дата={args.anchor_date})")
+    started = timer.perf_counter()
+    result = generate(
+        args.db_url, args.patients, args.appointments, args.doctors, args.record_ratio,
+        args.seed, args.anchor_date, args.days_back, args.days_ahead, args.batch_size
+    )
+    print(f"✅ Лікарів: {result['doctors']}, пацієнтів: {result['patients']}, "
+          f"записів на прийом: {result['appointments']}, медичних записів: {result['medical_records']}")
+    for stage, seconds in result["timings"].items():
+        print(f"   {stage}: {seconds:.1f} с")
+    print(f"✅ Загальний час: {timer.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Критична помилка: {e}")
+        sys.exit(1)
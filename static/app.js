@@ -9,6 +9,7 @@ let allAppointments = []
 let allMedicalRecords = []
 let allUsers = []
 let allDepartments = []
+let appointmentStream = null
 
 // Import Bootstrap
 const bootstrap = window.bootstrap
@@ -57,6 +58,24 @@ async function apiRequest(endpoint, options = {}) {
   }
 }
 
+// Кілька GET-запитів одним пакетом (POST /api/batch): одна автентифікація,
+// одна сесія БД і один мережевий обмін замість кількох
+async function apiBatch(endpoints) {
+  const { responses } = await apiRequest("/batch/", {
+    method: "POST",
+    body: JSON.stringify({ requests: endpoints.map((path) => ({ method: "GET", path })) }),
+  })
+
+  return responses.map(({ status, body }) => {
+    if (status >= 400) {
+      const errorMessage = (body && body.detail) || `Помилка сервера: ${status}`
+      console.error("[v0] API помилка:", errorMessage)
+      throw new Error(errorMessage)
+    }
+    return body
+  })
+}
+
 // Авторизація
 document.getElementById("loginForm")?.addEventListener("submit", async (e) => {
   e.preventDefault()
@@ -118,6 +137,7 @@ function logout() {
   console.log("[v0] Вихід з системи")
   authToken = null
   currentUser = null
+  closeAppointmentStream()
   localStorage.removeItem("authToken")
   showLoginScreen()
 }
@@ -265,11 +285,12 @@ async function loadDashboard() {
 
   // Завантаження статистики
   try {
-    const [patients, appointments, records, users] = await Promise.all([
-      apiRequest("/patients"),
-      apiRequest("/appointments"),
-      apiRequest("/medical-records"),
-      apiRequest("/users"),
+    const [patients, appointments, records, users, permissions] = await apiBatch([
+      "/patients",
+      "/appointments",
+      "/medical-records",
+      "/users",
+      "/rbac/my-permissions",
     ])
 
     document.getElementById("totalPatients").textContent = patients.length
@@ -297,7 +318,6 @@ async function loadDashboard() {
     document.getElementById("recentAppointments").innerHTML = recentHtml || '<p class="text-muted">Немає записів</p>'
 
     // Дозволи користувача
-    const permissions = await apiRequest("/rbac/my-permissions")
     const permHtml = permissions
       .map(
         (p) => `
@@ -449,11 +469,54 @@ async function loadAppointmentsPage() {
   try {
     allAppointments = await apiRequest("/appointments")
     displayAppointmentsTable(allAppointments)
+    openAppointmentStream()
   } catch (error) {
     alert("Помилка завантаження записів: " + error.message)
   }
 }
 
+// Потік змін записів (SSE): зміни інших користувачів без перезавантаження списку
+function openAppointmentStream() {
+  if (appointmentStream || !authToken) return
+
+  appointmentStream = new EventSource(`${API_BASE}/appointments/stream?token=${encodeURIComponent(authToken)}`)
+  appointmentStream.addEventListener("appointment", (event) => {
+    const data = JSON.parse(event.data)
+    upsertAppointment(data.appointment)
+  })
+  appointmentStream.addEventListener("resync", async () => {
+    // Пропущено забагато подій - одноразове перезавантаження списку
+    if (!document.getElementById("appointmentsTable")) return
+    allAppointments = await apiRequest("/appointments")
+    refreshAppointmentsTable()
+  })
+  appointmentStream.addEventListener("close", () => closeAppointmentStream())
+}
+
+function closeAppointmentStream() {
+  if (appointmentStream) {
+    appointmentStream.close()
+    appointmentStream = null
+  }
+}
+
+function upsertAppointment(appointment) {
+  const index = allAppointments.findIndex((a) => a.id === appointment.id)
+  if (index >= 0) {
+    allAppointments[index] = appointment
+  } else {
+    allAppointments.push(appointment)
+  }
+  refreshAppointmentsTable()
+}
+
+function refreshAppointmentsTable() {
+  // Таблиця є лише на сторінці записів; фільтри застосовуються повторно
+  if (document.getElementById("appointmentsTable")) {
+    applyAppointmentFilters()
+  }
+}
+
 function applyAppointmentFilters() {
   const dateFilter = document.getElementById("filterDate").value
   const statusFilter = document.getElementById("filterStatus").value
@@ -954,11 +1017,11 @@ function getStatusColor(status) {
 
 async function updateAppointmentStatus(id, status) {
   try {
-    await apiRequest(`/appointments/${id}`, {
+    const updated = await apiRequest(`/appointments/${id}`, {
       method: "PUT",
       body: JSON.stringify({ status }),
     })
-    loadAppointmentsPage() // Use the updated page loading function
+    upsertAppointment(updated)
   } catch (error) {
     alert("Помилка оновлення статусу: " + error.message)
   }
@@ -975,6 +1038,51 @@ function showAddPatientModal() {
   modal.show()
 }
 
+// Поля вибору пацієнта й лікаря: короткі довідники /lookup замість повних
+// списків, пошук за початком ПІБ під час введення
+const LOOKUPS = [
+  { kind: "Patient", endpoint: "/lookup/patients", placeholder: "Оберіть пацієнта" },
+  { kind: "Doctor", endpoint: "/lookup/doctors", placeholder: "Оберіть лікаря" },
+]
+const LOOKUP_DEBOUNCE_MS = 200
+
+function fillLookupSelect(select, items, placeholder) {
+  select.innerHTML =
+    `<option value="">${placeholder}</option>` +
+    items.map((item) => `<option value="${item.id}">${item.name}</option>`).join("")
+}
+
+async function initLookups(prefix) {
+  // Початкове заповнення обох полів - одним пакетним запитом
+  const results = await apiBatch(LOOKUPS.map((lookup) => lookup.endpoint))
+
+  LOOKUPS.forEach((lookup, i) => {
+    const select = document.getElementById(`${prefix}${lookup.kind}Select`)
+    const search = document.getElementById(`${prefix}${lookup.kind}Search`)
+    if (!select) return
+    fillLookupSelect(select, results[i], lookup.placeholder)
+    if (!search || search.dataset.bound) return
+
+    search.dataset.bound = "1"
+    let timer = null
+    search.addEventListener("input", () => {
+      clearTimeout(timer)
+      timer = setTimeout(async () => {
+        const query = search.value.trim()
+        try {
+          const items = await apiRequest(`${lookup.endpoint}?q=${encodeURIComponent(query)}`)
+          // Відповідь на застаріле введення не перезаписує новішу
+          if (search.value.trim() === query) {
+            fillLookupSelect(select, items, lookup.placeholder)
+          }
+        } catch (error) {
+          console.error("Помилка пошуку:", error)
+        }
+      }, LOOKUP_DEBOUNCE_MS)
+    })
+  })
+}
+
 async function showAddAppointmentModal() {
   const modalElement = document.getElementById("addAppointmentModal")
   if (!modalElement) {
@@ -985,24 +1093,7 @@ async function showAddAppointmentModal() {
   document.getElementById("addAppointmentForm")?.reset()
 
   try {
-    const patients = await apiRequest("/patients")
-    const users = await apiRequest("/users")
-    const doctors = users.filter((u) => u.roles.some((r) => r.name === "Лікар"))
-
-    const patientSelect = document.getElementById("appointmentPatientSelect")
-    if (patientSelect) {
-      patientSelect.innerHTML =
-        '<option value="">Оберіть пацієнта</option>' +
-        patients.map((p) => `<option value="${p.id}">${p.last_name} ${p.first_name} (${p.phone})</option>`).join("")
-    }
-
-    const doctorSelect = document.getElementById("appointmentDoctorSelect")
-    if (doctorSelect) {
-      doctorSelect.innerHTML =
-        '<option value="">Оберіть лікаря</option>' +
-        doctors.map((d) => `<option value="${d.id}">${d.full_name}</option>`).join("")
-    }
-
+    await initLookups("appointment")
     modal.show()
   } catch (error) {
     alert("Помилка завантаження даних: " + error.message)
@@ -1019,24 +1110,7 @@ async function showAddMedicalRecordModal() {
   document.getElementById("addMedicalRecordForm")?.reset()
 
   try {
-    const patients = await apiRequest("/patients")
-    const users = await apiRequest("/users")
-    const doctors = users.filter((u) => u.roles.some((r) => r.name === "Лікар"))
-
-    const patientSelect = document.getElementById("medicalRecordPatientSelect")
-    if (patientSelect) {
-      patientSelect.innerHTML =
-        '<option value="">Оберіть пацієнта</option>' +
-        patients.map((p) => `<option value="${p.id}">${p.last_name} ${p.first_name}</option>`).join("")
-    }
-
-    const doctorSelect = document.getElementById("medicalRecordDoctorSelect")
-    if (doctorSelect) {
-      doctorSelect.innerHTML =
-        '<option value="">Оберіть лікаря</option>' +
-        doctors.map((d) => `<option value="${d.id}">${d.full_name}</option>`).join("")
-    }
-
+    await initLookups("medicalRecord")
     modal.show()
   } catch (error) {
     alert("Помилка завантаження даних: " + error.message)
@@ -1120,10 +1194,10 @@ async function submitAddAppointment() {
   data.doctor_id = Number.parseInt(data.doctor_id)
 
   try {
-    await apiRequest("/appointments", { method: "POST", body: JSON.stringify(data) })
+    const created = await apiRequest("/appointments", { method: "POST", body: JSON.stringify(data) })
     bootstrap.Modal.getInstance(document.getElementById("addAppointmentModal")).hide()
     alert("Запис на прийом створено!")
-    loadAppointmentsPage()
+    upsertAppointment(created)
   } catch (error) {
     alert("Помилка створення запису: " + error.message)
   }
@@ -1202,12 +1276,12 @@ async function deletePatient(id) {
 
 async function completeAppointment(id) {
   try {
-    await apiRequest(`/appointments/${id}`, {
+    const updated = await apiRequest(`/appointments/${id}`, {
       method: "PUT",
       body: JSON.stringify({ status: "completed" }),
     })
     alert("Прийом завершено")
-    loadAppointmentsPage()
+    upsertAppointment(updated)
   } catch (error) {
     alert("Помилка: " + error.message)
   }
@@ -1217,12 +1291,12 @@ async function cancelAppointment(id) {
   if (!confirm("Скасувати цей запис?")) return
 
   try {
-    await apiRequest(`/appointments/${id}`, {
+    const updated = await apiRequest(`/appointments/${id}`, {
       method: "PUT",
       body: JSON.stringify({ status: "cancelled" }),
     })
     alert("Запис скасовано")
-    loadAppointmentsPage()
+    upsertAppointment(updated)
   } catch (error) {
     alert("Помилка: " + error.message)
   }